@@ -0,0 +1,84 @@
+"""Throughput of finding guide names in a page (pbg.common.annotate), in
+MB/s, as the number of names grows.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_annotate [--names 100,1000,10000,100000]
+    [--items 10000] [--max-naive 100]
+
+For each number of --names, makes up that many company names, and a page
+of search results with --items products, some of which mention them (see
+benchmarks.fixtures.listing_page()). Reports how long it takes to build
+the automaton, and to annotate the page, in MB/s of HTML.
+
+For up to --max-naive names, also times what we'd do without an
+automaton: search the page for each name in turn with a regex.
+
+Checks that every product's brand was found.
+"""
+import re
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import company_names
+from benchmarks.fixtures import listing_page
+from pbg.common.annotate import Annotator
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--names', dest='names',
+                             default='100,1000,10000,100000')
+    option_parser.add_option('--items', dest='items', type='int',
+                             default=10000)
+    option_parser.add_option('--max-naive', dest='max_naive', type='int',
+                             default=100)
+    options, _ = option_parser.parse_args()
+
+    print '%8s %-10s %8s %9s %9s %9s' % (
+        'names', 'method', 'page MB', 'build s', 'scan s', 'MB/s')
+
+    for num_names in [int(n) for n in options.names.split(',')]:
+        run(num_names, options.items, options.max_naive)
+
+
+def run(num_names, num_items, max_naive):
+    names = sorted(set(name for name, _ in company_names(num_names)))
+    page = listing_page(names, num_items)
+    page_mb = len(page.encode('utf_8')) / 1024.0 / 1024.0
+
+    def report(method, build_time, scan_time):
+        print '%8d %-10s %8.1f %9.2f %9.2f %9.2f' % (
+            len(names), method, page_mb, build_time, scan_time,
+            page_mb / scan_time)
+
+    start = time.time()
+    annotator = Annotator()
+    for name in names:
+        annotator.add(name, name)
+    annotator.annotate_text(u'')  # build the automaton
+    build_time = time.time() - start
+
+    start = time.time()
+    annotations = annotator.annotate(page)
+    report('automaton', build_time, time.time() - start)
+
+    if len(annotations) < num_items:
+        raise AssertionError('found %d names, but there are %d brands' % (
+            len(annotations), num_items))
+
+    if len(names) <= max_naive:
+        start = time.time()
+        name_res = [re.compile(r'\b%s\b' % re.escape(name), re.I | re.U)
+                    for name in names]
+        build_time = time.time() - start
+
+        start = time.time()
+        for name_re in name_res:
+            for _ in name_re.finditer(page):
+                pass
+        report('regexes', build_time, time.time() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Time running several guides one ``python -m`` at a time (as from cron)
+versus all at once with ``pbg.batch``.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_batch [--copies 3] [--jobs 1,2,4]
+
+Writes synthetic UNITE HERE, eggs and HRC pages, then runs each guide
+--copies times, both ways. Checks that both ways write the same output.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import eggs_page
+from benchmarks.fixtures import uhg_page
+from benchmarks.fixtures import write_hrc_pages
+from pbg.guides import get_guide
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--copies', dest='copies', type='int',
+                             default=3)
+    option_parser.add_option('--jobs', dest='jobs', default='1,2,4')
+    options, _ = option_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        jobs = write_jobs(tmp_dir, options.copies)
+
+        print '%-16s %10s' % ('mode', 'seconds')
+
+        start = time.time()
+        for job in jobs:
+            guide = get_guide(job['guide'])
+            with open(job['out'] + '.expected', 'w') as out:
+                subprocess.check_call(
+                    [sys.executable, '-m', guide.module] +
+                    guide.args + job['args'], stdout=out)
+        print '%-16s %10.2f' % ('python -m each', time.time() - start)
+
+        batch_path = os.path.join(tmp_dir, 'batch.json')
+        with open(batch_path, 'w') as f:
+            json.dump(jobs, f)
+
+        for num_jobs in options.jobs.split(','):
+            start = time.time()
+            with open(os.devnull, 'w') as devnull:
+                subprocess.check_call(
+                    [sys.executable, '-m', 'pbg.batch', '-j', num_jobs,
+                     batch_path], stderr=devnull)
+            print '%-16s %10.2f' % ('batch -j %s' % num_jobs,
+                                    time.time() - start)
+
+            for job in jobs:
+                if sha1(job['out']) != sha1(job['out'] + '.expected'):
+                    raise AssertionError('%s output differs' % job['out'])
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def write_jobs(tmp_dir, copies):
+    """Write pages for each guide, and return a batch (see pbg.batch)
+    that runs each guide *copies* times."""
+    uhg_path = os.path.join(tmp_dir, 'uhg.html')
+    with open(uhg_path, 'w') as f:
+        f.write(uhg_page())
+
+    eggs_path = os.path.join(tmp_dir, 'eggs.html')
+    with open(eggs_path, 'w') as f:
+        f.write(eggs_page())
+
+    hrc_paths = write_hrc_pages(os.path.join(tmp_dir, 'hrc'))
+
+    jobs = []
+    for i in xrange(copies):
+        def out(name):
+            return os.path.join(tmp_dir, 'out', '%d-%s' % (i, name))
+
+        jobs.extend([
+            {'guide': 'uhg', 'args': [uhg_path], 'out': out('uhg.json')},
+            {'guide': 'eggs', 'args': [eggs_path], 'out': out('eggs.html')},
+            {'guide': 'hrc-pages', 'args': hrc_paths,
+             'out': out('hrc.json')},
+        ])
+
+    os.makedirs(os.path.join(tmp_dir, 'out'))
+
+    return jobs
+
+
+def sha1(path):
+    with open(path) as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+if __name__ == '__main__':
+    main()
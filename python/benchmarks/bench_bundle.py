@@ -0,0 +1,188 @@
+"""Size and load time of a guide as a binary bundle (pbg.common.bundle)
+versus as JSON.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_bundle [--sizes 1000,10000,100000] [--queries N]
+
+For each size, writes a synthetic HRC guide as JSON (indented, like the
+scrapers write it), and compiles it into a bundle. Then reports:
+
+- the size of each, and gzipped (e.g. for shipping to a device)
+- loading the JSON, versus opening the bundle
+- looking up a name and reading its judgments' judgmentType and rank:
+  from the loaded JSON (scanning), versus from the bundle
+- counting judgments by judgmentType: from the loaded JSON, versus from
+  the bundle's column
+- decoding the whole bundle back into JSON
+
+and checks that the bundle round-trips and finds the same judgments.
+
+Also checks the same for Cornucopia's egg scorecard (annotated by
+eggs.py), whose judgments are reviews (``reviewOfTarget``).
+"""
+from __future__ import with_statement
+
+import gzip
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from optparse import OptionParser
+
+from benchmarks.fixtures import eggs_page
+from benchmarks.fixtures import hrc_judgment_dicts
+from pbg.common.bundle import GuideBundle
+from pbg.common.bundle import build_bundle
+from pbg.common.index import iter_matches
+from pbg.common.soup import HTML5LIB
+from pbg.common.soup import make_soup
+from pbg.cornucopia.eggs import annotated_microdata
+from pbg.common.text import normalize_name
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--sizes', dest='sizes',
+                             default='1000,10000,100000')
+    option_parser.add_option('--queries', dest='queries', type='int',
+                             default=1000)
+    options, _ = option_parser.parse_args()
+
+    print '%10s %-26s %12s' % ('judgments', 'measure', 'value')
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        check_eggs(tmp_dir)
+        for size in [int(s) for s in options.sizes.split(',')]:
+            run(size, options.queries, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def run(size, num_queries, tmp_dir):
+    guide_path = os.path.join(tmp_dir, 'guide.json')
+    bundle_path = os.path.join(tmp_dir, 'guide.pbgb')
+
+    guide_dict = {
+        'type': [u'BuyersGuide'],
+        'properties': {
+            'name': [u"Buyer's Guide"],
+            'judgment': list(hrc_judgment_dicts(size)),
+        },
+    }
+    with open(guide_path, 'w') as f:
+        f.write(json.dumps(guide_dict, indent=2))
+    build_bundle(bundle_path, guide_dict)
+    del guide_dict
+
+    r = random.Random(0)
+    names = ['company %d' % r.randrange(size // 4)
+             for _ in xrange(num_queries)]
+
+    def report(measure, value, unit):
+        print '%10d %-26s %9.1f %-2s' % (size, measure, value, unit)
+
+    def report_ms(measure, seconds):
+        report(measure, seconds * 1000, 'ms')
+
+    report('JSON size', os.path.getsize(guide_path) / 1024.0, 'KB')
+    report('JSON size, gzipped', gzipped_size(guide_path) / 1024.0, 'KB')
+    report('bundle size', os.path.getsize(bundle_path) / 1024.0, 'KB')
+    report('bundle size, gzipped', gzipped_size(bundle_path) / 1024.0, 'KB')
+
+    start = time.time()
+    with open(guide_path) as f:
+        guide_dict = json.load(f)
+    report_ms('load JSON', time.time() - start)
+
+    start = time.time()
+    bundle = GuideBundle(bundle_path)
+    report_ms('open bundle', time.time() - start)
+
+    try:
+        start = time.time()
+        scanned = [scan(guide_dict, name) for name in names[:10]]
+        report_ms('JSON scan (per query)',
+                  (time.time() - start) / len(scanned))
+
+        start = time.time()
+        found = [[(bundle.judgment_type(num), bundle.rank(num))
+                  for num in bundle.lookup(name)] for name in names]
+        report_ms('bundle lookup (per query)',
+                  (time.time() - start) / len(names))
+
+        start = time.time()
+        json_counts = defaultdict(int)
+        for judgment in guide_dict['properties']['judgment']:
+            json_counts[judgment['properties']['judgmentType'][0]] += 1
+        report_ms('JSON count by type', time.time() - start)
+
+        start = time.time()
+        bundle_counts = defaultdict(int)
+        for judgment_type in bundle.column('judgmentType'):
+            bundle_counts[judgment_type] += 1
+        report_ms('bundle count by type', time.time() - start)
+
+        start = time.time()
+        round_tripped = bundle.guide_dict()
+        report_ms('bundle to JSON', time.time() - start)
+    finally:
+        bundle.close()
+
+    if round_tripped != guide_dict:
+        raise AssertionError("bundle doesn't round-trip")
+    if json_counts != bundle_counts:
+        raise AssertionError('bundle counted judgments differently')
+    if scanned != found[:len(scanned)]:
+        raise AssertionError('bundle and scan found different judgments')
+
+
+def check_eggs(tmp_dir):
+    """Check that a bundle of the egg scorecard round-trips, and finds
+    every brand's review."""
+    bundle_path = os.path.join(tmp_dir, 'eggs.pbgb')
+
+    soup = make_soup(eggs_page(), HTML5LIB)
+    guide_dict = [item for item in annotated_microdata(soup)
+                  if 'BuyersGuide' in item['type'][0]][0]
+    build_bundle(bundle_path, guide_dict)
+
+    with GuideBundle(bundle_path) as bundle:
+        if bundle.guide_dict() != guide_dict:
+            raise AssertionError("eggs bundle doesn't round-trip")
+
+        for match, judgment in iter_matches(guide_dict):
+            if not [num for num in bundle.lookup(match['name'])
+                    if bundle.judgment(num) == judgment]:
+                raise AssertionError(
+                    'eggs bundle has no review of %r' % match['name'])
+
+
+def scan(guide_dict, name):
+    key = normalize_name(name)
+    return [(judgment['properties']['judgmentType'][0],
+             judgment['extra']['rank'])
+            for match, judgment in iter_matches(guide_dict)
+            if normalize_name(match['name']) == key]
+
+
+def gzipped_size(path):
+    gz_path = path + '.gz'
+    with open(path, 'rb') as f:
+        gz = gzip.open(gz_path, 'wb')
+        try:
+            gz.write(f.read())
+        finally:
+            gz.close()
+
+    size = os.path.getsize(gz_path)
+    os.remove(gz_path)
+    return size
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Time and peak memory of loading a large guide as Items vs. CompactItems.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_compact [--sizes 10000,100000,1000000]
+
+Writes a synthetic HRC guide with that many judgments to a temp file, then
+loads it in a fresh process with item_from_json_dict() and with
+CompactLoader, so peak RSS is per run. Checks that both give the same
+JSON back.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_judgment_dicts
+from pbg.common.microdata import CompactLoader
+from pbg.common.microdata import item_from_json_dict
+
+
+MODES = ('item', 'compact')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--sizes', dest='sizes',
+                             default='10000,100000,1000000')
+    # internal: do a single run, in this process
+    option_parser.add_option('--run', dest='run', default=None)
+    options, args = option_parser.parse_args()
+
+    if options.run:
+        run(options.run, args[0])
+        return
+
+    print '%10s %10s %10s %12s %10s' % (
+        'judgments', 'mode', 'seconds', 'peak RSS MB', 'saved')
+
+    for size in [int(s) for s in options.sizes.split(',')]:
+        fd, path = tempfile.mkstemp(suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                write_guide_json(f, size)
+
+            results = {}
+            for mode in MODES:
+                output = subprocess.check_output([
+                    sys.executable, '-m', 'benchmarks.bench_compact',
+                    '--run', mode, path])
+                elapsed, peak_kb, digest = output.split()
+                results[mode] = (float(elapsed), int(peak_kb), digest)
+
+            if results['item'][2] != results['compact'][2]:
+                raise AssertionError(
+                    'CompactLoader output differs for %d judgments' % size)
+
+            for mode in MODES:
+                elapsed, peak_kb, _ = results[mode]
+                saved = 1.0 - float(peak_kb) / results['item'][1]
+                print '%10d %10s %10.2f %12.1f %9.0f%%' % (
+                    size, mode, elapsed, peak_kb / 1024.0, saved * 100)
+        finally:
+            os.remove(path)
+
+
+def write_guide_json(f, num_judgments):
+    """Write a guide with *num_judgments* (unmerged) judgments to *f*."""
+    guide = {
+        'type': ['BuyersGuide'],
+        'properties': {
+            'name': ["Buyer's Guide"],
+            'judgment': list(hrc_judgment_dicts(num_judgments)),
+        },
+    }
+    json.dump(guide, f)
+
+
+def run(mode, path):
+    start = time.time()
+
+    with open(path) as f:
+        if mode == 'item':
+            guide = item_from_json_dict(json.load(f))
+        else:
+            guide = CompactLoader().load(f)
+
+    elapsed = time.time() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    digest = hashlib.sha1(
+        json.dumps(guide.json_dict(), sort_keys=True)).hexdigest()
+
+    print elapsed, peak_kb, digest
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Time looking up judgments by name, with and without the name index.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_index [--sizes 10000,100000] [--queries N]
+
+For each size, writes a synthetic HRC guide, then compares loading its
+JSON and scanning for a name (what we did before) with building a
+NameIndex once and querying it. Checks that both find the same judgments.
+"""
+from __future__ import with_statement
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_judgment_dicts
+from pbg.common.index import NameIndex
+from pbg.common.index import build_index
+from pbg.common.index import iter_matches
+from pbg.common.text import normalize_name
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--sizes', dest='sizes', default='10000,100000')
+    option_parser.add_option('--queries', dest='queries', type='int',
+                             default=1000)
+    options, _ = option_parser.parse_args()
+
+    print '%10s %-22s %12s' % ('judgments', 'operation', 'ms')
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for size in [int(s) for s in options.sizes.split(',')]:
+            run(size, options.queries, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def run(size, num_queries, tmp_dir):
+    guide_path = os.path.join(tmp_dir, 'guide.json')
+    index_path = os.path.join(tmp_dir, 'guide.idx')
+
+    with open(guide_path, 'w') as f:
+        json.dump({
+            'type': ['BuyersGuide'],
+            'properties': {
+                'name': ["Buyer's Guide"],
+                'judgment': list(hrc_judgment_dicts(size)),
+            },
+        }, f)
+
+    r = random.Random(0)
+    names = ['company %d' % r.randrange(size // 4) for _ in xrange(num_queries)]
+
+    def report(operation, seconds):
+        print '%10d %-22s %12.4f' % (size, operation, seconds * 1000)
+
+    # the old way: load the guide and scan it
+    start = time.time()
+    with open(guide_path) as f:
+        guide_dict = json.load(f)
+    report('load JSON', time.time() - start)
+
+    start = time.time()
+    scanned = [scan(guide_dict, name) for name in names[:10]]
+    report('scan (per query)', (time.time() - start) / len(scanned))
+
+    start = time.time()
+    build_index(index_path, [guide_dict])
+    report('build index', time.time() - start)
+
+    start = time.time()
+    index = NameIndex(index_path)
+    report('open index', time.time() - start)
+
+    try:
+        start = time.time()
+        found = [index.lookup(name) for name in names]
+        report('lookup (per query)', (time.time() - start) / len(names))
+
+        start = time.time()
+        for name in names:
+            index.prefix(name[:-1], limit=10)
+        report('prefix (per query)', (time.time() - start) / len(names))
+    finally:
+        index.close()
+
+    for expected, matches in zip(scanned, found):
+        if expected != [match['judgment'] for match in matches]:
+            raise AssertionError('index and scan found different judgments')
+
+
+def scan(guide_dict, name):
+    key = normalize_name(name)
+    return [judgment for match, judgment in iter_matches(guide_dict)
+            if normalize_name(match['name']) == key]
+
+
+if __name__ == '__main__':
+    main()
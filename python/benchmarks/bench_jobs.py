@@ -0,0 +1,73 @@
+"""How parsing HRC category pages scales with --jobs.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_jobs [--pages N] [--rows N] [--max-jobs N]
+
+Parses the same synthetic pages with 1, 2, 4, ... processes, and checks
+that each gives the same merged judgments as parsing them serially.
+"""
+from __future__ import with_statement
+
+import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import write_hrc_pages
+from pbg.hrc.buyersguide.data import merge_judgments_by_company_name
+from pbg.hrc.buyersguide.data import parse_pages
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--pages', dest='pages', type='int', default=32)
+    option_parser.add_option('--rows', dest='rows', type='int', default=200)
+    option_parser.add_option('--max-jobs', dest='max_jobs', type='int',
+                             default=multiprocessing.cpu_count())
+    options, _ = option_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        paths = write_hrc_pages(tmp_dir, options.pages, options.rows)
+
+        print '%d pages, %d rows each' % (options.pages, options.rows)
+        print '%6s %10s %8s' % ('jobs', 'seconds', 'speedup')
+
+        expected = None
+        serial_time = None
+
+        for jobs in jobs_to_try(options.max_jobs):
+            start = time.time()
+            judgments = []
+            for _, page_judgments in parse_pages(paths, jobs=jobs):
+                judgments.extend(page_judgments)
+            merged = merge_judgments_by_company_name(judgments)
+            elapsed = time.time() - start
+
+            result = json.dumps([j.json_dict() for j in merged],
+                                sort_keys=True)
+            if expected is None:
+                expected = result
+                serial_time = elapsed
+            elif result != expected:
+                raise AssertionError(
+                    'output with %d jobs differs from serial output' % jobs)
+
+            print '%6d %10.3f %7.2fx' % (jobs, elapsed, serial_time / elapsed)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def jobs_to_try(max_jobs):
+    jobs = 1
+    while jobs < max_jobs:
+        yield jobs
+        jobs *= 2
+    yield max_jobs
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Time and memory of writing a large guide as JSON, the old way (building
+json_dict() and then encoding it), and with write_json(), with each JSON
+backend.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_json [--sizes 10000,100000]
+
+Loads a synthetic HRC guide with that many judgments as Items in a fresh
+process for each run, then writes it to a temp file. *extra MB* is how
+much the peak RSS went up while writing. Checks that every way writes
+the same bytes.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.bench_compact import write_guide_json
+from pbg.common import microdata
+
+
+MODES = ('json_dict', 'json', 'simplejson')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--sizes', dest='sizes', default='10000,100000')
+    # internal: do a single run, in this process
+    option_parser.add_option('--run', dest='run', default=None)
+    options, args = option_parser.parse_args()
+
+    if options.run:
+        run(options.run, args[0])
+        return
+
+    modes = MODES
+    if microdata.simplejson is None:
+        print 'simplejson not installed, skipping it'
+        modes = MODES[:-1]
+
+    print '%10s %10s %10s %10s %10s' % (
+        'judgments', 'mode', 'seconds', 'extra MB', 'speedup')
+
+    for size in [int(s) for s in options.sizes.split(',')]:
+        fd, path = tempfile.mkstemp(suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                write_guide_json(f, size)
+
+            results = {}
+            for mode in modes:
+                output = subprocess.check_output([
+                    sys.executable, '-m', 'benchmarks.bench_json',
+                    '--run', mode, path])
+                elapsed, extra_kb, digest = output.split()
+                results[mode] = (float(elapsed), int(extra_kb), digest)
+
+            if len(set(digest for _, _, digest in results.values())) > 1:
+                raise AssertionError(
+                    'JSON output differs for %d judgments' % size)
+
+            for mode in modes:
+                elapsed, extra_kb, _ = results[mode]
+                print '%10d %10s %10.2f %10.1f %9.1fx' % (
+                    size, mode, elapsed, extra_kb / 1024.0,
+                    results['json_dict'][0] / elapsed)
+        finally:
+            os.remove(path)
+
+
+def run(mode, path):
+    with open(path) as f:
+        guide = microdata.item_from_json_dict(json.load(f))
+
+    if mode == 'json':
+        microdata.simplejson = None
+
+    loaded_kb = _peak_rss_kb()
+
+    fd, out_path = tempfile.mkstemp(suffix='.json')
+    try:
+        start = time.time()
+        with os.fdopen(fd, 'w') as out:
+            if mode == 'json_dict':
+                out.write(json.dumps(guide.json_dict(), indent=2))
+            else:
+                microdata.write_json(out, guide)
+        elapsed = time.time() - start
+
+        extra_kb = _peak_rss_kb() - loaded_kb
+
+        with open(out_path) as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    finally:
+        os.remove(out_path)
+
+    print elapsed, extra_kb, digest
+
+
+def _peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Time and peak memory of merging HRC judgments by company name.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_merge [--sizes 10000,100000,1000000]
+
+Compares merge_judgments_by_company_name() (everything in memory) with
+merge.py's external-sort merge, streaming its output. Each run happens in
+its own process, so peak RSS is per run. The in-memory merge is skipped
+for sizes over --max-in-memory.
+"""
+import resource
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_judgment_dicts
+from pbg.common.microdata import item_from_json_dict
+from pbg.hrc.buyersguide.data import merge_judgments_by_company_name
+from pbg.hrc.buyersguide.merge import merge_judgment_dicts
+
+
+MODES = ('memory', 'external')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--sizes', dest='sizes',
+                             default='10000,100000,1000000')
+    option_parser.add_option('--max-in-memory', dest='max_in_memory',
+                             type='int', default=100000)
+    option_parser.add_option('--buffer-size', dest='buffer_size',
+                             type='int', default=50000)
+    # internal: do a single run, in this process
+    option_parser.add_option('--run', dest='run', default=None)
+    options, _ = option_parser.parse_args()
+
+    if options.run:
+        mode, size = options.run.split(':')
+        run(mode, int(size), options.buffer_size)
+        return
+
+    print '%10s %10s %10s %10s %12s' % (
+        'judgments', 'mode', 'merged', 'seconds', 'peak RSS MB')
+
+    for size in [int(s) for s in options.sizes.split(',')]:
+        for mode in MODES:
+            if mode == 'memory' and size > options.max_in_memory:
+                continue
+
+            output = subprocess.check_output([
+                sys.executable, '-m', 'benchmarks.bench_merge',
+                '--run', '%s:%d' % (mode, size),
+                '--buffer-size', str(options.buffer_size)])
+            num_merged, elapsed, peak_kb = output.split()
+
+            print '%10d %10s %10s %10.2f %12.1f' % (
+                size, mode, num_merged, float(elapsed),
+                int(peak_kb) / 1024.0)
+
+
+def run(mode, size, buffer_size):
+    start = time.time()
+
+    if mode == 'memory':
+        judgments = [item_from_json_dict(j) for j in hrc_judgment_dicts(size)]
+        num_merged = len(merge_judgments_by_company_name(judgments))
+    else:
+        num_merged = 0
+        for _ in merge_judgment_dicts(hrc_judgment_dicts(size),
+                                      buffer_size=buffer_size):
+            num_merged += 1
+
+    elapsed = time.time() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print num_merged, elapsed, peak_kb
+
+
+if __name__ == '__main__':
+    main()
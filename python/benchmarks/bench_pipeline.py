@@ -0,0 +1,136 @@
+"""Time and memory of scraping the HRC guide step by step (as in the
+docstring of pbg.hrc.buyersguide.data) versus with ``pbg.pipeline``, from
+a local stand-in for the site.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_pipeline [--categories 20,100,400] [--latency 0.05]
+
+Serves synthetic HRC pages from a local HTTP server that waits --latency
+seconds before each response. *peak MB* is the peak RSS of the parsing
+step (data.py) or of the pipeline. Checks that both write the same JSON.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_site
+from benchmarks.fixtures import serve
+
+
+MODES = ('steps', 'pipeline')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--categories', dest='categories',
+                             default='20,100,400')
+    option_parser.add_option('--rows', dest='rows', type='int', default=50)
+    option_parser.add_option('--latency', dest='latency', type='float',
+                             default=0.05)
+    options, _ = option_parser.parse_args()
+
+    print '%10s %10s %10s %10s' % ('categories', 'mode', 'seconds',
+                                   'peak MB')
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for num_categories in [
+                int(c) for c in options.categories.split(',')]:
+            server = serve(hrc_site(num_categories, options.rows),
+                           latency=options.latency)
+            try:
+                results = {}
+                for mode in MODES:
+                    run_dir = os.path.join(tmp_dir, mode)
+                    os.makedirs(run_dir)
+                    try:
+                        results[mode] = RUNS[mode](server.url, run_dir)
+                    finally:
+                        shutil.rmtree(run_dir)
+            finally:
+                server.shutdown()
+
+            if results['steps'][2] != results['pipeline'][2]:
+                raise AssertionError(
+                    'pipeline output differs for %d categories' %
+                    num_categories)
+
+            for mode in MODES:
+                elapsed, peak_kb, _ = results[mode]
+                print '%10d %10s %10.2f %10.1f' % (
+                    num_categories, mode, elapsed, peak_kb / 1024.0)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def run_steps(root_url, run_dir):
+    """Run each step after the last, like the usage in data.py's
+    docstring."""
+    def path(name):
+        return os.path.join(run_dir, name)
+
+    start = time.time()
+
+    python_m(['pbg.common.fetch', root_url], stdout=path('hrc.html'))
+    python_m(['pbg.hrc.buyersguide.urls', path('hrc.html')],
+             stdout=path('hrc-urls.txt'))
+    python_m(['pbg.hrc.buyersguide.fetch', '-r', root_url, '--delay', '0',
+              '-d', path('hrc-pages'), path('hrc-urls.txt')])
+
+    # what hrc-pages/*.html would expand to
+    page_paths = sorted(os.path.join(path('hrc-pages'), name)
+                        for name in os.listdir(path('hrc-pages')))
+    python_m(['pbg.hrc.buyersguide.data', '--report', path('report.json'),
+              path('hrc.html')] + page_paths, stdout=path('hrc.json'))
+
+    elapsed = time.time() - start
+
+    return elapsed, peak_rss_kb(path('report.json')), sha1(path('hrc.json'))
+
+
+def run_pipeline(root_url, run_dir):
+    def path(name):
+        return os.path.join(run_dir, name)
+
+    start = time.time()
+    python_m(['pbg.pipeline', 'hrc', '-r', root_url, '--delay', '0',
+              '--report', path('report.json')], stdout=path('hrc.json'))
+    elapsed = time.time() - start
+
+    return elapsed, peak_rss_kb(path('report.json')), sha1(path('hrc.json'))
+
+
+RUNS = {
+    'steps': run_steps,
+    'pipeline': run_pipeline,
+}
+
+
+def python_m(args, stdout=None):
+    with open(stdout or os.devnull, 'w') as out:
+        with open(os.devnull, 'w') as err:
+            subprocess.check_call([sys.executable, '-m'] + args,
+                                  stdout=out, stderr=err)
+
+
+def peak_rss_kb(report_path):
+    with open(report_path) as f:
+        return json.load(f)['peak_rss_kb']
+
+
+def sha1(path):
+    with open(path) as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+if __name__ == '__main__':
+    main()
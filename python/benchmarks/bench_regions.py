@@ -0,0 +1,99 @@
+"""Time and memory of building only the regions of a page a parser uses
+(see pbg.common.soup.regions), versus the whole tree.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_regions [--links 0,1000,10000]
+
+Wraps synthetic UNITE HERE and HRC category pages in a header and footer
+with that many links, and parses each with lxml, with and without the
+parser's regions. Each run happens in its own process, so peak RSS is per
+run. Checks that both ways give the same data.
+"""
+import hashlib
+import resource
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_category_page
+from benchmarks.fixtures import uhg_page
+from benchmarks.fixtures import with_site_chrome
+from pbg.common.soup import LXML
+from pbg.common.soup import make_soup
+from pbg.hrc.buyersguide import data
+from pbg.unitehere import uhg
+
+
+MODES = ('whole', 'regions')
+
+
+def uhg_result(soup):
+    return uhg.parse_guide(soup).json()
+
+
+def hrc_result(soup):
+    return repr(data.page_to_json(*data.parse_page_soup(soup)))
+
+
+GUIDES = {
+    # guide: (make page, regions, get data from tree)
+    'uhg': (lambda: uhg_page(2000), uhg.REGIONS, uhg_result),
+    'hrc': (lambda: hrc_category_page(1000, 2000), data.REGIONS, hrc_result),
+}
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--links', dest='links', default='0,1000,10000')
+    # internal: do a single run, in this process
+    option_parser.add_option('--run', dest='run', default=None)
+    options, _ = option_parser.parse_args()
+
+    if options.run:
+        guide, mode, num_links = options.run.split(':')
+        run(guide, mode, int(num_links))
+        return
+
+    print '%5s %7s %8s %9s %8s %12s' % (
+        'guide', 'links', 'mode', 'page KB', 'seconds', 'peak RSS MB')
+
+    for guide in sorted(GUIDES):
+        for num_links in [int(n) for n in options.links.split(',')]:
+            digests = set()
+
+            for mode in MODES:
+                output = subprocess.check_output([
+                    sys.executable, '-m', 'benchmarks.bench_regions',
+                    '--run', '%s:%s:%d' % (guide, mode, num_links)])
+                page_bytes, elapsed, peak_kb, digest = output.split()
+                digests.add(digest)
+
+                print '%5s %7d %8s %9.0f %8.3f %12.1f' % (
+                    guide, num_links, mode, int(page_bytes) / 1024.0,
+                    float(elapsed), int(peak_kb) / 1024.0)
+
+            if len(digests) != 1:
+                raise AssertionError(
+                    '%s with %d links: regions gave different data' % (
+                        guide, num_links))
+
+
+def run(guide, mode, num_links):
+    make_page, regions, get_result = GUIDES[guide]
+    html = with_site_chrome(make_page(), num_links)
+
+    start = time.time()
+    soup = make_soup(html, LXML, regions if mode == 'regions' else None)
+    result = get_result(soup)
+    elapsed = time.time() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    digest = hashlib.sha1(result).hexdigest()
+
+    print len(html), elapsed, peak_kb, digest
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Time clustering company names into entities (pbg.common.resolve), and
+how well it does.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_resolve [--sizes 10000,100000,200000]
+    [--threshold 0.7] [--max-all-pairs 5000]
+
+For each size, makes up that many company names, about three to an entity
+(see benchmarks.fixtures.company_names()), and resolves them. Reports:
+
+- seconds, and names per second
+- how many clusters we found, versus how many entities there really are
+- precision and recall over pairs of names: of the pairs we put in the
+  same cluster, how many really are the same entity, and of the pairs
+  that are the same entity, how many we put in the same cluster
+
+For sizes up to --max-all-pairs, also compares every pair of keys, the
+quadratic way, and checks that it finds the same similar pairs.
+"""
+import time
+from collections import defaultdict
+from optparse import OptionParser
+
+from benchmarks.fixtures import company_names
+from pbg.common.resolve import DEFAULT_THRESHOLD
+from pbg.common.resolve import gram_weights
+from pbg.common.resolve import name_key
+from pbg.common.resolve import resolve_names
+from pbg.common.resolve import similar_pairs
+from pbg.common.resolve import similarity
+from pbg.common.resolve import trigrams
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--sizes', dest='sizes',
+                             default='10000,100000,200000')
+    option_parser.add_option('--threshold', dest='threshold', type='float',
+                             default=DEFAULT_THRESHOLD)
+    option_parser.add_option('--max-all-pairs', dest='max_all_pairs',
+                             type='int', default=5000)
+    options, _ = option_parser.parse_args()
+
+    print '%8s %-9s %9s %9s %9s %9s %9s %9s' % (
+        'names', 'method', 'seconds', 'names/s', 'clusters', 'entities',
+        'precision', 'recall')
+
+    for size in [int(s) for s in options.sizes.split(',')]:
+        names, entity_nums = zip(*company_names(size))
+
+        start = time.time()
+        ids, _ = resolve_names(names, options.threshold)
+        elapsed = time.time() - start
+
+        precision, recall = pair_scores(ids, entity_nums)
+        print '%8d %-9s %9.2f %9.0f %9d %9d %9.3f %9.3f' % (
+            size, 'index', elapsed, size / elapsed, len(set(ids)),
+            len(set(entity_nums)), precision, recall)
+
+        if size <= options.max_all_pairs:
+            gram_sets = [trigrams(key) for key in set(
+                name_key(name) for name in names)]
+
+            start = time.time()
+            expected = all_pairs(gram_sets, options.threshold)
+            elapsed = time.time() - start
+            print '%8d %-9s %9.2f %9.0f' % (
+                size, 'all pairs', elapsed, size / elapsed)
+
+            found = set((min(i, j), max(i, j)) for i, j in
+                        similar_pairs(gram_sets, options.threshold))
+            if found != expected:
+                raise AssertionError(
+                    'index found %d similar pairs, all pairs found %d' % (
+                        len(found), len(expected)))
+
+
+def all_pairs(gram_sets, threshold):
+    weights = gram_weights(gram_sets)
+    pairs = set()
+    for i in xrange(len(gram_sets)):
+        for j in xrange(i + 1, len(gram_sets)):
+            if similarity(gram_sets[i], gram_sets[j], weights) >= threshold:
+                pairs.add((i, j))
+    return pairs
+
+
+def pair_scores(ids, entity_nums):
+    """Precision and recall over pairs of names."""
+    cells = defaultdict(int)
+    clusters = defaultdict(int)
+    entities = defaultdict(int)
+    for cluster, entity_num in zip(ids, entity_nums):
+        cells[cluster, entity_num] += 1
+        clusters[cluster] += 1
+        entities[entity_num] += 1
+
+    def pairs(counts):
+        return sum(n * (n - 1) // 2 for n in counts.itervalues())
+
+    correct = pairs(cells)
+    return (correct / float(pairs(clusters) or 1),
+            correct / float(pairs(entities) or 1))
+
+
+if __name__ == '__main__':
+    main()
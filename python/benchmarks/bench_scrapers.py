@@ -0,0 +1,228 @@
+"""Time each scraper, phase by phase, on synthetic pages at 1x, 10x and
+100x the size of the real guides, and compare against a stored baseline.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_scrapers [--scales 1,10,100] [--scrapers uhg,hrc,eggs]
+python -m benchmarks.bench_scrapers --update-baseline
+
+Each scraper's main() is run with pbg.common.instrument turned on, and
+its output is checked against the baseline's SHA1. The report splits the
+time into phases:
+
+read       reading the page(s) from disk
+soup       building the BeautifulSoup tree
+select     CSS select() calls
+parse      everything else in parsing: walking the tree, building Items
+annotate   adding microdata attributes to the tree (eggs.py only)
+merge      merging judgments by company (HRC only)
+serialize  guide.json() (for eggs.py, printing the annotated tree)
+main       the whole thing
+
+Any output that differs from the baseline, or phase more than
+--tolerance times slower than it, is flagged, and we exit with status 1.
+Timings depend on the machine, so re-record the baseline (with
+--update-baseline) before comparing on a new one.
+"""
+from __future__ import with_statement
+
+import gc
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from optparse import OptionParser
+
+from benchmarks.fixtures import eggs_page
+from benchmarks.fixtures import uhg_page
+from benchmarks.fixtures import write_hrc_pages
+from pbg.common.instrument import Instruments
+from pbg.cornucopia import eggs
+from pbg.hrc.buyersguide import data
+from pbg.unitehere import uhg
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+PHASES = ('read', 'soup', 'select', 'parse', 'annotate', 'merge', 'serialize',
+          'main')
+
+# our rough idea of the size of the real pages, at 1x
+UHG_HOTELS = 200
+HRC_CATEGORIES = 20
+HRC_ROWS = 50
+EGGS_BRANDS = 100
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--scales', dest='scales', default='1,10,100')
+    option_parser.add_option('--scrapers', dest='scrapers',
+                             default='uhg,hrc,eggs')
+    option_parser.add_option(
+        '--tolerance', dest='tolerance', type='float', default=1.5,
+        help='Flag phases this many times slower than the baseline')
+    option_parser.add_option(
+        '--baseline', dest='baseline', default=BASELINE_PATH,
+        help='Baseline file (default: %default)')
+    option_parser.add_option(
+        '--update-baseline', dest='update_baseline', default=False,
+        action='store_true',
+        help='Record these results as the new baseline')
+    options, _ = option_parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+
+    scales = [int(s) for s in options.scales.split(',')]
+
+    print '%-5s %6s %-10s %10s %10s %8s' % (
+        'guide', 'scale', 'phase', 'seconds', 'baseline', 'ratio')
+
+    ok = True
+    results = {}
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for name in options.scrapers.split(','):
+            benchmark = SCRAPERS[name](tmp_dir)
+            for scale in scales:
+                result = benchmark.run(scale)
+                results.setdefault(name, {})[str(scale)] = result
+
+                expected = baseline.get(name, {}).get(str(scale))
+                ok &= report(name, scale, result, expected, options.tolerance)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    if options.update_baseline:
+        for name, scale_results in results.iteritems():
+            baseline.setdefault(name, {}).update(scale_results)
+        with open(options.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print 'wrote %s' % options.baseline
+    elif not ok:
+        sys.exit(1)
+
+
+def report(name, scale, result, expected, tolerance):
+    """Print *result*, compared to *expected*. Return False if anything
+    regressed."""
+    ok = True
+
+    for phase in PHASES:
+        seconds = result['seconds'].get(phase)
+        if seconds is None:
+            continue
+
+        base_seconds = expected and expected['seconds'].get(phase)
+        if base_seconds:
+            ratio = seconds / base_seconds
+            flag = ''
+            # ignore noise in very short phases
+            if ratio > tolerance and seconds - base_seconds > 0.01:
+                flag = '  SLOWER'
+                ok = False
+            print '%-5s %6s %-10s %10.3f %10.3f %7.2fx%s' % (
+                name, '%dx' % scale, phase, seconds, base_seconds, ratio,
+                flag)
+        else:
+            print '%-5s %6s %-10s %10.3f %10s %8s' % (
+                name, '%dx' % scale, phase, seconds, '-', '-')
+
+    if expected and expected['sha1'] != result['sha1']:
+        print '%-5s %6s OUTPUT DIFFERS FROM BASELINE' % (name, '%dx' % scale)
+        ok = False
+
+    return ok
+
+
+class ScraperBenchmark(object):
+    """Run one scraper. Subclasses set :py:attr:`main`, and write
+    synthetic pages in :py:meth:`setup`."""
+
+    def __init__(self, tmp_dir):
+        self.tmp_dir = tmp_dir
+
+    def run(self, scale):
+        """Return ``{'seconds': {phase: seconds}, 'sha1': ...}``."""
+        args = self.setup(scale)
+        out_path = os.path.join(self.tmp_dir, 'out')
+
+        gc.collect()
+        instruments = Instruments()
+        with open(out_path, 'w') as out:
+            instruments.start()
+            try:
+                run_main(self.main, args, out)
+            finally:
+                instruments.stop()
+
+        report = instruments.report()
+        seconds = dict((p['phase'], p['wall']) for p in report['phases'])
+        seconds['main'] = report['wall']
+
+        with open(out_path) as f:
+            sha1 = hashlib.sha1(f.read()).hexdigest()
+
+        return {'seconds': seconds, 'sha1': sha1}
+
+    def write_page(self, name, html):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as f:
+            f.write(html)
+        return path
+
+
+def run_main(main, args, out):
+    """Call a scraper's *main()* with *args* as its command line, and
+    *out* as stdout."""
+    orig_argv, orig_stdout = sys.argv, sys.stdout
+    sys.argv = ['main'] + args
+    sys.stdout = out
+    try:
+        main()
+    finally:
+        sys.argv, sys.stdout = orig_argv, orig_stdout
+
+
+class UHGBenchmark(ScraperBenchmark):
+
+    main = staticmethod(uhg.main)
+
+    def setup(self, scale):
+        return [self.write_page('uhg.html', uhg_page(UHG_HOTELS * scale))]
+
+
+class HRCBenchmark(ScraperBenchmark):
+
+    main = staticmethod(data.main)
+
+    def setup(self, scale):
+        # more rows per page, rather than more pages
+        return write_hrc_pages(os.path.join(self.tmp_dir, 'hrc'),
+                               HRC_CATEGORIES, HRC_ROWS * scale)
+
+
+class EggsBenchmark(ScraperBenchmark):
+
+    main = staticmethod(eggs.main)
+
+    def setup(self, scale):
+        return [self.write_page('eggs.html', eggs_page(EGGS_BRANDS * scale))]
+
+
+SCRAPERS = {
+    'uhg': UHGBenchmark,
+    'hrc': HRCBenchmark,
+    'eggs': EggsBenchmark,
+}
+
+
+if __name__ == '__main__':
+    main()
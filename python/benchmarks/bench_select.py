@@ -0,0 +1,141 @@
+"""Per-row cost of CSS selects, with Tag.select() versus the cached,
+compiled selectors in pbg.common.css.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_select [--rows 1000] [--repeat 5]
+
+Parses a synthetic HRC category page and UNITE HERE page once, then times
+(best of --repeat):
+
+- each selector the parsers use, run on every row (or hotel), both ways
+- parsing every row/hotel with the parsers as they are now ("compiled"),
+  and with pbg.common.css swapped back out for Tag.select(), tag.p-style
+  lookups and td.children ("select")
+
+and checks that both ways get the same results.
+"""
+import time
+from optparse import OptionParser
+
+from bs4.element import Tag
+
+from benchmarks.fixtures import hrc_category_page
+from benchmarks.fixtures import uhg_page
+from pbg.common import css
+from pbg.common.soup import LXML
+from pbg.common.soup import make_soup
+from pbg.hrc.buyersguide import data
+from pbg.unitehere import uhg
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--rows', dest='rows', type='int', default=1000)
+    option_parser.add_option('--repeat', dest='repeat', type='int',
+                             default=5)
+    options, _ = option_parser.parse_args()
+
+    hrc_soup = make_soup(hrc_category_page(1000, options.rows), LXML)
+    content = hrc_soup.select('#content')[0]
+    trs = content.select('table tbody tr')[1:]
+    biz_tds = [tr.select('td')[0] for tr in trs]
+
+    uhg_soup = make_soup(uhg_page(options.rows), LXML)
+
+    print '%-32s %12s %12s %8s' % ('per row', 'select us', 'compiled us',
+                                   'speedup')
+
+    def compare(label, tags, selector):
+        old = time_per_row(
+            lambda: [tag.select(selector) for tag in tags],
+            options.repeat, len(trs))
+        new = time_per_row(
+            lambda: [css.select(tag, selector) for tag in tags],
+            options.repeat, len(trs))
+
+        if ([tag.select(selector) for tag in tags] !=
+                [css.select(tag, selector) for tag in tags]):
+            raise AssertionError('different results for %r' % selector)
+
+        report(label, old, new)
+
+    compare("tr: 'td'", trs, 'td')
+    compare("td: 'p'", biz_tds, 'p')
+    compare("#content: 'table tbody tr'", [content], 'table tbody tr')
+    compare("#content: '> p'", [content], '> p')
+
+    old_lookups = lambda p: (p.a, p.em, p.img)
+    new_lookups = lambda p: tuple(
+        css.first_tags(p, 'a', 'em', 'img')[name]
+        for name in ('a', 'em', 'img'))
+    company_ps = [td.p for td in biz_tds]
+    if map(old_lookups, company_ps) != map(new_lookups, company_ps):
+        raise AssertionError('first_tags() found different tags')
+    report('p: .a, .em, .img',
+           time_per_row(lambda: map(old_lookups, company_ps),
+                        options.repeat, len(trs)),
+           time_per_row(lambda: map(new_lookups, company_ps),
+                        options.repeat, len(trs)))
+
+    def parse_rows():
+        return [data.parse_category_page_tr(tr, 'Category').json()
+                for tr in trs]
+
+    def parse_hotels():
+        return uhg.parse_guide(uhg_soup).json()
+
+    report_parser('HRC parse_category_page_tr', parse_rows,
+                  options.repeat, len(trs))
+    report_parser('UNITE HERE parse_guide', parse_hotels,
+                  options.repeat, options.rows)
+
+
+def report_parser(label, parse, repeat, num_rows):
+    new_result = parse()
+    new = time_per_row(parse, repeat, num_rows)
+
+    with with_tag_select():
+        old_result = parse()
+        old = time_per_row(parse, repeat, num_rows)
+
+    if old_result != new_result:
+        raise AssertionError('%s: different results' % label)
+
+    report(label, old, new)
+
+
+class with_tag_select(object):
+    """Swap the parsers back to Tag.select() and friends."""
+
+    def __enter__(self):
+        self.orig = (data.select, data.first_tags, uhg.select, uhg.child_tags)
+        data.select = uhg.select = lambda tag, selector: tag.select(selector)
+        data.first_tags = lambda tag, *names: dict(
+            (name, getattr(tag, name)) for name in names)
+        uhg.child_tags = lambda tag: (
+            child for child in tag.children if isinstance(child, Tag))
+
+    def __exit__(self, *args):
+        (data.select, data.first_tags,
+         uhg.select, uhg.child_tags) = self.orig
+
+
+def time_per_row(f, repeat, num_rows):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        f()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / num_rows
+
+
+def report(label, old, new):
+    print '%-32s %12.2f %12.2f %7.1fx' % (
+        label, old * 1e6, new * 1e6, old / new)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Load-test the guide server (pbg.server): latency and requests per second
+under concurrent clients.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_server [--judgments 20000] [--clients 1,8,32]
+    [--requests 5000] [--distinct 2000]
+
+Writes a synthetic HRC guide with --judgments judgments, and starts the
+server on it, in a process of its own. Then for each number of --clients,
+each in a thread with its own keep-alive connection, sends --requests
+requests in all, and reports requests per second and the p50 and p99
+latency. Requests are lookups by name, hrcOrgID, or judgmentType, drawn
+from --distinct different queries, some much more popular than others
+(like real traffic). We do this:
+
+- nocache: with the response cache turned off
+- cache: with the cache on (the default)
+- etag: the cache, with clients that send If-None-Match for URLs they've
+  seen before, so they get 304s
+"""
+from __future__ import with_statement
+
+import httplib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_judgment_dicts
+
+
+MODES = ('nocache', 'cache', 'etag')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--judgments', dest='judgments', type='int',
+                             default=20000)
+    option_parser.add_option('--clients', dest='clients', default='1,8,32')
+    option_parser.add_option('--requests', dest='requests', type='int',
+                             default=5000)
+    option_parser.add_option('--distinct', dest='distinct', type='int',
+                             default=2000)
+    option_parser.add_option('--modes', dest='modes',
+                             default=','.join(MODES))
+    options, _ = option_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        guide_path = os.path.join(tmp_dir, 'hrc.json')
+        with open(guide_path, 'w') as f:
+            json.dump({
+                'type': [u'BuyersGuide'],
+                'properties': {
+                    'name': [u"Buyer's Guide"],
+                    'judgment': list(hrc_judgment_dicts(options.judgments)),
+                },
+            }, f)
+
+        urls = query_urls(options.judgments, options.distinct)
+
+        print '%8s %8s %9s %9s %9s' % (
+            'clients', 'mode', 'req/s', 'p50 ms', 'p99 ms')
+
+        for mode in options.modes.split(','):
+            cache_size = 0 if mode == 'nocache' else options.distinct
+            with running_server(guide_path, cache_size) as (host, port):
+                for num_clients in [int(n) for n in
+                                    options.clients.split(',')]:
+                    elapsed, latencies = load(
+                        host, port, urls, num_clients, options.requests,
+                        etags=(mode == 'etag'))
+                    latencies.sort()
+                    print '%8d %8s %9.0f %9.2f %9.2f' % (
+                        num_clients, mode, len(latencies) / elapsed,
+                        percentile(latencies, 50) * 1000,
+                        percentile(latencies, 99) * 1000)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def query_urls(num_judgments, num_distinct, seed=0):
+    """*num_distinct* different query URLs, like the ones
+    hrc_judgment_dicts() makes names and IDs for."""
+    r = random.Random(seed)
+    num_companies = max(1, num_judgments // 4)
+
+    urls = []
+    for _ in xrange(num_distinct):
+        orgid = r.randrange(num_companies)
+        kind = r.randrange(3)
+        if kind == 0:
+            params = {'name': 'company %d' % orgid}
+        elif kind == 1:
+            params = {'hrcOrgID': orgid}
+        else:
+            params = {'judgmentType': r.choice(['Good', 'Mixed', 'Bad']),
+                      'limit': r.randint(1, 20)}
+        urls.append('/judgments?' + urllib.urlencode(params))
+
+    return urls
+
+
+class running_server(object):
+    """Start ``python -m pbg.server`` on *guide_path*, and stop it when
+    done. Yields the host and port it's listening on."""
+
+    def __init__(self, guide_path, cache_size):
+        self._args = [sys.executable, '-m', 'pbg.server', '--port', '0',
+                      '--cache-size', str(cache_size), 'hrc=' + guide_path]
+
+    def __enter__(self):
+        self._proc = subprocess.Popen(self._args, stderr=subprocess.PIPE)
+        line = self._proc.stderr.readline()
+        if not line.startswith('serving on http://'):
+            self._proc.kill()
+            raise Exception('server failed to start: %s' % line)
+        host, port = line.split('//', 1)[1].strip().split(':')
+        return host, int(port)
+
+    def __exit__(self, *args):
+        self._proc.kill()
+        self._proc.wait()
+
+
+def load(host, port, urls, num_clients, num_requests, etags=False):
+    """Send *num_requests* requests from *num_clients* threads, and return
+    the total time taken, and the latency of each request."""
+    latencies = []
+    lock = threading.Lock()
+    per_client = num_requests // num_clients
+
+    def client(seed):
+        r = random.Random(seed)
+        seen = {}  # URL -> ETag
+        conn = httplib.HTTPConnection(host, port)
+        mine = []
+        try:
+            for _ in xrange(per_client):
+                # popular queries are much more popular
+                url = urls[int(len(urls) * r.random() ** 3)]
+                headers = {}
+                if etags and url in seen:
+                    headers['If-None-Match'] = seen[url]
+
+                start = time.time()
+                conn.request('GET', url, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                mine.append(time.time() - start)
+
+                if response.status not in (200, 304):
+                    raise Exception('%s: status %d' % (url, response.status))
+                seen[url] = response.getheader('ETag')
+        finally:
+            conn.close()
+            with lock:
+                latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in xrange(num_clients)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return time.time() - start, latencies
+
+
+def percentile(sorted_values, p):
+    i = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100.0))
+    return sorted_values[i]
+
+
+if __name__ == '__main__':
+    main()
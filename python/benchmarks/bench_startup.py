@@ -0,0 +1,139 @@
+"""How long each command takes to start up, i.e. to print its --help.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_startup [--repeat 10] [--imports] [MODULE ...]
+
+For each command's module (by default, every console script in setup.py),
+runs ``python -m MODULE --help`` --repeat times, and prints the median
+wall time, less the median time of ``python -c pass`` (the interpreter's
+own startup).
+
+With --imports, also prints which top-level imports each command spends
+its time on, like Python 3's ``-X importtime`` (which Python 2 doesn't
+have): we wrap ``__import__`` and time each import, not counting imports
+it triggers that are timed on their own line.
+"""
+from __future__ import with_statement
+
+import os
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+
+COMMANDS = [
+    'pbg.unitehere.uhg',
+    'pbg.cornucopia.eggs',
+    'pbg.hrc.buyersguide.urls',
+    'pbg.hrc.buyersguide.fetch',
+    'pbg.hrc.buyersguide.data',
+    'pbg.hrc.buyersguide.merge',
+    'pbg.common.fetch',
+    'pbg.common.index',
+    'pbg.common.ndjson',
+    'pbg.common.diff',
+    'pbg.common.annotate',
+    'pbg.common.bundle',
+    'pbg.common.resolve',
+    'pbg.pipeline',
+    'pbg.stoprush.stoprush',
+    'pbg.batch',
+    'pbg.guides',
+    'pbg.server',
+]
+
+# run in a fresh interpreter by --imports. Prints one line per import
+# that took at least 1ms: self ms, cumulative ms, and the module name
+# (indented by nesting level)
+IMPORT_TIMER = r'''
+import __builtin__, sys, time
+timings = []
+stack = []
+orig_import = __builtin__.__import__
+
+def timed_import(name, globals=None, locals=None, fromlist=None, level=-1):
+    if name in sys.modules:
+        return orig_import(name, globals, locals, fromlist, level)
+    # from . import x has no name of its own
+    label = name or '.' + ', '.join(fromlist or ())
+    i = len(timings)
+    timings.append(None)
+    stack.append(0.0)
+    start = time.time()
+    try:
+        return orig_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.time() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        timings[i] = (len(stack), label, elapsed - nested, elapsed)
+
+__builtin__.__import__ = timed_import
+import runpy
+sys.argv = [sys.argv[1], '--help']
+try:
+    runpy.run_module(sys.argv[0], run_name='__main__', alter_sys=True)
+except SystemExit:
+    pass
+__builtin__.__import__ = orig_import
+
+for level, name, self_secs, total_secs in timings:
+    if total_secs >= 0.001:
+        sys.stderr.write('%8.1f %8.1f  %s%s\n' % (
+            self_secs * 1000, total_secs * 1000, '  ' * level, name))
+'''
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] [MODULE ...]')
+    option_parser.add_option('--repeat', dest='repeat', type='int',
+                             default=10)
+    option_parser.add_option('--imports', dest='imports', default=False,
+                             action='store_true')
+    options, args = option_parser.parse_args()
+
+    commands = args or COMMANDS
+
+    baseline = median_seconds([sys.executable, '-c', 'pass'],
+                              options.repeat)
+    print '%-28s %10s' % ('python -c pass', '%.1f ms' % (baseline * 1000))
+    print
+    print '%-28s %10s' % ('command', 'startup')
+
+    for module in commands:
+        seconds = median_seconds(
+            [sys.executable, '-m', module, '--help'], options.repeat)
+        print '%-28s %10s' % (
+            module, '%.1f ms' % ((seconds - baseline) * 1000))
+
+    if options.imports:
+        for module in commands:
+            print
+            print '%s:' % module
+            print '%8s %8s  %s' % ('self ms', 'cum ms', 'import')
+            sys.stdout.flush()
+            with open(os.devnull, 'w') as devnull:
+                subprocess.check_call(
+                    [sys.executable, '-c', IMPORT_TIMER, module],
+                    stdout=devnull, stderr=sys.stdout)
+
+
+def median_seconds(args, repeat):
+    times = []
+    with open(os.devnull, 'r+') as devnull:
+        for _ in xrange(repeat):
+            start = time.time()
+            # so a command that reads stdin can't hang waiting for it
+            subprocess.check_call(args, stdin=devnull, stdout=devnull,
+                                  stderr=devnull)
+            times.append(time.time() - start)
+
+    times.sort()
+    return times[len(times) // 2]
+
+
+if __name__ == '__main__':
+    main()
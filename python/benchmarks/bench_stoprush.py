@@ -0,0 +1,153 @@
+"""Rows per second and peak memory of ingesting a StopRush dump a row at a
+time (pbg.stoprush.stoprush), versus loading the whole dump with
+json.load() first.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_stoprush [--rows 50000,200000,1000000]
+    [--modes load,stream,ndjson] [--max-load-rows 200000]
+
+Writes a synthetic dump with each number of --rows, then ingests it each
+way, in a process of its own (so peak RSS is per run), writing the guide
+to a file:
+
+- load: json.load() the dump, then write the guide with every judgment
+  in a list (what we'd do without pbg.common.jsonstream)
+- stream: ``python -m pbg.stoprush.stoprush``
+- ndjson: the same, with --ndjson
+
+load needs a few GB of memory for a million rows, so we skip it for more
+than --max-load-rows. Checks that load and stream write the same guide.
+
+*peak RSS* for stream and ndjson comes from their --report, so it
+includes the (small) cost of timing each row.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import write_stoprush_dump
+
+
+MODES = ('load', 'stream', 'ndjson')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--rows', dest='rows',
+                             default='50000,200000,1000000')
+    option_parser.add_option('--modes', dest='modes',
+                             default=','.join(MODES))
+    option_parser.add_option('--max-load-rows', dest='max_load_rows',
+                             type='int', default=200000)
+    # internal: do a single run of the load mode, in this process
+    option_parser.add_option('--run-load', dest='run_load', default=None,
+                             nargs=2)
+    options, _ = option_parser.parse_args()
+
+    if options.run_load:
+        run_load(*options.run_load)
+        return
+
+    print '%9s %7s %9s %9s %10s %12s' % (
+        'rows', 'mode', 'dump MB', 'seconds', 'rows/s', 'peak RSS MB')
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for num_rows in [int(n) for n in options.rows.split(',')]:
+            dump_path = os.path.join(tmp_dir, 'stoprush.json')
+            with open(dump_path, 'w') as f:
+                write_stoprush_dump(f, num_rows)
+            dump_mb = os.path.getsize(dump_path) / 1024.0 / 1024.0
+
+            digests = {}
+            for mode in options.modes.split(','):
+                if mode == 'load' and num_rows > options.max_load_rows:
+                    continue
+
+                out_path = os.path.join(tmp_dir, mode + '.out')
+                elapsed, peak_kb = RUNS[mode](dump_path, out_path)
+                digests[mode] = sha1(out_path)
+                os.remove(out_path)
+
+                print '%9d %7s %9.1f %9.2f %10.0f %12.1f' % (
+                    num_rows, mode, dump_mb, elapsed, num_rows / elapsed,
+                    peak_kb / 1024.0)
+
+            if ('load' in digests and 'stream' in digests and
+                    digests['load'] != digests['stream']):
+                raise AssertionError(
+                    'stream output differs for %d rows' % num_rows)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def run_mode_load(dump_path, out_path):
+    start = time.time()
+    output = subprocess.check_output([
+        sys.executable, '-m', 'benchmarks.bench_stoprush',
+        '--run-load', dump_path, out_path])
+    elapsed = time.time() - start
+
+    return elapsed, int(output)
+
+
+def run_load(dump_path, out_path):
+    from pbg.common.microdata import write_json
+    from pbg.stoprush.stoprush import make_guide
+    from pbg.stoprush.stoprush import parse_row
+
+    with open(dump_path) as f:
+        dump = json.load(f)
+
+    guide = make_guide()
+    guide.props['judgment'] = [parse_row(row) for row in dump['rows']]
+
+    with open(out_path, 'w') as out:
+        write_json(out, guide)
+
+    print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_stoprush(dump_path, out_path, args=()):
+    report_path = out_path + '.report'
+
+    start = time.time()
+    with open(out_path, 'w') as out:
+        subprocess.check_call(
+            [sys.executable, '-m', 'pbg.stoprush.stoprush',
+             '--report', report_path] + list(args) + [dump_path],
+            stdout=out)
+    elapsed = time.time() - start
+
+    with open(report_path) as f:
+        peak_kb = json.load(f)['peak_rss_kb']
+    os.remove(report_path)
+
+    return elapsed, peak_kb
+
+
+RUNS = {
+    'load': run_mode_load,
+    'stream': run_stoprush,
+    'ndjson': lambda dump_path, out_path: run_stoprush(
+        dump_path, out_path, ['--ndjson']),
+}
+
+
+def sha1(path):
+    with open(path) as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+if __name__ == '__main__':
+    main()
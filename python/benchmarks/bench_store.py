@@ -0,0 +1,215 @@
+"""Time reloading a changed guide (pbg.common.store, with the server's
+GuideQueries), and how long queries wait while it happens.
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_store [--judgments 50000] [--changed 0.01]
+    [--readers 2] [--duration 2]
+
+Writes a synthetic HRC guide with --judgments judgments, then a new
+version with --changed of them changed (and as many each added and
+removed). Reports how long it takes to parse the new version (with
+json.load(), and a judgment at a time, as the store does), and to index
+it from scratch and incrementally (reusing the judgments that didn't
+change), and how many judgments were reused.
+
+Then, with --readers threads querying as fast as they can, reloads the
+new version, and reports how many queries they got done and how long
+they took (p50, p99, max):
+
+- idle: with no reload going on, for comparison
+- locked: reloading under a lock the readers also take, parsing with
+  json.load(), and indexing from scratch, as you would without a store
+- store: reloading with GuideStore, which readers never wait for
+"""
+from __future__ import with_statement
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_judgment_dicts
+from pbg.common.index import read_guide_file
+from pbg.common.store import GuideStore
+from pbg.common.store import read_guide
+from pbg.server import GuideQueries
+
+
+MODES = ('idle', 'locked', 'store')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--judgments', dest='judgments', type='int',
+                             default=50000)
+    option_parser.add_option('--changed', dest='changed', type='float',
+                             default=0.01)
+    option_parser.add_option('--readers', dest='readers', type='int',
+                             default=2)
+    option_parser.add_option('--duration', dest='duration', type='float',
+                             default=2.0)
+    options, _ = option_parser.parse_args()
+
+    old_guide, new_guide = guide_versions(options.judgments, options.changed)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'hrc.json')
+        write_guide(path, old_guide)
+        store = GuideStore({'hrc': path}, build=GuideQueries)
+        write_guide(path, new_guide)
+
+        time_builds(path, store.current)
+
+        print
+        print '%8s %9s %9s %9s %9s %9s' % (
+            'mode', 'reload s', 'queries', 'p50 ms', 'p99 ms', 'max ms')
+
+        for mode in MODES:
+            write_guide(path, old_guide)
+            store = GuideStore({'hrc': path}, build=GuideQueries)
+            write_guide(path, new_guide)
+
+            reload_time, latencies = read_during_reload(
+                store, path, mode, options.readers, options.duration,
+                options.judgments)
+            latencies.sort()
+            print '%8s %9s %9d %9.2f %9.2f %9.2f' % (
+                mode, '%.2f' % reload_time if reload_time else '-',
+                len(latencies), percentile(latencies, 50) * 1000,
+                percentile(latencies, 99) * 1000, latencies[-1] * 1000)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def time_builds(path, previous):
+    start = time.time()
+    read_guide_file(path)
+    print 'parse all at once: %.2f s' % (time.time() - start)
+
+    start = time.time()
+    guide_dict = read_guide(path)
+    print 'parse a judgment at a time: %.2f s' % (time.time() - start)
+
+    start = time.time()
+    GuideQueries({'hrc': guide_dict})
+    print 'index from scratch: %.2f s' % (time.time() - start)
+
+    start = time.time()
+    queries = GuideQueries({'hrc': guide_dict}, previous=previous)
+    print 'index incrementally: %.2f s (%s)' % (
+        time.time() - start, ', '.join(
+            '%d %s' % (queries.stats[k], k) for k in
+            ('reused', 'changed', 'added', 'removed')))
+
+
+def guide_versions(num_judgments, changed, seed=0):
+    """Two versions of a synthetic HRC guide; in the second, *changed*
+    of the judgments have a different judgmentType, and as many have been
+    removed and added."""
+    judgments = list(hrc_judgment_dicts(num_judgments, seed=seed))
+    old_guide = guide_dict(judgments)
+
+    r = random.Random(seed)
+    num_changed = int(num_judgments * changed)
+    new_judgments = json.loads(json.dumps(judgments))  # a deep copy
+
+    for judgment in r.sample(new_judgments, num_changed):
+        props = judgment['properties']
+        props['judgmentType'] = [
+            u'Bad' if props['judgmentType'] != [u'Bad'] else u'Good']
+    for _ in xrange(num_changed):
+        del new_judgments[r.randrange(len(new_judgments))]
+    new_judgments.extend(hrc_judgment_dicts(num_changed, seed=seed + 1))
+
+    return old_guide, guide_dict(new_judgments)
+
+
+def guide_dict(judgments):
+    return {
+        'type': [u'BuyersGuide'],
+        'properties': {
+            'name': [u"Buyer's Guide"],
+            'judgment': judgments,
+        },
+    }
+
+
+def write_guide(path, guide):
+    # a new file, renamed into place, like a scraper would
+    with open(path + '.tmp', 'w') as f:
+        json.dump(guide, f)
+    os.rename(path + '.tmp', path)
+
+
+def read_during_reload(store, path, mode, num_readers, duration,
+                       num_judgments):
+    """Query *store* from *num_readers* threads for *duration* seconds,
+    reloading the guide in *mode* a little way in. Returns how long the
+    reload took (None if we didn't do one), and each query's latency."""
+    latencies = []
+    lock = threading.Lock()
+    stopping = threading.Event()
+
+    # for "locked": what readers use, and the lock on it
+    locked = {'queries': store.current}
+    reload_lock = threading.Lock()
+
+    def reader(seed):
+        r = random.Random(seed)
+        num_companies = max(1, num_judgments // 4)
+        mine = []
+        while not stopping.is_set():
+            params = {'hrcOrgID': unicode(r.randrange(num_companies))}
+            start = time.time()
+            if mode == 'locked':
+                with reload_lock:
+                    locked['queries'].judgments(params)
+            else:
+                store.current.judgments(params)
+            mine.append(time.time() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=reader, args=(i,))
+               for i in xrange(num_readers)]
+    for thread in threads:
+        thread.start()
+
+    start = time.time()
+    time.sleep(duration / 4.0)
+
+    reload_time = None
+    if mode == 'locked':
+        reload_start = time.time()
+        with reload_lock:
+            locked['queries'] = GuideQueries({'hrc': read_guide_file(path)})
+        reload_time = time.time() - reload_start
+    elif mode == 'store':
+        reload_start = time.time()
+        # once to see the change, and once to see it's settled
+        store.check()
+        if not store.check():
+            raise AssertionError('store did not reload %s' % path)
+        reload_time = time.time() - reload_start
+
+    time.sleep(max(0, duration - (time.time() - start)))
+    stopping.set()
+    for thread in threads:
+        thread.join()
+
+    return reload_time, latencies
+
+
+def percentile(sorted_values, p):
+    i = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100.0))
+    return sorted_values[i]
+
+
+if __name__ == '__main__':
+    main()
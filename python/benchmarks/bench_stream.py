@@ -0,0 +1,94 @@
+"""Time and peak memory of parsing a big HRC category page as a tree,
+versus a row at a time (data.py --stream).
+
+usage (from the python/ directory):
+
+python -m benchmarks.bench_stream [--rows 1000,10000,50000]
+
+Each run happens in its own process, so peak RSS is per run. Checks that
+both ways give the same judgments.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from benchmarks.fixtures import hrc_category_page
+from pbg.hrc.buyersguide.data import parse_page
+from pbg.hrc.buyersguide.data import parse_page_streaming
+
+
+MODES = ('tree', 'stream')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option('--rows', dest='rows',
+                             default='1000,10000,50000')
+    # internal: do a single run, in this process
+    option_parser.add_option('--run', dest='run', default=None)
+    options, args = option_parser.parse_args()
+
+    if options.run:
+        run(options.run, args[0])
+        return
+
+    print '%8s %8s %9s %10s %12s' % (
+        'rows', 'mode', 'page MB', 'seconds', 'peak RSS MB')
+
+    for num_rows in [int(n) for n in options.rows.split(',')]:
+        fd, path = tempfile.mkstemp(suffix='.html')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(hrc_category_page(1000, num_rows))
+
+            digests = set()
+            for mode in MODES:
+                output = subprocess.check_output([
+                    sys.executable, '-m', 'benchmarks.bench_stream',
+                    '--run', mode, path])
+                elapsed, peak_kb, digest = output.split()
+                digests.add(digest)
+
+                print '%8d %8s %9.1f %10.2f %12.1f' % (
+                    num_rows, mode, os.path.getsize(path) / 1048576.0,
+                    float(elapsed), int(peak_kb) / 1024.0)
+
+            if len(digests) != 1:
+                raise AssertionError(
+                    'streaming gave different judgments for %d rows' %
+                    num_rows)
+        finally:
+            os.remove(path)
+
+
+def run(mode, path):
+    start = time.time()
+
+    if mode == 'tree':
+        with open(path) as f:
+            _, judgments = parse_page(f.read())
+    else:
+        _, judgments = parse_page_streaming(path)
+
+    # don't hold onto judgments, so we're only measuring parsing
+    sha1 = hashlib.sha1()
+    for judgment in judgments:
+        sha1.update(json.dumps(judgment.json_dict(), sort_keys=True))
+    del judgments
+
+    elapsed = time.time() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print elapsed, peak_kb, sha1.hexdigest()
+
+
+if __name__ == '__main__':
+    main()
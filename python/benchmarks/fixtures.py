@@ -0,0 +1,544 @@
+"""Synthetic pages shaped like the real buyer's guides, for benchmarks.
+
+Names and ratings are made up, but the markup follows what the parsers
+expect, so *scale* can be turned up well past the size of the real
+guides.
+"""
+import json
+import os
+import random
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler
+from BaseHTTPServer import HTTPServer
+from SocketServer import ThreadingMixIn
+
+
+HRC_COLORS = ('green', 'yellow', 'red')
+
+HRC_ABOUT_PAGE = '''<!DOCTYPE html>
+<html><head><title>HRC Buyer's Guide</title></head>
+<body>
+<div id="content">
+<h1>About the Guide</h1>
+<p>Use this guide to support businesses
+   that support equality.</p>
+<p>Ratings are based on the Corporate Equality Index.</p>
+<div class="legislation-box">
+<form action="company.php" method="get">
+<select name="orgid">
+<option selected="selected">by Company</option>
+<option value="1">Company 1</option>
+</select>
+</form>
+<form action="category.php" method="get">
+<select name="catid">
+<option selected="selected">by Category</option>
+%(options)s
+</select>
+</form>
+</div>
+</div>
+</body></html>
+'''
+
+HRC_CATEGORY_PAGE = '''<!DOCTYPE html>
+<html><head><title>%(category)s</title></head>
+<body>
+<div id="content">
+<div class="search"><h2>Search</h2></div>
+<div class="results">
+<h2>%(category)s</h2>
+<table>
+<tbody>
+<tr><td><p><strong>Business</strong></p></td><td><p>Rating</p></td>
+<td><p>Score</p></td></tr>
+%(rows)s
+</tbody>
+</table>
+</div>
+</div>
+</body></html>
+'''
+
+HRC_ROW = '''<tr>
+<td><p><a href="company.php?catid=%(catid)d&amp;orgid=%(orgid)d"><strong>%(company)s</strong></a>%(partner)s%(no_survey)s</p>%(brands)s</td>
+<td><img src="/images/buyersguide/%(color)s.gif" alt=""></td>
+<td><p>%(rank)d</p></td>
+</tr>'''
+
+
+def hrc_category_ids(num_categories):
+    return [1000 + i for i in xrange(num_categories)]
+
+
+def hrc_about_page(num_categories=20):
+    options = '\n'.join(
+        '<option value="%d">Category %d</option>' % (catid, catid)
+        for catid in hrc_category_ids(num_categories))
+    return HRC_ABOUT_PAGE % dict(options=options)
+
+
+def hrc_category_page(catid, num_rows=100, seed=None):
+    """A category page with *num_rows* companies. Company *n* is the same
+    company across all category pages, so merging has work to do."""
+    r = random.Random(catid if seed is None else seed)
+
+    rows = []
+    for _ in xrange(num_rows):
+        orgid = r.randrange(num_rows * 5)
+        num_brands = r.randrange(4)
+        partner_brand = num_brands and r.random() < 0.1
+
+        brands = ''
+        if num_brands:
+            brand_parts = []
+            for i in xrange(num_brands):
+                if partner_brand and i == 0:
+                    brand_parts.append(
+                        '<img src="/images/buyersguide/blue.gif">')
+                brand_parts.append(
+                    'Brand %d-%d-%d' % (orgid, catid, i))
+                brand_parts.append('<br>')
+            brands = '<p>%s</p>' % '\n'.join(brand_parts)
+
+        rows.append(HRC_ROW % dict(
+            catid=catid,
+            orgid=orgid,
+            company='Company %d &amp; Sons' % orgid,
+            partner=(' <img src="/images/buyersguide/blue.gif">'
+                     if orgid % 17 == 0 else ''),
+            no_survey=' <em>*</em>' if orgid % 11 == 0 else '',
+            brands=brands,
+            color=HRC_COLORS[orgid % 3],
+            rank=orgid % 101,
+        ))
+
+    return HRC_CATEGORY_PAGE % dict(
+        category='Category %d' % catid, rows='\n'.join(rows))
+
+
+def write_hrc_pages(dest_dir, num_categories=20, num_rows=100):
+    """Write a main page and *num_categories* category pages to
+    *dest_dir*, and return their paths (main page first)."""
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+
+    paths = [os.path.join(dest_dir, 'hrc.html')]
+    with open(paths[0], 'w') as f:
+        f.write(hrc_about_page(num_categories))
+
+    for catid in hrc_category_ids(num_categories):
+        path = os.path.join(dest_dir, 'category.php?catid=%d.html' % catid)
+        with open(path, 'w') as f:
+            f.write(hrc_category_page(catid, num_rows))
+        paths.append(path)
+
+    return paths
+
+
+def hrc_site(num_categories=20, num_rows=100):
+    """A function from URL path to page, for :py:func:`serve`: ``/`` is
+    the main page, and ``/category.php?catid=...`` are category pages,
+    made as they're requested."""
+    catids = set(hrc_category_ids(num_categories))
+
+    def get_page(path):
+        if path == '/':
+            return hrc_about_page(num_categories)
+        elif path.startswith('/category.php?catid='):
+            catid = int(path.split('=', 1)[1])
+            if catid in catids:
+                return hrc_category_page(catid, num_rows)
+        return None
+
+    return get_page
+
+
+def dir_site(dir_path, index='hrc.html'):
+    """A function from URL path to page, for :py:func:`serve`, that reads
+    ``<dir_path>/<path>.html`` (as written by pbg.hrc.buyersguide.fetch),
+    and *index* for ``/``."""
+    def get_page(path):
+        if path == '/':
+            file_path = os.path.join(dir_path, index)
+        else:
+            file_path = os.path.join(dir_path, path.lstrip('/') + '.html')
+
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path) as f:
+            return f.read()
+
+    return get_page
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(get_page, latency=0.0):
+    """Serve pages over HTTP on localhost, from a background thread, as a
+    stand-in for a guide's real site. *get_page(path)* returns the HTML
+    for a path (including its query string), or ``None`` for a 404. Each
+    response waits *latency* seconds first, like a real network would.
+
+    Returns the server; its root URL is ``server.url``. Call
+    ``server.shutdown()`` when done.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            body = get_page(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.url = 'http://127.0.0.1:%d' % server.server_address[1]
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+
+def hrc_judgment_dicts(num_judgments, num_companies=None, seed=0):
+    """Yield unmerged HRC judgments (as microdata JSON, like the lines of
+    ``data.py --ndjson``), spread over *num_companies* companies (by
+    default, a quarter as many as judgments)."""
+    r = random.Random(seed)
+    num_companies = num_companies or max(1, num_judgments // 4)
+
+    for _ in xrange(num_judgments):
+        orgid = r.randrange(num_companies)
+        catid = 1000 + r.randrange(50)
+        category = u'Category %d' % catid
+        rank = orgid % 101
+
+        brands = [{
+            'type': [u'Brand'],
+            'properties': {
+                'name': [u'Brand %d-%d-%d' % (orgid, catid, i)],
+                'category': [category],
+            },
+            'extra': {'hrcCategoryID': unicode(catid)},
+        } for i in xrange(r.randrange(4))]
+
+        target = {
+            'type': [u'Corporation'],
+            'properties': {
+                'name': [u'Company %d' % orgid],
+                'category': [category],
+            },
+            'extra': {'hrcOrgID': unicode(orgid),
+                      'hrcCategoryID': [unicode(catid)]},
+        }
+        if brands:
+            target['properties']['brand'] = brands
+
+        yield {
+            'type': [u'Judgment'],
+            'properties': {
+                'target': [target],
+                'judgmentType': [(u'Good', u'Mixed', u'Bad')[orgid % 3]],
+                'name': [u'%d out of 100' % rank],
+            },
+            'extra': {
+                'rank': rank,
+                'isHrcPartner': False,
+                'respondedToSurvey': True,
+            },
+        }
+
+
+UHG_PAGE = '''<%% @LANGUAGE="VBSCRIPT" CODEPAGE="65001" %%>
+<!-- %(asp_comment)s -->
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html><head><title>Hotel Guide</title></head>
+<body>
+<table><tr><td>
+<h1>Union Hotel Guide</h1>
+<div>
+<table>
+<tr>
+<td>
+%(left)s
+</td>
+<td>
+%(right)s
+</td>
+</tr>
+<tr><td colspan="2">&nbsp;</td></tr>
+</table>
+</div>
+<p class="copyright">Copyright &copy; 2013 UNITE HERE</p>
+</td></tr></table>
+</body></html>
+'''
+
+UHG_CATEGORIES = ('Please Patronize', 'Risk of Dispute', 'On Strike',
+                  'Boycott These Properties')
+
+REGIONS = ('CA', 'NY', 'IL', 'ON', 'BC', 'MA', 'TX')
+
+
+def uhg_hotel_p(r, i, category):
+    name = 'Hotel %d' % i
+    if category == 'On Strike':
+        name += ' - ON STRIKE'
+    lines = [name]
+    has_street = r.random() < 0.8
+    if has_street:
+        lines.append('%d Main Street' % (100 + i))
+    lines.append('City %d, %s %05d' % (i % 50, REGIONS[i % len(REGIONS)],
+                                       i % 100000))
+    # phone numbers only appear after a street address
+    if has_street and r.random() < 0.7:
+        lines.append('Phone: (555) 555-%04d' % (i % 10000))
+    return '<p>%s</p>' % '<br />\n'.join(lines)
+
+
+def uhg_page(num_hotels=200, seed=0):
+    """UNITE HERE's results.php, with *num_hotels* hotels spread over the
+    four categories (and the ASP junk at the top that the parser skips).
+    """
+    r = random.Random(seed)
+    columns = ([], [])
+    per_category = max(1, num_hotels // len(UHG_CATEGORIES))
+    i = 0
+    for c, category in enumerate(UHG_CATEGORIES):
+        column = columns[c % 2]
+        column.append('<h3> %s </h3>' % category)
+        for _ in xrange(per_category):
+            column.append(uhg_hotel_p(r, i, category))
+            i += 1
+    return UHG_PAGE % dict(asp_comment='x' * 2000,
+                           left='\n'.join(columns[0]),
+                           right='\n'.join(columns[1]))
+
+
+EGGS_PAGE = '''<!DOCTYPE html>
+<html><head><title>Organic Egg Scorecard</title></head>
+<body>
+<div id="header"><a href="/">The Cornucopia Institute</a></div>
+<table><tr><td>
+<table><tr><td><span class="style26">Organic Egg Scorecard</span></td></tr></table>
+</td></tr></table>
+<table id="organic-egg-scorecard">
+<tr><th>Brand</th><th>Rating</th><th>Location</th><th>Market</th><th>Score</th><th>Notes</th></tr>
+%(rows)s
+</table>
+<div id="footer">
+<a href="http://www.cornucopia.org/">Home</a>
+<div><a href="http://www.cornucopia.org/donate/">Donate</a></div>
+</div>
+</body></html>
+'''
+
+EGGS_RATING_ROW = '''<tr><td colspan="6"><strong>(%(rating)d) %(label)s</strong> <normal>%(description)s</normal></td></tr>'''
+
+EGGS_BRAND_ROW = '''<tr>
+<td><a href="http://example.com/brand/%(i)d">Brand %(i)d</a> <i>by Farm %(i)d, Inc.</i></td>
+<td>%(score)d</td>
+<td>%(location)s</td>
+<td>%(market)s</td>
+<td>%(score)d</td>
+<td></td>
+</tr>'''
+
+EGGS_LABELS = {5: 'Exemplary', 4: 'Excellent', 3: 'Very Good',
+               2: 'Fair', 1: 'Ethically Deficient'}
+
+
+def eggs_page(num_brands=100, seed=0):
+    """Cornucopia's egg scorecard, with *num_brands* brands spread over
+    the five ratings."""
+    r = random.Random(seed)
+    rows = []
+    per_rating = max(1, num_brands // 5)
+    i = 0
+    for rating in (5, 4, 3, 2, 1):
+        rows.append(EGGS_RATING_ROW % dict(
+            rating=rating, label=EGGS_LABELS[rating],
+            description='Brands rated %d eggs.' % rating))
+        for _ in xrange(per_rating):
+            rows.append(EGGS_BRAND_ROW % dict(
+                i=i, score=r.randrange(2400),
+                location='Town %d, %s' % (i, REGIONS[i % len(REGIONS)])
+                if r.random() < 0.8 else '',
+                market='Region %d' % (i % 7) if r.random() < 0.8 else ''))
+            i += 1
+    return EGGS_PAGE % dict(rows='\n'.join(rows))
+
+
+STOPRUSH_STATEMENTS = (
+    '',
+    '',
+    '',
+    '<a href="/statements/%(i)d.html">We have pulled our ads</a>',
+    'Ads were run without our knowledge &amp; have been stopped.',
+)
+
+
+def write_stoprush_dump(f, num_rows=50000, seed=0):
+    """Write a StopRush flexigrid dump with *num_rows* advertisers to the
+    file object *f*, a row at a time (so *num_rows* can be in the
+    millions)."""
+    r = random.Random(seed)
+    f.write('{"page":1,"total":%d,"rows":[' % num_rows)
+    for i in xrange(num_rows):
+        if i:
+            f.write(',')
+        statement = r.choice(STOPRUSH_STATEMENTS) % dict(i=i)
+        f.write(json.dumps({
+            'id': str(i + 1),
+            'cell': ['<a href="/sponsors/%d">Advertiser %d, Inc.</a>' % (
+                         i, i),
+                     '2012-%02d-%02d' % (r.randrange(1, 13),
+                                         r.randrange(1, 29)),
+                     statement]}))
+    f.write(']}')
+
+
+# names are made of syllables, like "Belmar"
+NAME_ONSETS = ('', 'b', 'br', 'c', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm',
+               'n', 'p', 'qu', 'r', 's', 'st', 't', 'tr', 'v', 'w', 'z')
+NAME_VOWELS = ('a', 'e', 'i', 'o', 'u', 'ai', 'ea', 'oo')
+NAME_CODAS = ('', '', 'l', 'm', 'n', 'r', 's', 'x', 'nd', 'st')
+NAME_WORDS = ('Foods', 'International', 'Hotels', 'Resorts', 'Brands',
+              'Group', 'Holdings', 'Industries', 'Motors', 'Pharma',
+              'Airlines', 'Energy', 'Apparel', 'Media', 'Bank')
+NAME_SUFFIXES = ('', '', ', Inc.', ' Inc', ' Corp.', ' Corporation',
+                 ' Company', ' Co.', ' LLC', ' Ltd.')
+
+
+def company_names(num_names, seed=0):
+    """Yield ``(name, entity_num)`` for *num_names* made-up company names,
+    about three to an entity. Names for the same entity vary the way
+    they do between guides: suffixes like "Inc.", case, "&" for "and",
+    a leading "The", and the odd typo."""
+    r = random.Random(seed)
+    num_entities = max(1, num_names // 3)
+
+    def word():
+        return ''.join(
+            r.choice(NAME_ONSETS) + r.choice(NAME_VOWELS) +
+            r.choice(NAME_CODAS)
+            for _ in xrange(r.randint(2, 3))).capitalize()
+
+    entities = []
+    for i in xrange(num_entities):
+        words = [word() for _ in xrange(r.randint(1, 2))]
+        if r.random() < 0.6:
+            words.append(r.choice(NAME_WORDS))
+        if r.random() < 0.2:
+            words.insert(len(words) // 2, r.choice(('&', 'and')))
+        if r.random() < 0.05:
+            words.append(str(r.randint(1, 99)))
+        entities.append(words)
+
+    for _ in xrange(num_names):
+        entity_num = r.randrange(num_entities)
+        words = list(entities[entity_num])
+
+        if r.random() < 0.3:
+            words = [{'&': 'and', 'and': '&'}.get(w, w) for w in words]
+        if r.random() < 0.15:
+            # typo: swap two letters, or drop one
+            i = r.randrange(len(words))
+            w = words[i]
+            if len(w) >= 5:
+                j = r.randrange(1, len(w) - 1)
+                if r.random() < 0.5:
+                    w = w[:j] + w[j + 1] + w[j] + w[j + 2:]
+                else:
+                    w = w[:j] + w[j + 1:]
+                words[i] = w
+
+        name = ' '.join(words) + r.choice(NAME_SUFFIXES)
+        if r.random() < 0.1:
+            name = 'The ' + name
+        if r.random() < 0.1:
+            name = name.upper()
+
+        yield name, entity_num
+
+
+LISTING_WORDS = ('the', 'and', 'with', 'for', 'new', 'pack', 'of', 'free',
+                 'shipping', 'stainless', 'steel', 'organic', 'cotton',
+                 'wireless', 'black', 'large', 'kitchen', 'coffee', 'oz',
+                 'count', 'by', 'from', 'customer', 'reviews', 'stars')
+LISTING_ITEM = u'''<div class="s-result-item" data-asin="B%(asin)08d">
+<a class="a-link-normal" href="/dp/B%(asin)08d"><img src="/images/I/%(asin)d.jpg" alt=""></a>
+<h2 class="a-size-medium">%(title)s</h2>
+<span class="a-size-small">by %(brand)s</span>
+<span class="a-price"><span class="a-offscreen">$%(price)d.99</span></span>
+<script type="text/javascript">P.when('A').execute(function(A) { A.trigger('item', %(asin)d); });</script>
+</div>
+'''
+
+
+def listing_page(names, num_items=1000, seed=0):
+    """A page of search results, like a shopping site's, with *num_items*
+    products. Each product's title is made-up words, and about a third of
+    them mention a name from *names* (as do the brand lines)."""
+    r = random.Random(seed)
+
+    items = []
+    for i in xrange(num_items):
+        words = [r.choice(LISTING_WORDS) for _ in xrange(r.randint(6, 14))]
+        if r.random() < 0.3:
+            words.insert(r.randrange(len(words)), r.choice(names))
+        items.append(LISTING_ITEM % dict(
+            asin=i, title=' '.join(words).replace('&', '&amp;'),
+            brand=r.choice(names).replace('&', '&amp;'),
+            price=r.randint(1, 200)))
+
+    return (u'<!DOCTYPE html>\n<html><head><title>Results</title></head>'
+            u'\n<body>\n%s</body></html>\n' % ''.join(items))
+
+
+SITE_HEADER = '''<div id="header">
+<script type="text/javascript">var _gaq = _gaq || []; _gaq.push(['_trackPageview']);</script>
+<ul class="nav">
+%(links)s
+</ul>
+</div>
+'''
+
+SITE_FOOTER = '''<div id="footer">
+<ul class="sitemap">
+%(links)s
+</ul>
+</div>
+'''
+
+
+def with_site_chrome(html, num_links=1000):
+    """Wrap the body of *html* in a header and footer with *num_links*
+    links each, like the navigation and sitemaps on the real sites. None
+    of the parsers need any of it."""
+    links = '\n'.join(
+        '<li><a href="/section/%d/">Section %d</a></li>' % (i, i)
+        for i in xrange(num_links))
+
+    head, body = html.split('<body>', 1)
+    body, tail = body.rsplit('</body>', 1)
+
+    return ''.join([head, '<body>', SITE_HEADER % dict(links=links), body,
+                    SITE_FOOTER % dict(links=links), '</body>', tail])
@@ -0,0 +1,338 @@
+"""Scrape several guides at once, in a pool of worker processes.
+
+usage:
+
+python -m pbg.batch [-j 4] [--summary summary.json] batch.json
+
+where batch.json lists the guides to run (see :py:mod:`pbg.guides`), the
+arguments to give each one, and where to write it::
+
+    [
+      {"guide": "uhg", "args": ["uhg.html"], "out": "out/uhg.json",
+       "timeout": 60},
+      {"guide": "eggs", "args": ["eggs.html"], "out": "out/eggs.html"},
+      {"guide": "hrc-pages", "args": ["hrc.html", "hrc-pages/*.html"],
+       "out": "out/hrc.json", "timeout": 600}
+    ]
+
+Arguments containing ``*`` or ``?`` are expanded like a shell would.
+
+This replaces running each guide's ``python -m`` from cron one after
+another. The guides' modules, and what they import lazily once they start
+parsing (bs4, html5lib, lxml, etc.; see :py:mod:`pbg.common.lazy`), are
+imported once, before the workers start, rather than once per guide.
+
+Each guide runs in a worker process of its own, so a guide that fails,
+crashes, or runs past its timeout (--timeout, or ``timeout`` in the batch
+file) doesn't stop the others. Its worker is replaced with a fresh one,
+and its output file is left as it was; output is only written once a
+guide finishes successfully.
+
+Once everything's done, we print a summary of how long each guide took
+and how many judgments it wrote, and exit with status 1 if any guide
+failed.
+"""
+from __future__ import with_statement
+
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from optparse import OptionParser
+
+from pbg.common.instrument import Instruments
+from pbg.common.soup import LXML
+from pbg.common.soup import default_parser
+from pbg.guides import get_guide
+from pbg.guides import load_main
+
+
+Job = namedtuple('Job', ['guide', 'args', 'out', 'timeout'])
+
+# status is 'ok', 'failed', or 'timeout'
+JobResult = namedtuple(
+    'JobResult',
+    ['job', 'status', 'seconds', 'judgments', 'out_bytes', 'error'])
+
+# how often to check on running jobs, in seconds
+POLL_INTERVAL = 0.05
+
+# what the guides import lazily, once they start parsing. lxml is
+# imported too, if it's the default parser.
+PRELOAD_MODULES = (
+    'bs4', 'html5lib', 'microdata', 'pyassert', 'pbg.common.microdata')
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] BATCH_FILE')
+    option_parser.add_option(
+        '-j', '--jobs', dest='jobs', type='int', default=None,
+        help='Number of guides to run at once (default: number of CPUs)')
+    option_parser.add_option(
+        '--timeout', dest='timeout', type='float', default=None,
+        help=('Seconds to give each guide that has no timeout of its own'
+              ' (default: no limit)'))
+    option_parser.add_option(
+        '--summary', dest='summary', default=None, metavar='PATH',
+        help='Also write the summary to PATH, as JSON')
+    options, args = option_parser.parse_args()
+    if len(args) != 1:
+        option_parser.error('need exactly one batch file')
+
+    with open(args[0]) as f:
+        jobs = read_jobs(f, default_timeout=options.timeout)
+
+    start = time.time()
+    results = []
+    for result in run_batch(jobs, num_workers=options.jobs):
+        results.append(result)
+        if result.error:
+            sys.stderr.write('%s: %s\n%s' % (
+                result.job.guide, result.status, result.error))
+
+    summary = summarize(results, time.time() - start)
+    write_summary(sys.stderr, summary)
+
+    if options.summary:
+        with open(options.summary, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if summary['failed']:
+        sys.exit(1)
+
+
+def read_jobs(f, default_timeout=None):
+    """Read a batch file (see the module docstring) from *f*, and return
+    a list of :py:class:`Job`\ s. Raises ``ValueError`` if a job is for a
+    guide we don't know about."""
+    jobs = []
+
+    for d in json.load(f):
+        guide = get_guide(d['guide'])
+
+        args = []
+        for arg in d.get('args', []):
+            if '*' in arg or '?' in arg:
+                args.extend(sorted(glob.glob(arg)))
+            else:
+                args.append(arg)
+
+        jobs.append(Job(guide.name, args, d['out'],
+                        d.get('timeout', default_timeout)))
+
+    return jobs
+
+
+def run_batch(jobs, num_workers=None):
+    """Run *jobs* on *num_workers* worker processes (by default, one per
+    CPU), and yield a :py:class:`JobResult` for each, as they finish.
+    """
+    # import every guide's module, and what they'll import once they
+    # start parsing, now, so each worker doesn't have to
+    for job in jobs:
+        load_main(get_guide(job.guide))
+    preload()
+
+    num_workers = min(num_workers or multiprocessing.cpu_count(), len(jobs))
+
+    todo = list(reversed(jobs))
+    idle = [_Worker() for _ in xrange(num_workers)]
+    busy = []
+
+    try:
+        while todo or busy:
+            while todo and idle:
+                worker = idle.pop()
+                worker.start_job(todo.pop())
+                busy.append(worker)
+
+            finished = False
+            for worker in list(busy):
+                result = worker.poll()
+                if result is None:
+                    continue
+
+                finished = True
+                busy.remove(worker)
+                if result.status != 'ok':
+                    # don't trust whatever state the guide left behind
+                    worker.stop()
+                    worker.remove_output()
+                    worker = _Worker()
+                idle.append(worker)
+
+                yield result
+
+            if not finished:
+                time.sleep(POLL_INTERVAL)
+    finally:
+        for worker in idle + busy:
+            worker.stop()
+
+
+def preload():
+    """Import :py:data:`PRELOAD_MODULES`, and lxml if it's the default
+    parser."""
+    for module_name in PRELOAD_MODULES:
+        __import__(module_name)
+    if default_parser() == LXML:
+        __import__('lxml.etree')
+
+
+class _Worker(object):
+    """A worker process, which runs one job at a time."""
+
+    def __init__(self):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_work, args=(child_conn,))
+        self._process.daemon = True
+        self._process.start()
+
+        self.job = None
+        self._started = None
+
+    def start_job(self, job):
+        self.job = job
+        self._started = time.time()
+        self._conn.send(job)
+
+    def poll(self):
+        """Return the current job's :py:class:`JobResult` if it's done (or
+        has timed out), else ``None``."""
+        seconds = time.time() - self._started
+
+        if self._conn.poll():
+            try:
+                return self._conn.recv()
+            except EOFError:
+                return JobResult(self.job, 'failed', seconds, None, None,
+                                 'worker died (exit code %s)\n' %
+                                 self._process.exitcode)
+
+        if self.job.timeout is not None and seconds > self.job.timeout:
+            return JobResult(self.job, 'timeout', seconds, None, None,
+                             'timed out after %.1fs\n' % seconds)
+
+        return None
+
+    def remove_output(self):
+        """Remove the current job's partly written output, if any."""
+        tmp_path = _tmp_path(self.job.out, self._process.pid)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def stop(self):
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+        self._conn.close()
+
+
+def _work(conn):
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+
+        conn.send(run_job(job))
+
+
+def run_job(job):
+    """Run one :py:class:`Job` in this process, and return its
+    :py:class:`JobResult`."""
+    guide = get_guide(job.guide)
+    main = load_main(guide)
+
+    out_dir = os.path.dirname(os.path.abspath(job.out))
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    tmp_path = _tmp_path(job.out, os.getpid())
+
+    instruments = Instruments(guide.module)
+    orig_argv, orig_stdout = sys.argv, sys.stdout
+    error = None
+
+    start = time.time()
+    try:
+        with open(tmp_path, 'w') as out:
+            sys.argv = [guide.module] + guide.args + job.args
+            sys.stdout = out
+            instruments.start()
+            try:
+                main()
+            finally:
+                instruments.stop()
+                sys.argv, sys.stdout = orig_argv, orig_stdout
+    except SystemExit, e:
+        if e.code:
+            error = 'exited with status %r\n' % (e.code,)
+    except Exception:
+        error = traceback.format_exc()
+    seconds = time.time() - start
+
+    if error:
+        os.remove(tmp_path)
+        return JobResult(job, 'failed', seconds, None, None, error)
+
+    os.rename(tmp_path, job.out)
+
+    return JobResult(job, 'ok', seconds,
+                     instruments.counts.get('judgments'),
+                     os.path.getsize(job.out), None)
+
+
+def _tmp_path(out, pid):
+    # where the worker with *pid* writes output before it's done
+    return '%s.tmp-%d' % (out, pid)
+
+
+def summarize(results, seconds):
+    """Summarize *results* (a list of :py:class:`JobResult`) of a batch
+    that took *seconds*, as a dict."""
+    guides = []
+    for result in results:
+        guides.append({
+            'guide': result.job.guide,
+            'out': result.job.out,
+            'status': result.status,
+            'seconds': result.seconds,
+            'judgments': result.judgments,
+            'out_bytes': result.out_bytes,
+        })
+
+    ok = [r for r in results if r.status == 'ok']
+    judgments = sum(r.judgments or 0 for r in ok)
+
+    return {
+        'seconds': seconds,
+        'ok': len(ok),
+        'failed': len(results) - len(ok),
+        'judgments': judgments,
+        'judgments_per_second': judgments / seconds if seconds else None,
+        'guides': guides,
+    }
+
+
+def write_summary(out, summary):
+    out.write('%-10s %-8s %8s %10s %10s\n' % (
+        'guide', 'status', 'seconds', 'judgments', 'bytes'))
+    for g in summary['guides']:
+        out.write('%-10s %-8s %8.2f %10s %10s\n' % (
+            g['guide'], g['status'], g['seconds'],
+            '-' if g['judgments'] is None else g['judgments'],
+            '-' if g['out_bytes'] is None else g['out_bytes']))
+
+    out.write('%d ok, %d failed, %d judgments in %.2fs (%.1f/s)\n' % (
+        summary['ok'], summary['failed'], summary['judgments'],
+        summary['seconds'], summary['judgments_per_second'] or 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""Find what the guides say about the companies, brands, and hotels named
+in a web page.
+
+usage:
+
+python -m pbg.common.annotate hrc.json uhg.json eggs.html < page.html
+python -m pbg.common.annotate --text hrc.json < page.txt
+
+Guides can be anything :py:func:`~pbg.common.index.read_guide_file`
+reads. Prints one line of JSON for each name found in the page: where it
+starts and ends (offsets into the page, in characters), its text, and
+every match (see :py:func:`~pbg.common.index.iter_matches`) for that
+name, with the judgment as *judgment*, like :py:mod:`pbg.common.index`.
+
+We build an Aho-Corasick automaton over the words of every name, and
+then scan each of the page's text nodes once, a word at a time, so this
+takes time linear in the size of the page however many names there are.
+Names match regardless of case and whitespace, and only on whole words:
+"Gap" matches "the GAP store" but not "gapping". Where names overlap, we
+report the leftmost, longest one ("Marriott Marquis", not "Marriott").
+"""
+import json
+import re
+import sys
+from HTMLParser import HTMLParser
+from optparse import OptionParser
+
+from pbg.common.index import iter_matches
+from pbg.common.index import read_guide_file
+
+
+# the types of thing we look for (see iter_matches())
+DEFAULT_TYPES = ('Brand', 'Corporation', 'Company', 'Hotel')
+
+# tags, comments, and scripts and styles (whose contents aren't text).
+# We match against lowercased HTML.
+MARKUP_RE = re.compile(
+    r'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<[a-z/!?][^>]*>', re.DOTALL)
+
+# words, entities, and other characters that aren't whitespace. Also
+# lowercased.
+TOKEN_RE = re.compile(r'&(?:#[0-9]+|#x[0-9a-f]+|[a-z][a-z0-9]*);|\w+|[^\w\s]',
+                      re.UNICODE)
+
+_html_parser = HTMLParser()
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] GUIDE... < PAGE')
+    option_parser.add_option(
+        '--text', dest='text', default=False, action='store_true',
+        help='Page is plain text, not HTML')
+    option_parser.add_option(
+        '--encoding', dest='encoding', default='utf_8',
+        help='Encoding of the page (default %default)')
+    option_parser.add_option(
+        '--types', dest='types', default=','.join(DEFAULT_TYPES),
+        help='Comma-separated types of thing to look for (default %default)')
+    options, args = option_parser.parse_args()
+    if not args:
+        option_parser.error('need at least one guide')
+
+    annotator = Annotator([read_guide_file(path) for path in args],
+                          types=options.types.split(','))
+
+    page = sys.stdin.read().decode(options.encoding, 'replace')
+    if options.text:
+        annotations = annotator.annotate_text(page)
+    else:
+        annotations = annotator.annotate(page)
+
+    for annotation in annotations:
+        print json.dumps(annotation, sort_keys=True)
+
+
+def tokenize(text, pos=0, endpos=None):
+    """Yield ``(token, start, end)`` for each word (or other character that
+    isn't whitespace) in the lowercased string *text*, between *pos* and
+    *endpos*. Entities are decoded; ones that decode to whitespace (like
+    ``&nbsp;``) are skipped."""
+    if endpos is None:
+        endpos = len(text)
+
+    for m in TOKEN_RE.finditer(text, pos, endpos):
+        token = m.group()
+        if token[0] == '&' and len(token) > 1:
+            token = _unescape(token)
+            if token.isspace():
+                continue
+        yield token, m.start(), m.end()
+
+
+def _unescape(entity):
+    return _html_parser.unescape(entity).lower()
+
+
+class Annotator(object):
+    """Find names from *guide_dicts* (see
+    :py:func:`~pbg.common.index.iter_matches`) of one of *types* in
+    pages. You can also :py:meth:`add` names yourself.
+    """
+
+    def __init__(self, guide_dicts=(), types=DEFAULT_TYPES):
+        # for each name (as a tuple of tokens), its number
+        self._name_nums = {}
+        # for each name number: its length in tokens, and values
+        self._lengths = []
+        self._values = []
+
+        self._goto = None  # not built yet
+
+        types = set(types)
+        for guide_dict in guide_dicts:
+            for match, judgment in iter_matches(guide_dict):
+                if not isinstance(match['name'], basestring):
+                    continue
+                if not types.intersection((match['type'] or '').split()):
+                    continue
+
+                match = dict(match)
+                match['judgment'] = judgment
+                self.add(match['name'], match)
+
+    def __len__(self):
+        """The number of distinct names."""
+        return len(self._values)
+
+    def add(self, name, value):
+        """Report *value* wherever *name* is found."""
+        tokens = tuple(t for t, _, _ in tokenize(name.lower()))
+        if not tokens:
+            return
+
+        num = self._name_nums.get(tokens)
+        if num is None:
+            num = self._name_nums[tokens] = len(self._values)
+            self._lengths.append(len(tokens))
+            self._values.append([])
+        self._values[num].append(value)
+
+        self._goto = None
+
+    def annotate(self, html):
+        """Find names in the text of *html*, a string.
+
+        Returns a list of dicts with the ``start`` and ``end`` of each name
+        found (offsets into *html*), its ``text`` (as it appears in
+        *html*), and ``matches``, the values added for it. In order by
+        ``start``.
+        """
+        lowered = html.lower()
+
+        found = []
+        pos = 0
+        for m in MARKUP_RE.finditer(lowered):
+            if m.start() > pos:
+                self._scan(lowered, pos, m.start(), found)
+            pos = m.end()
+        if pos < len(lowered):
+            self._scan(lowered, pos, len(lowered), found)
+
+        return self._annotations(html, found)
+
+    def annotate_text(self, text):
+        """Like :py:meth:`annotate`, but for plain text."""
+        found = []
+        self._scan(text.lower(), 0, len(text), found)
+        return self._annotations(text, found)
+
+    def _build(self):
+        # the trie: for each state, a dict from token to the next state
+        goto = [{}]
+        # for each state, the numbers of the names that end there
+        out = [[]]
+
+        for tokens, num in self._name_nums.iteritems():
+            state = 0
+            for token in tokens:
+                next_state = goto[state].get(token)
+                if next_state is None:
+                    next_state = goto[state][token] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = next_state
+            out[state].append(num)
+
+        # failure links, breadth first: the state for the longest proper
+        # suffix of this state's tokens that's also in the trie
+        fail = [0] * len(goto)
+        queue = goto[0].values()
+        for state in queue:  # appending to the list as we go
+            for token, next_state in goto[state].iteritems():
+                f = fail[state]
+                while f and token not in goto[f]:
+                    f = fail[f]
+                fail[next_state] = goto[f].get(token, 0)
+                # names that end at the suffix end here too
+                out[next_state].extend(out[fail[next_state]])
+                queue.append(next_state)
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(nums) for nums in out]
+
+    def _scan(self, text, pos, endpos, found):
+        # add (start, end, name number) to *found* for each name in
+        # text[pos:endpos]. *text* must already be lowercased.
+        if self._goto is None:
+            self._build()
+
+        goto = self._goto
+        root = goto[0]
+        fail = self._fail
+        out = self._out
+        lengths = self._lengths
+
+        state = 0
+        starts = []  # where each token starts
+        for m in TOKEN_RE.finditer(text, pos, endpos):
+            token = m.group()
+            if token[0] == '&' and len(token) > 1:
+                token = _unescape(token)
+                if token.isspace():
+                    continue
+            starts.append(m.start())
+
+            if state:
+                while True:
+                    next_state = goto[state].get(token)
+                    if next_state is not None:
+                        state = next_state
+                        break
+                    state = fail[state]
+                    if not state:
+                        state = root.get(token, 0)
+                        break
+            else:
+                state = root.get(token, 0)
+                if not state:
+                    continue
+
+            if out[state]:
+                end = m.end()
+                for num in out[state]:
+                    found.append((starts[-lengths[num]], end, num))
+
+    def _annotations(self, text, found):
+        # keep the leftmost, longest names, and describe them
+        found.sort(key=lambda f: (f[0], -f[1]))
+
+        annotations = []
+        last_end = 0
+        for start, end, num in found:
+            if start < last_end:
+                continue
+            annotations.append({
+                'start': start,
+                'end': end,
+                'text': text[start:end],
+                'matches': list(self._values[num]),
+            })
+            last_end = end
+
+        return annotations
+
+
+if __name__ == '__main__':
+    main()
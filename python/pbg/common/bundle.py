@@ -0,0 +1,539 @@
+"""Compile a guide into a compact binary bundle, for apps that work
+offline.
+
+usage:
+
+python -m pbg.common.bundle --build hrc.pbgb hrc.json
+python -m pbg.common.bundle hrc.pbgb 'Marriott Marquis'
+python -m pbg.common.bundle --prefix --limit 10 hrc.pbgb 'marr'
+python -m pbg.common.bundle --dump hrc.pbgb > hrc.json
+
+Guides can be anything :py:func:`~pbg.common.index.read_guide_file`
+reads. Lookups print each matching judgment as a line of JSON. --dump
+writes the guide back out as JSON; it has the same data as the guide the
+bundle was built from, though keys may come out in a different order.
+
+A bundle is a single file that :py:class:`GuideBundle` memory-maps, so
+opening one reads nothing but the header; everything else is read in
+place as it's looked up. It has:
+
+- a string table. Every string in the guide (names, types, property
+  names...) is stored once, and referred to by number.
+- the guide and each of its judgments, in a binary form of JSON that
+  refers to strings by number (see :py:func:`encode_value`)
+- columns of each judgment's ``judgmentType``, ``name`` and ``caveat``
+  (string numbers) and ``rank`` (from ``extra``), so they can be read
+  without decoding the judgment
+- a table of the names of the things the judgments are about (see
+  :py:func:`~pbg.common.index.iter_matches`), sorted by
+  :py:func:`~pbg.common.text.normalize_name`, to binary-search
+"""
+from __future__ import with_statement
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from optparse import OptionParser
+
+from pbg.common.diff import JUDGMENT_PROPS
+from pbg.common.index import decode_args
+from pbg.common.index import iter_matches
+from pbg.common.index import read_guide_file
+from pbg.common.text import normalize_name
+
+
+MAGIC = 'PBGBND02'
+
+# magic; number of strings, judgments, and names; and where the string
+# offsets, string data, columns, name table, and values start
+HEADER = struct.Struct('<8sIIIIIIII')
+
+UINT = struct.Struct('<I')
+INT = struct.Struct('<i')
+
+# string number for a column with no value
+NO_STRING = 0xffffffff
+# rank for a judgment with no rank
+NO_RANK = -0x80000000
+
+# the string columns, in the order they're stored, then rank
+STRING_COLUMNS = ('judgmentType', 'name', 'caveat')
+NUM_COLUMNS = len(STRING_COLUMNS) + 1
+
+# normalized name, name, type (strings), judgment number
+NAME_ENTRY = struct.Struct('<IIII')
+
+# value tags (see encode_value())
+(NULL, TRUE, FALSE, INT8, INTEGER, FLOAT, STRING16, STRING, LIST8, LIST,
+ DICT8, DICT) = range(12)
+
+TAG = struct.Struct('<B')
+TAG_INT8 = struct.Struct('<Bb')
+TAG_INTEGER = struct.Struct('<Bq')
+TAG_FLOAT = struct.Struct('<Bd')
+TAG_UINT8 = struct.Struct('<BB')
+TAG_UINT16 = struct.Struct('<BH')
+TAG_UINT = struct.Struct('<BI')
+
+
+def main():
+    option_parser = OptionParser(
+        usage=('%prog --build BUNDLE GUIDE  or  %prog [--prefix] BUNDLE'
+               ' NAME...  or  %prog --dump BUNDLE'))
+    option_parser.add_option(
+        '--build', dest='build', default=None, metavar='BUNDLE',
+        help='Compile the guide given as an argument into BUNDLE')
+    option_parser.add_option(
+        '--dump', dest='dump', default=False, action='store_true',
+        help='Write the whole guide in BUNDLE out as JSON')
+    option_parser.add_option(
+        '--prefix', dest='prefix', default=False, action='store_true',
+        help='Match names that start with NAME')
+    option_parser.add_option(
+        '--limit', dest='limit', type='int', default=None,
+        help='Print at most this many judgments per name')
+    options, args = option_parser.parse_args()
+
+    if options.build:
+        if len(args) != 1:
+            option_parser.error('need exactly one guide')
+        build_bundle(options.build, read_guide_file(args[0]))
+        return
+
+    if options.dump:
+        if len(args) != 1:
+            option_parser.error('need exactly one bundle')
+        with GuideBundle(args[0]) as bundle:
+            print json.dumps(bundle.guide_dict(), indent=2)
+        return
+
+    if len(args) < 2:
+        option_parser.error('need a bundle and at least one name')
+
+    with GuideBundle(args[0]) as bundle:
+        for name in decode_args(args[1:]):
+            if options.prefix:
+                nums = bundle.prefix(name, options.limit)
+            else:
+                nums = bundle.lookup(name)[:options.limit]
+
+            for num in nums:
+                print json.dumps(bundle.judgment(num), sort_keys=True)
+
+
+def build_bundle(path, guide_dict):
+    """Compile *guide_dict* (a guide's microdata JSON) into a bundle at
+    *path*."""
+    strings = _StringTable()
+
+    # the guide, with its judgments (and reviews) stored separately, and
+    # how many of them there were in their place
+    header_dict = dict(guide_dict)
+    header_dict['properties'] = dict(guide_dict.get('properties', {}))
+
+    judgments = []
+    for prop in JUDGMENT_PROPS:
+        if prop in header_dict['properties']:
+            prop_judgments = list(header_dict['properties'][prop])
+            judgments.extend(prop_judgments)
+            header_dict['properties'][prop] = len(prop_judgments)
+    judgment_nums = dict((id(j), i) for i, j in enumerate(judgments))
+
+    values = [encode_value(header_dict, strings)]
+    values.extend(encode_value(j, strings) for j in judgments)
+
+    columns = [[] for _ in xrange(NUM_COLUMNS)]
+    for judgment in judgments:
+        props = judgment.get('properties', {})
+        for column, prop in zip(columns, STRING_COLUMNS):
+            value = _only(props.get(prop))
+            if isinstance(value, basestring):
+                column.append(strings.add(value))
+            else:
+                column.append(NO_STRING)
+
+        rank = (judgment.get('extra') or {}).get('rank')
+        if (isinstance(rank, (int, long)) and not isinstance(rank, bool)
+                and NO_RANK < rank < 0x80000000):
+            columns[-1].append(rank)
+        else:
+            columns[-1].append(NO_RANK)
+
+    names = []
+    for match, judgment in iter_matches(guide_dict):
+        if not isinstance(match['name'], basestring):
+            continue
+        key = normalize_name(match['name'])
+        names.append((key.encode('utf_8'), strings.add(key),
+                      strings.add(match['name']),
+                      strings.add(match['type'] or u''),
+                      judgment_nums[id(judgment)]))
+    # stable, so matches for the same name stay in guide order
+    names.sort(key=lambda entry: entry[0])
+
+    # lay out the file
+    string_data = strings.data()
+    string_offsets_at = HEADER.size
+    string_data_at = string_offsets_at + UINT.size * (len(strings) + 1)
+    columns_at = string_data_at + len(string_data)
+    names_at = columns_at + UINT.size * NUM_COLUMNS * len(judgments)
+    value_offsets_at = names_at + NAME_ENTRY.size * len(names)
+    values_at = value_offsets_at + UINT.size * (len(values) + 1)
+
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(HEADER.pack(
+            MAGIC, len(strings), len(judgments), len(names),
+            string_offsets_at, string_data_at, columns_at, names_at,
+            value_offsets_at))
+
+        offset = 0
+        for s in strings.encoded:
+            f.write(UINT.pack(offset))
+            offset += len(s)
+        f.write(UINT.pack(offset))
+        f.write(string_data)
+
+        for column in columns[:-1]:
+            f.write(struct.pack('<%dI' % len(column), *column))
+        f.write(struct.pack('<%di' % len(columns[-1]), *columns[-1]))
+
+        for _, key_num, name_num, type_num, judgment_num in names:
+            f.write(NAME_ENTRY.pack(key_num, name_num, type_num,
+                                    judgment_num))
+
+        offset = values_at
+        for value in values:
+            f.write(UINT.pack(offset))
+            offset += len(value)
+        f.write(UINT.pack(offset))
+        for value in values:
+            f.write(value)
+
+    os.rename(tmp_path, path)
+
+
+def encode_value(value, strings):
+    """Encode a JSON value (as decoded by :py:mod:`json`) as bytes, adding
+    its strings to *strings* (a :py:class:`_StringTable`).
+
+    Each value starts with a one-byte tag. Strings are a string number;
+    lists are a length and then each value; dicts are a length and then
+    each key (a string) and value. Integers and floats are 8 bytes.
+    Small string numbers, lengths and integers get shorter tags of their
+    own, since most of them are small.
+    """
+    parts = []
+    _encode(value, strings, parts)
+    return ''.join(parts)
+
+
+def _encode(value, strings, parts):
+    if isinstance(value, basestring):
+        num = strings.add(value)
+        if num < 0x10000:
+            parts.append(TAG_UINT16.pack(STRING16, num))
+        else:
+            parts.append(TAG_UINT.pack(STRING, num))
+    elif isinstance(value, dict):
+        if len(value) < 0x100:
+            parts.append(TAG_UINT8.pack(DICT8, len(value)))
+        else:
+            parts.append(TAG_UINT.pack(DICT, len(value)))
+        for k, v in value.iteritems():
+            _encode(k, strings, parts)
+            _encode(v, strings, parts)
+    elif isinstance(value, (list, tuple)):
+        if len(value) < 0x100:
+            parts.append(TAG_UINT8.pack(LIST8, len(value)))
+        else:
+            parts.append(TAG_UINT.pack(LIST, len(value)))
+        for v in value:
+            _encode(v, strings, parts)
+    elif value is None:
+        parts.append(TAG.pack(NULL))
+    elif value is True:
+        parts.append(TAG.pack(TRUE))
+    elif value is False:
+        parts.append(TAG.pack(FALSE))
+    elif isinstance(value, (int, long)):
+        if -0x80 <= value < 0x80:
+            parts.append(TAG_INT8.pack(INT8, value))
+        else:
+            parts.append(TAG_INTEGER.pack(INTEGER, value))
+    elif isinstance(value, float):
+        parts.append(TAG_FLOAT.pack(FLOAT, value))
+    else:
+        raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def _only(values):
+    if isinstance(values, list) and len(values) == 1:
+        return values[0]
+    return None
+
+
+class _StringTable(object):
+    """Number each distinct string, in the order they're added."""
+
+    def __init__(self):
+        self._nums = {}
+        self.encoded = []
+
+    def add(self, s):
+        if isinstance(s, str):
+            s = s.decode('utf_8')
+        num = self._nums.get(s)
+        if num is None:
+            num = self._nums[s] = len(self.encoded)
+            self.encoded.append(s.encode('utf_8'))
+        return num
+
+    def data(self):
+        return ''.join(self.encoded)
+
+    def __len__(self):
+        return len(self.encoded)
+
+
+class GuideBundle(object):
+    """Bundle built by :py:func:`build_bundle`, memory-mapped from *path*.
+
+    Judgments are referred to by number, in the order the guide lists
+    them: its judgments, then its reviews (``reviewOfTarget``, as
+    eggs.py writes them).
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+
+        (magic, self._num_strings, self._num_judgments, self._num_names,
+         self._string_offsets_at, self._string_data_at, self._columns_at,
+         self._names_at, self._value_offsets_at) = HEADER.unpack_from(
+             self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('%s is not a guide bundle' % path)
+
+        # strings we've decoded, by number
+        self._strings = {}
+
+    def __len__(self):
+        return self._num_judgments
+
+    def judgment_type(self, num):
+        """The ``judgmentType`` of judgment *num*, or ``None``."""
+        return self._string_column(0, num)
+
+    def judgment_name(self, num):
+        """The ``name`` of judgment *num*, or ``None``."""
+        return self._string_column(1, num)
+
+    def caveat(self, num):
+        """The ``caveat`` of judgment *num*, or ``None``."""
+        return self._string_column(2, num)
+
+    def rank(self, num):
+        """The ``rank`` in judgment *num*'s ``extra``, or ``None``."""
+        rank = INT.unpack_from(
+            self._mmap, self._column_at(len(STRING_COLUMNS), num))[0]
+        return None if rank == NO_RANK else rank
+
+    def column(self, prop):
+        """Read a whole column at once: a list of every judgment's
+        ``judgmentType``, ``name``, ``caveat`` or ``rank`` (*prop*), with
+        ``None`` for judgments that don't have one."""
+        if prop == 'rank':
+            ranks = struct.unpack_from(
+                '<%di' % self._num_judgments, self._mmap,
+                self._columns_at + UINT.size * len(STRING_COLUMNS) *
+                self._num_judgments)
+            return [None if rank == NO_RANK else rank for rank in ranks]
+
+        column = STRING_COLUMNS.index(prop)
+        string_nums = struct.unpack_from(
+            '<%dI' % self._num_judgments, self._mmap,
+            self._columns_at + UINT.size * column * self._num_judgments)
+
+        strings = {NO_STRING: None}
+        for string_num in set(string_nums):
+            if string_num != NO_STRING:
+                strings[string_num] = self._string(string_num)
+        return [strings[string_num] for string_num in string_nums]
+
+    def judgment(self, num):
+        """Decode judgment *num*'s microdata JSON."""
+        self._check(num, self._num_judgments)
+        return self._value(num + 1)
+
+    def guide_dict(self):
+        """Decode the whole guide's microdata JSON. This is equal to the
+        dict the bundle was built from."""
+        guide_dict = self._value(0)
+        props = guide_dict['properties']
+
+        num = 0
+        for prop in JUDGMENT_PROPS:
+            if prop in props:
+                count = props[prop]
+                props[prop] = [self.judgment(n)
+                               for n in xrange(num, num + count)]
+                num += count
+
+        return guide_dict
+
+    def lookup(self, name):
+        """Return the numbers of the judgments about *name*."""
+        key = normalize_name(name).encode('utf_8')
+
+        nums = []
+        i = self._bisect(key)
+        while i < self._num_names and self._key(i) == key:
+            nums.append(self._name_entry(i)[3])
+            i += 1
+
+        return nums
+
+    def prefix(self, prefix, limit=None):
+        """Like :py:meth:`lookup`, but match every name starting with
+        *prefix*, in order by name. Return at most *limit* numbers."""
+        key = normalize_name(prefix).encode('utf_8')
+
+        nums = []
+        i = self._bisect(key)
+        while (i < self._num_names and self._key(i).startswith(key) and
+               (limit is None or len(nums) < limit)):
+            nums.append(self._name_entry(i)[3])
+            i += 1
+
+        return nums
+
+    def names(self):
+        """Yield ``(name, type, judgment number)`` for every name in the
+        name table, in order by normalized name."""
+        for i in xrange(self._num_names):
+            _, name_num, type_num, num = self._name_entry(i)
+            yield (self._string(name_num), self._string(type_num) or None,
+                   num)
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _check(self, num, size):
+        if not 0 <= num < size:
+            raise IndexError(num)
+
+    def _column_at(self, column, num):
+        self._check(num, self._num_judgments)
+        return (self._columns_at +
+                UINT.size * (column * self._num_judgments + num))
+
+    def _string_column(self, column, num):
+        string_num = UINT.unpack_from(
+            self._mmap, self._column_at(column, num))[0]
+        if string_num == NO_STRING:
+            return None
+        return self._string(string_num)
+
+    def _string_bytes(self, num):
+        start, end = struct.unpack_from(
+            '<II', self._mmap, self._string_offsets_at + UINT.size * num)
+        return self._mmap[self._string_data_at + start:
+                          self._string_data_at + end]
+
+    def _string(self, num):
+        s = self._strings.get(num)
+        if s is None:
+            s = self._strings[num] = self._string_bytes(num).decode('utf_8')
+        return s
+
+    def _name_entry(self, i):
+        return NAME_ENTRY.unpack_from(
+            self._mmap, self._names_at + NAME_ENTRY.size * i)
+
+    def _key(self, i):
+        return self._string_bytes(self._name_entry(i)[0])
+
+    def _bisect(self, key):
+        # leftmost name whose key is >= *key*
+        lo = 0
+        hi = self._num_names
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _value(self, i):
+        start, end = struct.unpack_from(
+            '<II', self._mmap, self._value_offsets_at + UINT.size * i)
+        # decoding from a str is a lot faster than from the mmap
+        value, _ = self._decode(self._mmap[start:end], 0)
+        return value
+
+    def _decode(self, buf, offset):
+        # decode the value at *offset* in *buf*, and return it and where
+        # it ends. Tags are roughly in order by how common they are.
+        tag = ord(buf[offset])
+
+        if tag == STRING16:
+            return (self._string(TAG_UINT16.unpack_from(buf, offset)[1]),
+                    offset + TAG_UINT16.size)
+        elif tag == LIST8 or tag == DICT8:
+            n = ord(buf[offset + 1])
+            offset += TAG_UINT8.size
+        elif tag == INT8:
+            return (TAG_INT8.unpack_from(buf, offset)[1],
+                    offset + TAG_INT8.size)
+        elif tag == STRING:
+            return (self._string(TAG_UINT.unpack_from(buf, offset)[1]),
+                    offset + TAG_UINT.size)
+        elif tag == LIST or tag == DICT:
+            n = TAG_UINT.unpack_from(buf, offset)[1]
+            offset += TAG_UINT.size
+        elif tag == INTEGER:
+            return (TAG_INTEGER.unpack_from(buf, offset)[1],
+                    offset + TAG_INTEGER.size)
+        elif tag == FLOAT:
+            return (TAG_FLOAT.unpack_from(buf, offset)[1],
+                    offset + TAG_FLOAT.size)
+        elif tag == NULL:
+            return None, offset + 1
+        elif tag == TRUE:
+            return True, offset + 1
+        elif tag == FALSE:
+            return False, offset + 1
+        else:
+            raise ValueError('bad value tag %d' % tag)
+
+        decode = self._decode
+        if tag == LIST8 or tag == LIST:
+            values = []
+            for _ in xrange(n):
+                value, offset = decode(buf, offset)
+                values.append(value)
+            return values, offset
+        else:
+            d = {}
+            for _ in xrange(n):
+                key, offset = decode(buf, offset)
+                d[key], offset = decode(buf, offset)
+            return d, offset
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""On-disk HTTP cache, so that re-running a scraper doesn't re-download
+pages that haven't changed.
+
+Each URL's last response is stored as a raw HTTP response (status line,
+headers, blank line, body), which we read back with
+:py:func:`pbg.common.http.parse_http_response`. Stored ``ETag`` and
+``Last-Modified`` headers are used to revalidate the page with a
+conditional GET.
+"""
+from __future__ import with_statement
+
+import hashlib
+import os
+import tempfile
+import threading
+
+from pbg.common.http import parse_http_response
+
+
+# we need these to revalidate a page
+VALIDATOR_HEADERS = ('etag', 'last-modified')
+
+# per-connection headers that shouldn't be stored
+UNCACHED_HEADERS = ('connection', 'keep-alive', 'transfer-encoding')
+
+
+class HTTPCache(object):
+    """Cache of the last response for each URL, in *cache_dir*.
+
+    *hits* counts pages served from the cache (after a 304), *misses*
+    counts pages that had to be downloaded in full.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, url):
+        return os.path.join(self.cache_dir,
+                            hashlib.sha1(url).hexdigest() + '.http')
+
+    def get(self, url):
+        """Return the cached :py:class:`~pbg.common.http.ParsedHTTPResponse`
+        for *url*, or ``None``."""
+        try:
+            with open(self.path(url), 'rb') as f:
+                return parse_http_response(f.read())
+        except IOError:
+            return None
+
+    def put(self, url, headers, body):
+        """Store a successful (200) response for *url*. Header names are
+        lowercase, as in :py:class:`~pbg.common.fetch.FetchedPage`."""
+        lines = ['HTTP/1.1 200 OK']
+        lines.append('x-pbg-url: %s' % url)
+        for name, value in sorted(headers.iteritems()):
+            if name not in UNCACHED_HEADERS:
+                lines.append('%s: %s' % (name, value))
+
+        raw = '\r\n'.join(lines) + '\r\n\r\n' + body
+
+        # write atomically, in case another process is reading the cache
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+        os.rename(tmp_path, self.path(url))
+
+    def conditional_headers(self, cached):
+        """Request headers to revalidate the *cached* response."""
+        headers = {}
+        if cached.headers.get('etag'):
+            headers['If-None-Match'] = cached.headers['etag']
+        if cached.headers.get('last-modified'):
+            headers['If-Modified-Since'] = cached.headers['last-modified']
+        return headers
+
+    def is_revalidatable(self, headers):
+        return any(headers.get(name) for name in VALIDATOR_HEADERS)
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self):
+        """One-line summary of hits and misses, for logging."""
+        return 'cache: %d hits, %d misses' % (self.hits, self.misses)
@@ -0,0 +1,202 @@
+"""CSS selectors, compiled once.
+
+``Tag.select()`` re-parses its selector (with :py:mod:`shlex`) every time
+it's called, which is most of what it costs to pull a few cells out of a
+table row. :py:func:`select` caches each selector the first time it sees
+it, and gives the same results, in the same order::
+
+    tds = select(tr, 'td')
+
+Parsers that look up several tags in the same small part of a page can
+also use :py:func:`first_tags` to find them all in one walk, and
+:py:func:`child_tags` to loop over a tag's children without the strings
+in between.
+
+Selectors we don't compile (pseudo-classes, ``~``, ``+``, and groups like
+``p, a``) fall back to ``Tag.select()``.
+"""
+import re
+import shlex
+
+from pbg.common.instrument import phase
+
+
+COMBINATORS = ('>', '~', '+')
+
+# a tag name, and a tag name (optional) with an attribute test, as
+# Tag.select() (before bs4 4.7) parses them. We parse them ourselves, so
+# we don't depend on how bs4 does it.
+TAG_NAME_RE = re.compile(r'^[a-zA-Z0-9][-.a-zA-Z0-9:_]*$')
+ATTRIBUTE_SELECTOR_RE = re.compile(
+    r'^(?P<tag>[a-zA-Z0-9][-.a-zA-Z0-9:_]*)?'
+    r'\[(?P<attribute>[\w-]+)(?P<operator>[=~\|\^\$\*]?)'
+    r'=?"?(?P<value>[^\]"]*)"?\]$')
+
+# selector -> Selector
+_compiled = {}
+
+
+def select(tag, selector):
+    """Like ``tag.select(selector)``, but only parse *selector* once."""
+    compiled = _compiled.get(selector)
+    if compiled is None:
+        compiled = compile_selector(selector)
+
+    with phase('select'):
+        return compiled.select(tag)
+
+
+def compile_selector(selector):
+    """Return a :py:class:`Selector` for *selector*, from the cache if we
+    can."""
+    compiled = _compiled.get(selector)
+    if compiled is None:
+        compiled = _compiled[selector] = Selector(selector)
+    return compiled
+
+
+class Selector(object):
+    """A selector, split into steps. Each step is ``(children_only, name,
+    check)``: find tags among the descendants (or just the children) of
+    each tag found by the previous step, named *name* (if not ``None``),
+    for which *check(tag)* is true (if not ``None``).
+    """
+
+    def __init__(self, selector):
+        self.selector = selector
+        self.steps = None  # None means use Tag.select()
+
+        if ',' in selector:
+            return
+
+        tokens = shlex.split(selector)
+        if not tokens:
+            return
+        if tokens[-1] in COMBINATORS:
+            raise ValueError(
+                'Final combinator "%s" is missing an argument.' % tokens[-1])
+
+        steps = []
+        children_only = False
+        for token in tokens:
+            if token == '>':
+                children_only = True
+                continue
+
+            step = _compile_token(token)
+            if step is None:
+                return
+            steps.append((children_only,) + step)
+            children_only = False
+
+        self.steps = steps
+
+    def select(self, tag):
+        if self.steps is None:
+            return tag.select(self.selector)
+
+        context = [tag]
+
+        for children_only, name, check in self.steps:
+            found = []
+            found_ids = set()
+
+            for context_tag in context:
+                if children_only:
+                    candidates = context_tag.children
+                else:
+                    candidates = context_tag.descendants
+
+                for candidate in candidates:
+                    # strings have a name of None
+                    if name is None:
+                        if candidate.name is None:
+                            continue
+                    elif candidate.name != name:
+                        continue
+
+                    if check is not None and not check(candidate):
+                        continue
+
+                    # a tag can be inside more than one tag in the context
+                    if id(candidate) not in found_ids:
+                        found.append(candidate)
+                        found_ids.add(id(candidate))
+
+            context = found
+
+        return context
+
+    def __repr__(self):
+        return 'Selector(%r)' % self.selector
+
+
+def _compile_token(token):
+    """Return ``(name, check)`` for one token of a selector, or ``None``
+    if Tag.select() should handle it."""
+    m = ATTRIBUTE_SELECTOR_RE.match(token)
+    if m is not None:
+        name, attribute, operator, value = m.groups()
+        if operator == '':
+            check = lambda t: t.has_attr(attribute)
+        elif operator == '=':
+            check = lambda t: _attribute_string(t, attribute) == value
+        else:
+            return None
+
+    elif '#' in token:
+        name, tag_id = token.split('#', 1)
+        check = lambda t: t.get('id', None) == tag_id
+
+    elif '.' in token:
+        name, klass = token.split('.', 1)
+        classes = set(klass.split('.'))
+        check = lambda t: classes.issubset(t.get('class', []))
+
+    elif token == '*':
+        name, check = None, None
+
+    elif ':' not in token and TAG_NAME_RE.match(token):
+        name, check = token, None
+
+    else:
+        return None
+
+    return name or None, check
+
+
+def _attribute_string(tag, attribute):
+    # multi-valued attributes (like class) are lists; match them as the
+    # space-separated string they were in the page
+    value = tag.get(attribute)
+    if isinstance(value, (list, tuple)):
+        value = ' '.join(value)
+    return value
+
+
+def first_tags(tag, *names):
+    """Find the first tag with each of *names* inside *tag*, in one walk
+    over its descendants. Returns a dict from name to tag (or ``None``),
+    so ``first_tags(p, 'a', 'em')['em']`` is the same as ``p.em``.
+    """
+    found = dict.fromkeys(names)
+    remaining = len(found)
+
+    for descendant in tag.descendants:
+        name = descendant.name
+        if name in found and found[name] is None:
+            found[name] = descendant
+            remaining -= 1
+            if not remaining:
+                break
+
+    return found
+
+
+def child_tags(tag, name=None):
+    """Yield the tags (not strings) that are direct children of *tag*,
+    only those named *name* if it's set."""
+    for child in tag.children:
+        # strings have a name of None
+        if child.name is not None and (name is None or child.name == name):
+            yield child
@@ -0,0 +1,194 @@
+"""Find the judgments that changed between two runs of a scraper.
+
+usage:
+
+python -m pbg.common.diff old/hrc.json new/hrc.json > hrc-diff.ndjson
+
+Guides can be in any format :py:func:`pbg.common.index.read_guide_file`
+reads. Each line of output is one change, as JSON::
+
+    {"change": "added", "key": [...], "judgment": {...}}
+    {"change": "removed", "key": [...], "judgment": {...}}
+    {"change": "changed", "key": [...], "judgment": {...},
+     "changes": [{"path": "/properties/judgmentType/0",
+                  "old": "Good", "new": "Mixed"}, ...]}
+
+*judgment* is the new judgment (or the old one, if it was removed), and
+*path* is a JSON pointer into it. Changes to the guide itself (its name,
+description, etc.) have the key ``["BuyersGuide"]``.
+
+Judgments are matched up by what they're about, not where they are in the
+guide: by ``hrcOrgID`` if there is one, a hotel's name and address, or a
+brand's name and company.
+"""
+from __future__ import with_statement
+
+import json
+import sys
+from optparse import OptionParser
+
+from pbg.common.index import read_guide_file
+from pbg.common.index import short_type
+from pbg.common.text import normalize_name
+
+
+# properties of the guide that hold judgments (eggs.py uses reviewOfTarget)
+JUDGMENT_PROPS = ('judgment', 'reviewOfTarget')
+
+# properties that lead from a judgment (or review) to what it's about
+TARGET_PROPS = ('target', 'itemReviewed')
+
+# enough of the address to tell hotels with the same name apart, but not
+# so much that fixing a ZIP code makes it a different hotel
+ADDRESS_PROPS = ('streetAddress', 'locality', 'region')
+
+GUIDE_KEY = ('BuyersGuide',)
+
+
+def main():
+    option_parser = OptionParser(usage='%prog OLD_GUIDE NEW_GUIDE')
+    options, args = option_parser.parse_args()
+    if len(args) != 2:
+        option_parser.error('need an old guide and a new guide')
+
+    old_guide, new_guide = [read_guide_file(path) for path in args]
+
+    counts = {}
+    for change in diff_guides(old_guide, new_guide):
+        counts[change['change']] = counts.get(change['change'], 0) + 1
+        sys.stdout.write(json.dumps(change, sort_keys=True))
+        sys.stdout.write('\n')
+
+    sys.stderr.write('diff: %d added, %d removed, %d changed\n' % (
+        counts.get('added', 0), counts.get('removed', 0),
+        counts.get('changed', 0)))
+
+
+def diff_guides(old_guide, new_guide):
+    """Yield a dict for each change between two guides' microdata JSON (see
+    the module docstring). Judgments that didn't change aren't included.
+
+    Changes come out in the order of the new guide, followed by removed
+    judgments, in the order of the old guide.
+    """
+    changes = list(diff_dicts(_guide_header(old_guide),
+                              _guide_header(new_guide)))
+    if changes:
+        yield {'change': 'changed', 'key': list(GUIDE_KEY),
+               'judgment': _guide_header(new_guide), 'changes': changes}
+
+    old_judgments = _judgments_by_key(old_guide)
+
+    for key, new_judgment in _iter_keyed_judgments(new_guide):
+        matches = old_judgments.get(key)
+
+        if not matches:
+            yield {'change': 'added', 'key': list(key),
+                   'judgment': new_judgment}
+            continue
+
+        # if several judgments have the same key, match them up in order
+        old_judgment = matches.pop(0)
+        changes = list(diff_dicts(old_judgment, new_judgment))
+        if changes:
+            yield {'change': 'changed', 'key': list(key),
+                   'judgment': new_judgment, 'changes': changes}
+
+    for key, old_judgment in _iter_keyed_judgments(old_guide):
+        matches = old_judgments.get(key)
+        if matches and matches[0] is old_judgment:
+            matches.pop(0)
+            yield {'change': 'removed', 'key': list(key),
+                   'judgment': old_judgment}
+
+
+def judgment_key(judgment):
+    """A tuple identifying what *judgment* (as microdata JSON) is about,
+    which stays the same from one run of a scraper to the next."""
+    target = _first_target(judgment)
+
+    if target is None:
+        # e.g. eggs.py's rating categories
+        return (short_type(judgment) or '',
+                normalize_name(_first(judgment, 'name') or ''))
+
+    extra = target.get('extra') or {}
+    if extra.get('hrcOrgID'):
+        return ('hrcOrgID', extra['hrcOrgID'])
+
+    target_type = short_type(target) or ''
+    key = (target_type, normalize_name(_first(target, 'name') or ''))
+
+    address = _first(target, 'address')
+    if isinstance(address, dict):
+        key += tuple(normalize_name(_first(address, prop) or '')
+                     for prop in ADDRESS_PROPS)
+
+    company = _first(target, 'brandOf')
+    if isinstance(company, dict):
+        key += (normalize_name(_first(company, 'name') or ''),)
+
+    return key
+
+
+def diff_dicts(old, new, path=''):
+    """Yield ``{'path': ..., 'old': ..., 'new': ...}`` for each field that
+    differs between *old* and *new* (which may be nested dicts and lists).
+    *path* is a JSON pointer. Missing fields are ``None``.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        for k in sorted(set(old) | set(new)):
+            for change in diff_dicts(old.get(k), new.get(k),
+                                     path + '/' + _escape(k)):
+                yield change
+    elif (isinstance(old, list) and isinstance(new, list) and
+          len(old) == len(new)):
+        for i, (old_v, new_v) in enumerate(zip(old, new)):
+            for change in diff_dicts(old_v, new_v, '%s/%d' % (path, i)):
+                yield change
+    elif old != new:
+        yield {'path': path, 'old': old, 'new': new}
+
+
+def _escape(k):
+    # JSON pointer escaping
+    return k.replace('~', '~0').replace('/', '~1')
+
+
+def _guide_header(guide):
+    header = dict(guide)
+    header['properties'] = dict(
+        (k, v) for k, v in guide.get('properties', {}).iteritems()
+        if k not in JUDGMENT_PROPS)
+    return header
+
+
+def _iter_keyed_judgments(guide):
+    props = guide.get('properties', {})
+    for prop in JUDGMENT_PROPS:
+        for judgment in props.get(prop, ()):
+            yield judgment_key(judgment), judgment
+
+
+def _judgments_by_key(guide):
+    by_key = {}
+    for key, judgment in _iter_keyed_judgments(guide):
+        by_key.setdefault(key, []).append(judgment)
+    return by_key
+
+
+def _first_target(judgment):
+    for prop in TARGET_PROPS:
+        target = _first(judgment, prop)
+        if isinstance(target, dict):
+            return target
+    return None
+
+
+def _first(item, name):
+    values = item.get('properties', {}).get(name)
+    return values[0] if values else None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Sort more JSON-serializable records than fit in memory.
+
+Records are sorted in memory *buffer_size* at a time; each sorted run is
+spilled to a temporary file, and the runs are merged as they're read
+back. If everything fits in one buffer, nothing touches the disk.
+"""
+import heapq
+import json
+import tempfile
+
+
+DEFAULT_BUFFER_SIZE = 100000
+
+
+def external_sort(records, key, buffer_size=DEFAULT_BUFFER_SIZE,
+                  tmp_dir=None):
+    """Yield *records* sorted by *key(record)*.
+
+    The sort is stable: records with equal keys come out in the order they
+    went in. Keys and records must survive a round trip through JSON.
+    """
+    buf = []
+    runs = []
+
+    try:
+        for i, record in enumerate(records):
+            # the index breaks ties, so records themselves never get
+            # compared
+            buf.append((key(record), i, record))
+
+            if len(buf) >= buffer_size:
+                runs.append(_spill(buf, tmp_dir))
+                buf = []
+
+        buf.sort()
+        sorted_runs = [iter(buf)] + [_read_run(run) for run in runs]
+
+        for _, _, record in heapq.merge(*sorted_runs):
+            yield record
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _spill(buf, tmp_dir):
+    buf.sort()
+
+    run = tempfile.TemporaryFile(dir=tmp_dir)
+    for entry in buf:
+        run.write(json.dumps(entry))
+        run.write('\n')
+    run.seek(0)
+
+    return run
+
+
+def _read_run(run):
+    for line in run:
+        yield tuple(json.loads(line))
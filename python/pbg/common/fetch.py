@@ -0,0 +1,297 @@
+"""Fetch many pages concurrently, over a small pool of keep-alive
+connections, without hammering any one host.
+
+This is what we use instead of calling curl once per URL in a shell loop.
+It can also be used as a (caching) stand-in for curl:
+
+python -m pbg.common.fetch --cache-dir pbg-cache URL > page.html
+"""
+from __future__ import with_statement
+
+import socket
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from optparse import OptionParser
+from urlparse import urljoin
+from urlparse import urlsplit
+
+from pbg.common.cache import HTTPCache
+from pbg.common.instrument import phase
+from pbg.common.lazy import lazy_import
+from pbg.common.stages import run_stages
+
+httplib = lazy_import('httplib')
+
+DEFAULT_USER_AGENT = 'pbg (https://github.com/davidmarin/pbg)'
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+FetchedPage = namedtuple('FetchedPage', ['url', 'status', 'headers', 'body'])
+
+
+class RateLimiter(object):
+    """Enforce a minimum delay (in seconds) between the starts of any two
+    requests to the same host."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self._next_start = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.delay:
+            return
+
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+
+        if start > now:
+            time.sleep(start - now)
+
+
+class ConnectionPool(object):
+    """Keep-alive HTTP(S) connections, with at most *max_per_host* open to
+    any one host at a time."""
+
+    def __init__(self, max_per_host=4, timeout=30):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+
+        self._idle = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme, netloc):
+        """Get a connection to *netloc*, blocking until one is free.
+
+        Returns ``(conn, reused)``; *reused* is true if the connection
+        has already served a request (so it may have been closed by the
+        server in the meantime).
+        """
+        key = (scheme, netloc)
+
+        with self._lock:
+            slots = self._slots.setdefault(
+                key, threading.BoundedSemaphore(self.max_per_host))
+        slots.acquire()
+
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if idle:
+                return idle.pop(), True
+
+        if scheme == 'https':
+            conn = httplib.HTTPSConnection(netloc, timeout=self.timeout)
+        else:
+            conn = httplib.HTTPConnection(netloc, timeout=self.timeout)
+
+        return conn, False
+
+    def release(self, scheme, netloc, conn, keep_alive=True):
+        key = (scheme, netloc)
+
+        if keep_alive:
+            with self._lock:
+                self._idle[key].append(conn)
+        else:
+            conn.close()
+
+        self._slots[key].release()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.itervalues():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+class Fetcher(object):
+    """Fetch pages over a :py:class:`ConnectionPool`, following redirects
+    and decompressing bodies (like ``curl -L --compressed``).
+
+    If *cache* (a :py:class:`~pbg.common.cache.HTTPCache`) is set, pages
+    we've seen before are revalidated with a conditional GET, and served
+    from the cache if unchanged.
+    """
+
+    def __init__(self, max_per_host=4, delay=0.0, timeout=30,
+                 max_redirects=10, user_agent=DEFAULT_USER_AGENT,
+                 cache=None):
+        self.pool = ConnectionPool(max_per_host=max_per_host,
+                                   timeout=timeout)
+        self.rate_limiter = RateLimiter(delay)
+        self.max_redirects = max_redirects
+        self.user_agent = user_agent
+        self.cache = cache
+
+    def fetch(self, url, headers=None):
+        """Fetch *url*, and return a :py:class:`FetchedPage`.
+
+        The returned URL is the one we ended up at after redirects (or
+        *url* itself, for pages served from the cache).
+        """
+        headers = dict(headers or {})
+
+        cached = None
+        if self.cache:
+            cached = self.cache.get(url)
+            if cached:
+                headers.update(self.cache.conditional_headers(cached))
+
+        with phase('fetch'):
+            page = self._fetch(url, headers)
+
+        if self.cache:
+            if page.status == 304 and cached:
+                self.cache.record_hit()
+                return FetchedPage(url, cached.status, cached.headers,
+                                   cached.body)
+
+            self.cache.record_miss()
+            if page.status == 200 and self.cache.is_revalidatable(
+                    page.headers):
+                self.cache.put(url, page.headers, page.body)
+
+        return page
+
+    def _fetch(self, url, headers):
+        for _ in xrange(self.max_redirects + 1):
+            status, resp_headers, body = self._request(url, headers)
+
+            if status in REDIRECT_STATUSES and 'location' in resp_headers:
+                url = urljoin(url, resp_headers['location'])
+            else:
+                return FetchedPage(url, status, resp_headers, body)
+
+        raise IOError('too many redirects: %s' % url)
+
+    def fetch_all(self, urls, num_threads=8, headers=None, window=None):
+        """Fetch *urls* from *num_threads* threads, and yield
+        ``(url, page, error)`` for each, in the same order as *urls*.
+
+        If a fetch fails, *page* is ``None`` and *error* is the exception;
+        the other URLs are still fetched. At most *window* (by default,
+        twice *num_threads*) URLs are in flight at once, so one slow page
+        doesn't leave the rest piling up in memory.
+        """
+        def fetch(url):
+            try:
+                return url, self.fetch(url, headers), None
+            except Exception, e:
+                return url, None, e
+
+        return run_stages(urls, [(fetch, num_threads)],
+                          window=window or 2 * num_threads)
+
+    def close(self):
+        self.pool.close()
+
+    def _request(self, url, headers=None):
+        scheme, netloc, path, query, _ = urlsplit(url)
+        if query:
+            path += '?' + query
+        path = path or '/'
+
+        req_headers = {
+            'Accept-Encoding': 'gzip, deflate',
+            'User-Agent': self.user_agent,
+        }
+        req_headers.update(headers or {})
+
+        self.rate_limiter.wait(netloc)
+
+        conn, reused = self.pool.acquire(scheme, netloc)
+        try:
+            try:
+                resp = self._send(conn, path, req_headers)
+            except (httplib.HTTPException, socket.error):
+                if not reused:
+                    raise
+                # the server closed our keep-alive connection; try once
+                # more on a fresh one
+                conn.close()
+                resp = self._send(conn, path, req_headers)
+
+            body = resp.read()
+        except:
+            self.pool.release(scheme, netloc, conn, keep_alive=False)
+            raise
+
+        self.pool.release(scheme, netloc, conn, keep_alive=not resp.will_close)
+
+        resp_headers = dict(resp.getheaders())
+        content_encoding = resp_headers.pop('content-encoding', None)
+        if content_encoding:
+            body = decode_body(body, content_encoding)
+            # no longer describes the body we're returning
+            resp_headers.pop('content-length', None)
+
+        return resp.status, resp_headers, body
+
+    def _send(self, conn, path, headers):
+        conn.request('GET', path, headers=headers)
+        return conn.getresponse()
+
+
+def decode_body(body, content_encoding):
+    """Undo gzip/deflate *content_encoding*."""
+    if content_encoding in ('gzip', 'x-gzip'):
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    elif content_encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # some servers send raw deflate data, without the zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    else:
+        return body
+
+
+def add_cache_option(option_parser):
+    option_parser.add_option(
+        '--cache-dir', dest='cache_dir', default=None,
+        help=('Keep a copy of each page in this directory, and only'
+              ' re-download pages that have changed'))
+
+
+def make_cache(options):
+    """Make an :py:class:`~pbg.common.cache.HTTPCache` from command-line
+    options (see :py:func:`add_cache_option`), or return ``None``."""
+    if options.cache_dir:
+        return HTTPCache(options.cache_dir)
+    else:
+        return None
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] URL')
+    add_cache_option(option_parser)
+    options, args = option_parser.parse_args()
+    if len(args) != 1:
+        option_parser.error('takes exactly one URL')
+
+    cache = make_cache(options)
+    fetcher = Fetcher(cache=cache)
+    try:
+        page = fetcher.fetch(args[0])
+    finally:
+        fetcher.close()
+
+    if page.status != 200:
+        raise IOError('got status %d for %s' % (page.status, page.url))
+
+    sys.stdout.write(page.body)
+
+    if cache:
+        sys.stderr.write(cache.stats() + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ ParsedHTTPResponse = namedtuple(
 def parse_http_response(s):
     head, body = s.split('\r\n\r\n', 1)
     status_line, headers_text = head.split('\r\n', 1)
-    http_version, status_code, reason = status_line.split()
+    http_version, status_code, reason = status_line.split(None, 2)
     status = int(status_code)
     headers = Message(StringIO(headers_text)).dict
 
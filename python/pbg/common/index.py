@@ -0,0 +1,313 @@
+"""Look up what the guides say about a company, brand, or hotel, by name.
+
+usage:
+
+python -m pbg.common.index --build guides.idx uhg.json eggs.html hrc.json
+python -m pbg.common.index guides.idx 'Marriott Marquis'
+python -m pbg.common.index --prefix guides.idx 'marr'
+
+Guides can be JSON (uhg.py, data.py), streams (``--ndjson``), or HTML
+annotated with microdata (eggs.py). Names are matched after
+:py:func:`~pbg.common.text.normalize_name`, so case and extra whitespace
+don't matter. Each match is printed as a line of JSON.
+
+The index is a single file, sorted by name, which we memory-map and
+binary-search, so opening it doesn't read anything but the header.
+"""
+from __future__ import absolute_import
+from __future__ import with_statement
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from optparse import OptionParser
+
+from pbg.common.lazy import lazy_import
+from pbg.common.ndjson import read_guide_dicts
+from pbg.common.text import normalize_name
+
+microdata = lazy_import('microdata')
+
+
+MAGIC = 'PBGIDX01'
+
+# magic, number of entries
+HEADER = struct.Struct('<8sI')
+
+# offset and length of: the normalized name, the match's JSON, and the
+# JSON of the judgment it's from. Offsets are from the start of the file.
+ENTRY = struct.Struct('<IIIIII')
+
+# properties that lead from a judgment (or review) to the things it's about
+TARGET_PROPS = ('target', 'itemReviewed')
+# properties that lead from one named thing to another
+RELATED_PROPS = ('brand', 'brandOf')
+
+
+def main():
+    option_parser = OptionParser(
+        usage='%prog --build INDEX GUIDE...  or  %prog [--prefix] INDEX NAME...')
+    option_parser.add_option(
+        '--build', dest='build', default=None, metavar='INDEX',
+        help='Build INDEX from the guides given as arguments')
+    option_parser.add_option(
+        '--prefix', dest='prefix', default=False, action='store_true',
+        help='Match names that start with NAME')
+    option_parser.add_option(
+        '--limit', dest='limit', type='int', default=None,
+        help='Print at most this many matches per name')
+    options, args = option_parser.parse_args()
+
+    if options.build:
+        build_index(options.build, [read_guide_file(path) for path in args])
+        return
+
+    if len(args) < 2:
+        option_parser.error('need an index and at least one name')
+
+    with NameIndex(args[0]) as index:
+        for name in decode_args(args[1:]):
+            if options.prefix:
+                matches = index.prefix(name, options.limit)
+            else:
+                matches = index.lookup(name)[:options.limit]
+
+            for match in matches:
+                print json.dumps(match, sort_keys=True)
+
+
+def decode_args(args):
+    """Decode command-line arguments (byte strings, on Python 2) with the
+    filesystem encoding, or UTF-8 if they aren't in it (e.g. in the C
+    locale, where it's ASCII)."""
+    encoding = sys.getfilesystemencoding() or 'utf_8'
+    decoded = []
+    for arg in args:
+        if isinstance(arg, str):
+            try:
+                arg = arg.decode(encoding)
+            except UnicodeDecodeError:
+                arg = arg.decode('utf_8', 'replace')
+        decoded.append(arg)
+    return decoded
+
+
+def read_guide_file(path):
+    """Read a guide's microdata JSON from the file at *path*, which may be
+    JSON, a stream (see :py:mod:`pbg.common.ndjson`), or annotated HTML."""
+    with open(path) as f:
+        data = f.read()
+
+    if data.lstrip().startswith('<'):
+        for item in microdata.get_items(data):
+            if any(t.string == 'BuyersGuide' for t in item.itemtype):
+                return item.json_dict()
+        raise ValueError('no BuyersGuide item in %s' % path)
+
+    try:
+        return json.loads(data)
+    except ValueError:
+        guide_dict, judgment_dicts = read_guide_dicts(data.splitlines())
+        guide_dict['properties']['judgment'] = list(judgment_dicts)
+        return guide_dict
+
+
+def iter_matches(guide_dict):
+    """Yield ``(match, judgment_dict)`` for each named thing the guide
+    has a judgment (or review) about. *match* is a dict with the guide's
+    name, the thing's type, name, and ``extra`` (e.g. ``hrcOrgID``).
+    """
+    guide_props = guide_dict.get('properties', {})
+    guide_name = _first(guide_props.get('name'))
+
+    for prop in ('judgment', 'reviewOfTarget'):
+        for judgment in guide_props.get(prop, ()):
+            for match in iter_judgment_matches(judgment, guide_name):
+                yield match, judgment
+
+
+def iter_judgment_matches(judgment, guide_name=None):
+    """Yield a match (see :py:func:`iter_matches`) for each named thing
+    one judgment is about."""
+    judgment_props = judgment.get('properties', {})
+
+    for target_prop in TARGET_PROPS:
+        for target in judgment_props.get(target_prop, ()):
+            for item in _iter_named_items(target):
+                match = {
+                    'guide': guide_name,
+                    'type': short_type(item),
+                    'name': _first(item['properties']['name']),
+                }
+                if item.get('extra'):
+                    match['extra'] = item['extra']
+
+                yield match
+
+
+def _iter_named_items(item):
+    if not isinstance(item, dict):
+        return
+
+    props = item.get('properties', {})
+    if props.get('name'):
+        yield item
+
+    for prop in RELATED_PROPS:
+        for related in props.get(prop, ()):
+            for named_item in _iter_named_items(related):
+                yield named_item
+
+
+def _first(values):
+    return values[0] if values else None
+
+
+def short_type(item):
+    """The types of *item* (as microdata JSON) without their URLs, e.g.
+    ``Brand`` for ``http://schema.org/Brand``, or ``None`` if it has
+    none."""
+    types = item.get('type') or ()
+    return ' '.join(t.rsplit('/', 1)[-1] for t in types) or None
+
+
+def build_index(path, guide_dicts):
+    """Write an index of every match in *guide_dicts* (see
+    :py:func:`iter_matches`) to *path*."""
+    judgments = []  # JSON of each judgment, written once
+    entries = []  # (key, match JSON, judgment number)
+
+    for guide_dict in guide_dicts:
+        last_judgment = None
+        for match, judgment in iter_matches(guide_dict):
+            if judgment is not last_judgment:
+                judgments.append(json.dumps(judgment))
+                last_judgment = judgment
+
+            key = normalize_name(match['name']).encode('utf_8')
+            entries.append((key, json.dumps(match), len(judgments) - 1))
+
+    # stable, so matches for the same name stay in guide order
+    entries.sort(key=lambda entry: entry[0])
+
+    data_offset = HEADER.size + ENTRY.size * len(entries)
+
+    judgment_offsets = []
+    offset = data_offset
+    for judgment in judgments:
+        judgment_offsets.append(offset)
+        offset += len(judgment)
+
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(entries)))
+
+        # entry table
+        for key, match, judgment_num in entries:
+            f.write(ENTRY.pack(
+                offset, len(key),
+                offset + len(key), len(match),
+                judgment_offsets[judgment_num],
+                len(judgments[judgment_num])))
+            offset += len(key) + len(match)
+
+        for judgment in judgments:
+            f.write(judgment)
+
+        for key, match, _ in entries:
+            f.write(key)
+            f.write(match)
+
+    os.rename(tmp_path, path)
+
+
+class NameIndex(object):
+    """Index built by :py:func:`build_index`, memory-mapped from *path*.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+
+        magic, self._num_entries = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('%s is not a name index' % path)
+
+    def __len__(self):
+        return self._num_entries
+
+    def lookup(self, name):
+        """Return the matches for *name*, as dicts (see
+        :py:func:`iter_matches`), with the judgment as *judgment*."""
+        key = normalize_name(name).encode('utf_8')
+
+        matches = []
+        i = self._bisect(key)
+        while i < self._num_entries and self._key(i) == key:
+            matches.append(self._match(i))
+            i += 1
+
+        return matches
+
+    def prefix(self, prefix, limit=None):
+        """Like :py:meth:`lookup`, but match every name starting with
+        *prefix*, in order by name. Return at most *limit* matches."""
+        key = normalize_name(prefix).encode('utf_8')
+
+        matches = []
+        i = self._bisect(key)
+        while (i < self._num_entries and self._key(i).startswith(key) and
+               (limit is None or len(matches) < limit)):
+            matches.append(self._match(i))
+            i += 1
+
+        return matches
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _bisect(self, key):
+        # leftmost entry whose key is >= *key*
+        lo = 0
+        hi = self._num_entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _entry(self, i):
+        return ENTRY.unpack_from(self._mmap, HEADER.size + ENTRY.size * i)
+
+    def _key(self, i):
+        key_offset, key_len = self._entry(i)[:2]
+        return self._mmap[key_offset:key_offset + key_len]
+
+    def _match(self, i):
+        (_, _, match_offset, match_len,
+         judgment_offset, judgment_len) = self._entry(i)
+
+        match = json.loads(self._mmap[match_offset:match_offset + match_len])
+        match['judgment'] = json.loads(
+            self._mmap[judgment_offset:judgment_offset + judgment_len])
+
+        return match
+
+
+if __name__ == '__main__':
+    main()
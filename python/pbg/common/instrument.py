@@ -0,0 +1,241 @@
+"""See where a scraper spends its time: fetching, building trees, CSS
+``select()`` calls, building Items, or writing JSON.
+
+Code marks out phases and counts things as it goes::
+
+    with phase('parse'):
+        judgments = list(counted('judgments', iter_judgments(soup)))
+
+This does nothing unless instrumentation has been started (with
+``--report`` or ``--profile`` on the command line, see
+:py:func:`add_instrument_options`). Once it has, each phase's wall time,
+CPU time and peak memory are added up, and written out at the end as a
+JSON report::
+
+    {"command": "pbg.unitehere.uhg",
+     "wall": 1.2, "cpu": 1.1, "peak_rss_kb": 51200,
+     "counts": {"judgments": 200},
+     "phases": [{"phase": "read", "calls": 1, "wall": 0.001, ...}, ...]}
+
+Times are exclusive: time in a phase started inside another phase only
+counts toward the inner one, so nothing is counted twice.
+*peak_rss_kb* for a phase is the process's peak RSS as of the end of that
+phase, so the phase where it jumps is the one that used the memory.
+
+Only the thread that started instrumentation is timed; phases in other
+threads (e.g. :py:meth:`~pbg.common.fetch.Fetcher.fetch_all`'s workers)
+and processes (``--jobs``) count toward whatever the main thread was
+waiting in.
+"""
+from __future__ import with_statement
+
+import cProfile
+import json
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+# the Instruments that phase() and count() report to, if any
+_active = None
+
+
+def phase(name):
+    """Context manager that times a block of code as phase *name*."""
+    instruments = _active
+    if instruments is None or not instruments.in_thread():
+        return _NULL_PHASE
+    return instruments.phase(name)
+
+
+def count(name, n=1):
+    """Add *n* to the count of *name* (e.g. ``'judgments'``)."""
+    if _active is not None:
+        _active.add(name, n)
+
+
+def counted(name, items):
+    """Yield from *items*, counting each one as *name*."""
+    for item in items:
+        count(name)
+        yield item
+
+
+class _NullPhase(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+
+class Instruments(object):
+    """Timers and counters for one run of a command. Use :py:meth:`start`
+    to make this what :py:func:`phase` and :py:func:`count` report to.
+    """
+
+    def __init__(self, command=None, profile=False):
+        self.command = command
+        self.counts = {}
+
+        # phase name -> [calls, wall, cpu, peak_rss_kb]
+        self._phases = {}
+        self._phase_order = []
+        # [phase name, wall started, cpu started], innermost last
+        self._stack = []
+
+        self._profiler = cProfile.Profile() if profile else None
+        self._thread = None
+        self._orig_select = None
+
+    def start(self):
+        global _active
+        from bs4.element import Tag
+
+        self._thread = threading.current_thread()
+        self._start_wall = time.time()
+        self._start_cpu = time.clock()
+
+        self._orig_select = Tag.select
+        Tag.select = self._timed_select(Tag.select)
+
+        _active = self
+
+        if self._profiler:
+            self._profiler.enable()
+
+    def stop(self):
+        global _active
+        from bs4.element import Tag
+
+        if self._profiler:
+            self._profiler.disable()
+
+        self._wall = time.time() - self._start_wall
+        self._cpu = time.clock() - self._start_cpu
+
+        Tag.select = self._orig_select
+        if _active is self:
+            _active = None
+
+    def in_thread(self):
+        return threading.current_thread() is self._thread
+
+    @contextmanager
+    def phase(self, name):
+        self._push(name)
+        try:
+            yield
+        finally:
+            self._pop()
+
+    def add(self, name, n):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def report(self):
+        """The report (see the module docstring) as a dict. Call this
+        after :py:meth:`stop`."""
+        phases = []
+        for name in self._phase_order:
+            calls, wall, cpu, peak_rss_kb = self._phases[name]
+            phases.append({'phase': name, 'calls': calls, 'wall': wall,
+                           'cpu': cpu, 'peak_rss_kb': peak_rss_kb})
+
+        return {
+            'command': self.command,
+            'wall': self._wall,
+            'cpu': self._cpu,
+            'peak_rss_kb': _peak_rss_kb(),
+            'counts': self.counts,
+            'phases': phases,
+        }
+
+    def dump_profile(self, path):
+        """Write cProfile stats (see :py:mod:`pstats`) to *path*."""
+        self._profiler.dump_stats(path)
+
+    def _push(self, name):
+        wall, cpu = time.time(), time.clock()
+        if self._stack:
+            self._add_time(self._stack[-1], wall, cpu, rss=False)
+        self._stack.append([name, wall, cpu])
+
+        if name not in self._phases:
+            self._phases[name] = [0, 0.0, 0.0, 0]
+            self._phase_order.append(name)
+        self._phases[name][0] += 1
+
+    def _pop(self):
+        wall, cpu = time.time(), time.clock()
+        self._add_time(self._stack.pop(), wall, cpu, rss=True)
+        if self._stack:
+            self._stack[-1][1:] = [wall, cpu]
+
+    def _add_time(self, entry, wall, cpu, rss):
+        name, wall_started, cpu_started = entry
+        totals = self._phases[name]
+        totals[1] += wall - wall_started
+        totals[2] += cpu - cpu_started
+        if rss:
+            totals[3] = _peak_rss_kb()
+
+    def _timed_select(self, select):
+        def timed_select(tag, *args, **kwargs):
+            # select() calls itself for some selectors
+            if not self.in_thread() or (
+                    self._stack and self._stack[-1][0] == 'select'):
+                return select(tag, *args, **kwargs)
+            with self.phase('select'):
+                return select(tag, *args, **kwargs)
+
+        return timed_select
+
+
+def _peak_rss_kb():
+    # kilobytes on Linux (bytes on OS X)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def add_instrument_options(option_parser):
+    """Add ``--report`` and ``--profile`` to *option_parser*."""
+    option_parser.add_option(
+        '--report', dest='report', default=None, metavar='PATH',
+        help=('Write a JSON report of the time and memory each phase used'
+              ' to PATH ("-" for stderr)'))
+    option_parser.add_option(
+        '--profile', dest='profile', default=None, metavar='PATH',
+        help='Profile with cProfile, and write the stats to PATH')
+
+
+@contextmanager
+def instrumented(options, command=None):
+    """Instrument a block of code (typically, the body of ``main()``), if
+    *options* (see :py:func:`add_instrument_options`) ask for it, and
+    write out the report and/or profile afterwards."""
+    if not (options.report or options.profile):
+        yield
+        return
+
+    instruments = Instruments(command, profile=bool(options.profile))
+    instruments.start()
+    try:
+        yield
+    finally:
+        instruments.stop()
+
+        if options.profile:
+            instruments.dump_profile(options.profile)
+
+        if options.report:
+            report = json.dumps(instruments.report(), indent=2,
+                                sort_keys=True)
+            if options.report == '-':
+                sys.stderr.write(report + '\n')
+            else:
+                with open(options.report, 'w') as f:
+                    f.write(report + '\n')
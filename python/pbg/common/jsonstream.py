@@ -0,0 +1,180 @@
+"""Read one big array out of a JSON document a value at a time.
+
+Some sites hand over everything in a single JSON response, like::
+
+    {"page": 1, "total": 50000, "rows": [{...}, {...}, ...]}
+
+:py:func:`iter_array` reads this from a file a chunk at a time and
+yields each element of ``rows`` as soon as it's been read, so we never
+hold more than one chunk (and one element) of the document in memory.
+
+Each element (and each other value in the top-level object) is decoded
+with :py:mod:`json`'s own decoder, so this is nearly as fast as
+``json.load()``; we only handle the top-level object and the array
+ourselves.
+"""
+from __future__ import with_statement
+
+import json
+import re
+
+from pbg.common.instrument import phase
+
+
+# how much of the document to read at a time
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+# what could still be part of a number
+NUMBER_TAIL_RE = re.compile(r'[0-9.eE+-]*')
+
+_decoder = json.JSONDecoder()
+
+
+def iter_array(f, key, fields=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Read a JSON object from the file object *f*, and yield each element
+    of the array that is its value for *key*.
+
+    If *fields* (a dict) is set, the object's other keys and values are
+    put in it as they're read; keys that come before *key* will be there
+    by the time the first element is yielded.
+
+    *key* can also be a tuple of keys, for an array inside nested
+    objects; e.g. ``('properties', 'judgment')`` for a guide's judgments.
+    Then *fields* gets a dict for each object along the way, with its
+    other keys.
+
+    Raises ``ValueError`` if the document isn't a JSON object, or *key*
+    isn't in it, or its value isn't an array.
+    """
+    keys = key if isinstance(key, tuple) else (key,)
+    reader = _Reader(f, chunk_size)
+
+    for value in _iter_object(reader, keys, fields):
+        yield value
+
+    if reader.peek() is not None:
+        raise ValueError('extra data after JSON object')
+
+
+def _iter_object(reader, keys, fields):
+    found = False
+
+    reader.next_char('{')
+    if reader.peek() == '}':
+        reader.next_char('}')
+    else:
+        while True:
+            name = reader.value()
+            if not isinstance(name, basestring):
+                raise ValueError('expected a key, got %r' % (name,))
+            reader.next_char(':')
+
+            if name == keys[0] and not found:
+                found = True
+                if len(keys) > 1:
+                    nested = None
+                    if fields is not None:
+                        nested = fields[name] = {}
+                    values = _iter_object(reader, keys[1:], nested)
+                else:
+                    values = _iter_values(reader)
+                for value in values:
+                    yield value
+            else:
+                value = reader.value()
+                if fields is not None:
+                    fields[name] = value
+
+            if reader.next_char(',}') == '}':
+                break
+
+    if not found:
+        raise ValueError('no %r in JSON object' % (keys[0],))
+
+
+def _iter_values(reader):
+    reader.next_char('[')
+    if reader.peek() == ']':
+        reader.next_char(']')
+        return
+
+    while True:
+        yield reader.value()
+
+        if reader.next_char(',]') == ']':
+            return
+
+
+class _Reader(object):
+    """Just enough of a tokenizer to walk through a JSON object and array,
+    decoding everything inside them with :py:mod:`json`."""
+
+    def __init__(self, f, chunk_size):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def peek(self):
+        """Return the next character that isn't whitespace, without
+        consuming it, or ``None`` at the end of the document."""
+        while True:
+            self._pos = WHITESPACE_RE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def next_char(self, expected):
+        """Consume and return the next character that isn't whitespace,
+        which must be one of *expected*."""
+        c = self.peek()
+        if c is None:
+            raise ValueError('unexpected end of JSON document')
+        if c not in expected:
+            raise ValueError('expected %s, got %r' % (
+                ' or '.join(repr(e) for e in expected), c))
+        self._pos += 1
+        return c
+
+    def value(self):
+        """Decode and consume the next JSON value."""
+        self.peek()
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                # probably cut off at the end of the chunk
+                if not self._fill():
+                    raise
+                continue
+
+            # a number at the end of the buffer (e.g. "-2" of "-2.5e10")
+            # may continue in the next chunk
+            if (NUMBER_TAIL_RE.match(self._buf, end).end() == len(self._buf)
+                    and self._fill()):
+                continue
+
+            self._pos = end
+            return value
+
+    def _fill(self):
+        """Read another chunk onto the end of the buffer, dropping what
+        we've already consumed. Returns false at the end of the file."""
+        if self._eof:
+            return False
+
+        with phase('read'):
+            chunk = self._f.read(self._chunk_size)
+
+        if not chunk:
+            self._eof = True
+            return False
+
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
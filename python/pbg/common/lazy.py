@@ -0,0 +1,67 @@
+"""Put off importing a module until it's actually used.
+
+Most of what the scrapers import (bs4, microdata, which imports html5lib,
+pyassert) is only needed once they start parsing. Importing it lazily
+keeps ``--help``, bad command lines, and commands that don't parse
+anything from paying for it::
+
+    microdata = lazy_import('microdata')
+    assert_that = lazy_import('pyassert', 'assert_that')
+
+The first is a stand-in for the module, which imports it the first time
+one of its attributes is looked up. The second is a stand-in for a
+function (or class), which imports it the first time it's called. A
+stand-in for a class can only be called, not subclassed or used with
+``isinstance()``; import those normally (or inside the function that
+uses them).
+
+To see what each command spends starting up, see
+``benchmarks/bench_startup.py``.
+"""
+import sys
+
+
+def lazy_import(module_name, name=None):
+    """Return a stand-in for the module *module_name*, or if *name* is
+    set, for the callable *name* in it."""
+    if name is None:
+        return LazyModule(module_name)
+    else:
+        return _lazy_callable(module_name, name)
+
+
+class LazyModule(object):
+    """Stand-in for a module, which imports it on first use."""
+
+    def __init__(self, module_name):
+        self.__name__ = module_name
+        self._module = None
+
+    def __getattr__(self, name):
+        # only called for attributes we don't have ourselves
+        if self._module is None:
+            self._module = _import(self.__name__)
+        return getattr(self._module, name)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self.__name__
+
+
+def _lazy_callable(module_name, name):
+    loaded = []
+
+    def stand_in(*args, **kwargs):
+        if not loaded:
+            loaded.append(getattr(_import(module_name), name))
+        return loaded[0](*args, **kwargs)
+
+    stand_in.__name__ = name
+    stand_in.__doc__ = 'Stand-in for %s.%s (see pbg.common.lazy)' % (
+        module_name, name)
+
+    return stand_in
+
+
+def _import(module_name):
+    __import__(module_name)
+    return sys.modules[module_name]
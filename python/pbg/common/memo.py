@@ -0,0 +1,142 @@
+"""Persistent memo of parse results, so we only re-parse pages that have
+changed.
+
+Results are stored as JSON, keyed by a hash of the page's bytes. Each
+parser version gets its own subdirectory, so changing the parser
+invalidates everything it parsed before; call
+:py:meth:`~MemoStore.invalidate_other_versions` to throw the old
+subdirectories away. Least recently used results are
+evicted once the store grows past *max_bytes*.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# a version from code_version(), maybe with suffixes like "-lxml". Only
+# subdirectories named like this are ours to delete.
+VERSION_RE = re.compile(r'^[0-9a-f]{16}(?:-[\w.]+)*$')
+
+
+def code_version(*modules):
+    """A version string that changes whenever the source of any of
+    *modules* (modules, or the names of modules to import) does."""
+    h = hashlib.sha1()
+    for module in modules:
+        if isinstance(module, basestring):
+            module = __import__(module, fromlist=['__name__'])
+        path = module.__file__
+        if path.endswith(('.pyc', '.pyo')):
+            path = path[:-1]
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+class MemoStore(object):
+    """Map page contents to JSON-serializable parse results, in
+    *memo_dir*.
+
+    *version* identifies the parser (see :py:func:`code_version`).
+    """
+
+    def __init__(self, memo_dir, version, max_bytes=DEFAULT_MAX_BYTES):
+        self.memo_dir = memo_dir
+        self.version = version
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self.version_dir = os.path.join(memo_dir, version)
+        if not os.path.isdir(self.version_dir):
+            os.makedirs(self.version_dir)
+
+        self._total_bytes = sum(
+            os.path.getsize(path) for path in self._entry_paths())
+
+    def get(self, data):
+        """Return the memoized result for *data* (a page, as bytes), or
+        ``None``."""
+        path = self._path(data)
+        try:
+            with open(path, 'rb') as f:
+                result = json.load(f)
+        except IOError:
+            self.misses += 1
+            return None
+
+        # mark as recently used
+        os.utime(path, None)
+        self.hits += 1
+        return result
+
+    def put(self, data, result):
+        """Memoize *result* for *data*, evicting old results if need be."""
+        path = self._path(data)
+        raw = json.dumps(result)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.version_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+
+        if os.path.exists(path):
+            self._total_bytes -= os.path.getsize(path)
+        os.rename(tmp_path, path)
+        self._total_bytes += len(raw)
+
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used results until we're under
+        *max_bytes*."""
+        entries = []
+        for path in self._entry_paths():
+            st = os.stat(path)
+            entries.append((st.st_mtime, path, st.st_size))
+        entries.sort()
+
+        self._total_bytes = sum(size for _, _, size in entries)
+
+        for _, path, size in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            self._total_bytes -= size
+
+    def invalidate_other_versions(self):
+        """Delete results from every parser version but ours. Leaves
+        alone anything in *memo_dir* that isn't named like a version (see
+        :py:data:`VERSION_RE`), in case it's shared."""
+        for name in os.listdir(self.memo_dir):
+            path = os.path.join(self.memo_dir, name)
+            if (name != self.version and VERSION_RE.match(name) and
+                    os.path.isdir(path)):
+                shutil.rmtree(path)
+
+    def clear(self):
+        """Delete all results for this parser version."""
+        for path in self._entry_paths():
+            os.remove(path)
+        self._total_bytes = 0
+
+    def stats(self):
+        """One-line summary of hits and misses, for logging."""
+        return 'memo: %d hits, %d misses' % (self.hits, self.misses)
+
+    def _path(self, data):
+        return os.path.join(self.version_dir,
+                            hashlib.sha1(data).hexdigest() + '.json')
+
+    def _entry_paths(self):
+        for name in os.listdir(self.version_dir):
+            if name.endswith('.json'):
+                yield os.path.join(self.version_dir, name)
@@ -1,7 +1,21 @@
-"""Thin wrapper around the microdata library."""
+"""Thin wrapper around the microdata library.
+
+Also a faster way to write Items as JSON: :py:func:`write_json` writes the
+same bytes as ``item.json()``, without building the whole tree of
+``json_dict()``\ s first. It uses :py:mod:`simplejson`'s C encoder if
+it's installed, and :py:mod:`json` otherwise.
+"""
 from __future__ import absolute_import
+import json
+from collections import defaultdict
+
 import microdata
 
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
 
 class Item(microdata.Item):
     """Add an "extra" field to microdata Items, so people won't feel the need
@@ -23,7 +37,13 @@ class Item(microdata.Item):
 
         return item
 
+    def json(self):
+        return ''.join(iter_json(self))
+
     def __eq__(self, other):
+        if isinstance(other, CompactItem):
+            return other == self
+
         if not isinstance(other, microdata.Item):
             return False
 
@@ -39,3 +59,307 @@ class Item(microdata.Item):
            self.itemid,
            self.props,
            self.extra)
+
+
+def item_from_json_dict(d, item_class=Item):
+    """Inverse of :py:meth:`Item.json_dict`: build an Item (including any
+    nested Items, and ``extra``) from WHATWG microdata JSON."""
+    item = item_class(' '.join(d['type']) if d.get('type') else None,
+                      d.get('id'))
+
+    for name, values in d.get('properties', {}).iteritems():
+        item.props[name] = [
+            item_from_json_dict(v, item_class) if _is_item_dict(v) else v
+            for v in values]
+
+    if d.get('extra'):
+        item.extra = d['extra']
+
+    return item
+
+
+def _is_item_dict(value):
+    return isinstance(value, dict) and 'properties' in value
+
+
+class CompactItem(object):
+    """Read-only stand-in for :py:class:`Item` that takes much less memory,
+    for loading lots of guide data at once.
+
+    Properties are kept in tuples rather than a dict of lists, there's no
+    per-instance ``__dict__``, and strings are shared between all the items
+    loaded by the same :py:class:`CompactLoader`. Supports ``get()``,
+    ``get_all()``, ``props``, ``extra``, ``json_dict()`` and ``json()``,
+    and compares equal to an :py:class:`Item` with the same data.
+    """
+    __slots__ = ('types', 'item_id', 'names', 'values', '_extra')
+
+    def __init__(self, types, item_id, names, values, extra=None):
+        self.types = types
+        self.item_id = item_id
+        # parallel tuples: property names, and tuples of their values
+        self.names = names
+        self.values = values
+        self._extra = extra or None
+
+    @property
+    def itemtype(self):
+        return [microdata.URI(t) for t in self.types]
+
+    @property
+    def itemid(self):
+        return microdata.URI(self.item_id) if self.item_id else None
+
+    @property
+    def props(self):
+        return dict((name, list(values))
+                    for name, values in zip(self.names, self.values))
+
+    @property
+    def extra(self):
+        return self._extra or {}
+
+    def get(self, name):
+        values = self.get_all(name)
+        if values:
+            return values[0]
+        return None
+
+    def get_all(self, name):
+        try:
+            return self.values[self.names.index(name)]
+        except ValueError:
+            return ()
+
+    def __getattr__(self, name):
+        # like microdata.Item, look up properties as attributes
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self.get(name)
+
+    def json_dict(self):
+        item = {}
+
+        if self.types:
+            item['type'] = list(self.types)
+        if self.item_id:
+            item['id'] = self.item_id
+
+        item['properties'] = props = defaultdict(list)
+
+        for name, values in zip(self.names, self.values):
+            for v in values:
+                if isinstance(v, CompactItem):
+                    props[name].append(v.json_dict())
+                else:
+                    props[name].append(v)
+
+        if self._extra:
+            item['extra'] = self._extra
+
+        return item
+
+    def json(self):
+        return ''.join(iter_json(self))
+
+    def __eq__(self, other):
+        if isinstance(other, CompactItem):
+            return (self.types == other.types and
+                    self.item_id == other.item_id and
+                    self.props == other.props and
+                    self.extra == other.extra)
+        elif isinstance(other, microdata.Item):
+            return (self.itemtype == (other.itemtype or []) and
+                    self.itemid == other.itemid and
+                    self.props == other.props and
+                    self.extra == getattr(other, 'extra', {}))
+        else:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%r, %r, props=%r, extra=%r)' % (
+            self.__class__.__name__,
+            ' '.join(self.types),
+            self.item_id,
+            self.props,
+            self.extra)
+
+
+class CompactLoader(object):
+    """Build :py:class:`CompactItem`\ s from WHATWG microdata JSON, sharing
+    equal strings (and tuples of strings) between them."""
+
+    def __init__(self):
+        self._interned = {}
+
+    def intern(self, value):
+        """Return the shared copy of *value*, which must be hashable."""
+        return self._interned.setdefault(value, value)
+
+    def item_from_json_dict(self, d):
+        """Like :py:func:`item_from_json_dict`, but build a CompactItem."""
+        intern = self.intern
+
+        types = intern(tuple(intern(t) for t in d.get('type') or ()))
+
+        names = []
+        values = []
+        for name, name_values in d.get('properties', {}).iteritems():
+            names.append(intern(name))
+            values.append(self._values(name_values))
+
+        return CompactItem(types, d.get('id'), intern(tuple(names)),
+                           tuple(values), d.get('extra'))
+
+    def load(self, f):
+        """Load a guide from JSON in the file object *f*, building
+        CompactItems as each item's JSON is decoded."""
+        return json.load(f, object_hook=self._object_hook)
+
+    def loads(self, s):
+        return json.loads(s, object_hook=self._object_hook)
+
+    def _values(self, values):
+        values = tuple(self.intern(v) if isinstance(v, basestring) else v
+                       for v in values)
+        # share common tuples like ('Good',)
+        if all(isinstance(v, basestring) for v in values):
+            values = self.intern(values)
+        return values
+
+    def _object_hook(self, d):
+        # inner dicts are decoded first, so nested items are already
+        # CompactItems by the time we get here
+        if 'properties' in d and isinstance(d['properties'], dict):
+            return self.item_from_json_dict(d)
+        else:
+            return d
+
+
+# what Item.json() uses: indent=2, and (unlike simplejson's default
+# with indent) a space after commas
+INDENT = 2
+SEPARATORS = (', ', ': ')
+
+
+def write_json(out, item):
+    """Write ``item.json()`` to the file object *out*, a piece at a time.
+    """
+    for chunk in iter_json(item):
+        out.write(chunk)
+
+
+def iter_json(item):
+    """Yield ``item.json()`` in pieces. Each value of *item*'s properties
+    (e.g. each of a guide's judgments) is encoded separately, so this
+    never holds much more than one of them at a time.
+
+    *item* can be a :py:class:`microdata.Item` (including our
+    :py:class:`Item`) or a :py:class:`CompactItem`.
+    """
+    encode = _encoder().encode
+
+    # same dict (and so the same key order) that json_dict() would make
+    fields = _shallow_json_dict(item)
+
+    yield '{'
+    for i, (key, value) in enumerate(fields.iteritems()):
+        yield _item_start(i, 1) + encode(key) + SEPARATORS[1]
+
+        if key != 'properties' or not value:
+            yield _indented(encode(value), 1)
+            continue
+
+        yield '{'
+        for j, (name, values) in enumerate(value.iteritems()):
+            yield _item_start(j, 2) + encode(name) + SEPARATORS[1] + '['
+            for k, v in enumerate(values):
+                yield _item_start(k, 3) + _indented(encode(v), 3)
+            yield _newline(2) + ']'
+        yield _newline(1) + '}'
+    yield _newline(0) + '}'
+
+
+def _item_start(i, level):
+    # the first field/value in a dict/list doesn't need a separator
+    if i:
+        return SEPARATORS[0] + _newline(level)
+    else:
+        return _newline(level)
+
+
+def _newline(level):
+    return '\n' + ' ' * (INDENT * level)
+
+
+def _indented(encoded, level):
+    # JSON strings can't contain a raw newline, so every newline is
+    # indentation
+    if '\n' in encoded:
+        return encoded.replace('\n', _newline(level))
+    return encoded
+
+
+_encoders = {}
+
+
+def _encoder():
+    if simplejson is not None:
+        module = simplejson
+    else:
+        module = json
+
+    if module not in _encoders:
+        _encoders[module] = module.JSONEncoder(
+            indent=INDENT, separators=SEPARATORS, default=_default)
+
+    return _encoders[module]
+
+
+def _default(o):
+    # called by the encoder for anything it doesn't know how to encode
+    if isinstance(o, (microdata.Item, CompactItem)):
+        return _shallow_json_dict(o)
+    elif isinstance(o, microdata.URI):
+        return o.string
+    else:
+        raise TypeError('%r is not JSON serializable' % (o,))
+
+
+def _shallow_json_dict(item):
+    """Like ``item.json_dict()``, but leave nested Items (and URIs) for
+    the encoder to convert when it gets to them.
+
+    Keys are added to each dict in the same order json_dict() does, so
+    that they come out in the same order.
+    """
+    fields = {}
+
+    if isinstance(item, CompactItem):
+        if item.types:
+            fields['type'] = list(item.types)
+        if item.item_id:
+            fields['id'] = item.item_id
+        props_items = zip(item.names, item.values)
+        extra = item._extra
+    else:
+        if item.itemtype:
+            fields['type'] = [i.string for i in item.itemtype]
+        if item.itemid:
+            fields['id'] = item.itemid.string
+        props_items = item.props.items()
+        extra = getattr(item, 'extra', None)
+
+    fields['properties'] = props = {}
+    for name, values in props_items:
+        # json_dict() leaves out properties with no values
+        if values:
+            props[name] = values
+
+    if extra:
+        fields['extra'] = extra
+
+    return fields
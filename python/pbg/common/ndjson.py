@@ -0,0 +1,114 @@
+"""Stream a buyer's guide as newline-delimited JSON.
+
+The first line is the guide itself (in WHATWG microdata JSON format, minus
+its judgments), and each line after that is one judgment. This lets
+scrapers write judgments as soon as they're parsed, and lets consumers
+start on them before the whole guide is done.
+
+To turn a stream back into a single JSON document:
+
+python -m pbg.common.ndjson < guide.ndjson > guide.json
+"""
+import json
+import sys
+from optparse import OptionParser
+
+from pbg.common.instrument import count
+from pbg.common.instrument import phase
+from pbg.common.lazy import lazy_import
+
+item_from_json_dict = lazy_import('pbg.common.microdata',
+                                  'item_from_json_dict')
+write_json = lazy_import('pbg.common.microdata', 'write_json')
+
+
+def write_guide_header(out, guide):
+    """Write *guide*, minus its judgments, as the first line of a stream.
+    """
+    guide_dict = guide.json_dict()
+    guide_dict['properties'].pop('judgment', None)
+    _write_line(out, guide_dict)
+
+
+def write_judgment(out, judgment):
+    """Write one judgment to a stream (after the header)."""
+    _write_line(out, judgment.json_dict())
+    count('judgments')
+
+
+def write_guide(out, guide, judgments=None):
+    """Write *guide* as a stream. If *judgments* (any iterable) is set,
+    write those rather than the guide's own judgments."""
+    write_guide_header(out, guide)
+
+    if judgments is None:
+        judgments = guide.get_all('judgment')
+
+    for judgment in judgments:
+        write_judgment(out, judgment)
+
+
+def _write_line(out, json_dict):
+    with phase('serialize'):
+        out.write(json.dumps(json_dict))
+        out.write('\n')
+
+
+def read_guide_dicts(lines):
+    """Read a stream from *lines* (e.g. a file object).
+
+    Returns ``(guide_dict, judgment_dicts)``, where *judgment_dicts*
+    lazily yields each judgment's JSON.
+    """
+    lines = iter(lines)
+
+    guide_dict = json.loads(next(lines))
+
+    def judgment_dicts():
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+    return guide_dict, judgment_dicts()
+
+
+def read_guide(lines, item_class=None):
+    """Like :py:func:`read_guide_dicts`, but returns
+    ``(guide, judgments)`` as Items. *guide* has no judgments.
+
+    *item_class* defaults to :py:class:`pbg.common.microdata.Item`.
+    """
+    if item_class is None:
+        from pbg.common.microdata import Item as item_class
+
+    guide_dict, judgment_dicts = read_guide_dicts(lines)
+
+    guide = item_from_json_dict(guide_dict, item_class)
+    judgments = (item_from_json_dict(j, item_class) for j in judgment_dicts)
+
+    return guide, judgments
+
+
+def load_guide(lines, item_class=None):
+    """Read a whole stream into a single guide Item.
+
+    The result has the same data as the guide that was written, but its
+    JSON may list properties in a different order.
+    """
+    guide, judgments = read_guide(lines, item_class)
+    guide.props['judgment'] = list(judgments)
+    return guide
+
+
+def main():
+    option_parser = OptionParser(usage='%prog < guide.ndjson > guide.json')
+    _, args = option_parser.parse_args()
+    if args:
+        option_parser.error('reads the stream from stdin; takes no arguments')
+
+    guide = load_guide(sys.stdin)
+    write_json(sys.stdout, guide)
+
+
+if __name__ == '__main__':
+    main()
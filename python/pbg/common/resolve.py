@@ -0,0 +1,341 @@
+"""Work out which names in different guides are the same company, brand,
+or hotel.
+
+usage:
+
+python -m pbg.common.resolve uhg.json eggs.html hrc.json
+python -m pbg.common.resolve --merged --threshold 0.8 hrc.json eggs.html
+
+Guides can be anything :py:func:`~pbg.common.index.read_guide_file`
+reads. Prints one line of JSON per entity: its canonical ID and name, and
+every match (see :py:func:`~pbg.common.index.iter_matches`) that
+resolved to it. With --merged, only prints entities that were known by
+more than one name.
+
+Guides don't agree on names: HRC says "Marriott International, Inc.",
+Cornucopia's free text says "by Marriott International", and so on. We
+first reduce each name to a key (see :py:func:`name_key`), which takes
+care of case, punctuation, and suffixes like "Inc.". Then we cluster keys
+whose sets of trigrams are similar enough (weighted Jaccard similarity of
+at least *threshold*, see :py:func:`similarity`), which takes care of
+typos and small differences in wording. Names with different numbers in
+them ("Motel 6", "Super 8") are never clustered, however similar they are
+otherwise.
+
+Comparing every pair of keys would be quadratic, so we use an inverted
+index from trigram to keys, with prefix filtering: if we order each key's
+trigrams from rarest to most common, two keys that are similar enough must
+share a trigram among the first few (the rarest) of each, so we only need
+to index (and look up) those. This finds exactly the same pairs as
+comparing every pair would.
+"""
+import json
+import math
+import re
+from collections import defaultdict
+from optparse import OptionParser
+
+from pbg.common.index import iter_matches
+from pbg.common.index import read_guide_file
+from pbg.common.text import fix_whitespace
+from pbg.common.text import normalize_name
+
+
+# how similar two keys' trigrams have to be to be the same entity
+DEFAULT_THRESHOLD = 0.6
+
+# the types of thing we resolve (see iter_matches())
+DEFAULT_TYPES = ('Corporation', 'Company', 'Brand', 'Hotel')
+
+# words that don't help tell companies apart, if they're at the end of
+# the name (or "the" at the start)
+SUFFIXES = set([
+    'co', 'company', 'corp', 'corporation', 'inc', 'incorporated', 'llc',
+    'lp', 'ltd', 'limited', 'plc',
+])
+
+NON_WORD_RE = re.compile(r'\W+', re.UNICODE)
+
+NUMBER_RE = re.compile(r'\d+', re.UNICODE)
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] GUIDE...')
+    option_parser.add_option(
+        '--threshold', dest='threshold', type='float',
+        default=DEFAULT_THRESHOLD,
+        help=('How similar (0-1) two names have to be to be the same'
+              ' entity (default %default)'))
+    option_parser.add_option(
+        '--types', dest='types', default=','.join(DEFAULT_TYPES),
+        help='Comma-separated types of thing to resolve (default %default)')
+    option_parser.add_option(
+        '--merged', dest='merged', default=False, action='store_true',
+        help='Only print entities known by more than one name')
+    options, args = option_parser.parse_args()
+    if not args:
+        option_parser.error('need at least one guide')
+
+    entities = resolve_guides(
+        [read_guide_file(path) for path in args],
+        types=options.types.split(','), threshold=options.threshold)
+
+    for entity in entities:
+        if options.merged and len(
+                set(match['name'] for match in entity['matches'])) < 2:
+            continue
+        print json.dumps(entity, sort_keys=True)
+
+
+def resolve_guides(guide_dicts, types=DEFAULT_TYPES,
+                   threshold=DEFAULT_THRESHOLD):
+    """Resolve the things that the guides in *guide_dicts* have judgments
+    about to entities.
+
+    Returns a list of dicts with ``id`` and ``name`` (see
+    :py:func:`resolve_names`) and ``matches``, a list of every match
+    (see :py:func:`~pbg.common.index.iter_matches`) of one of the *types*
+    that resolved to the entity. Entities are sorted by ID.
+    """
+    types = set(types)
+
+    matches = []
+    seen = set()
+    for guide_dict in guide_dicts:
+        for match, _ in iter_matches(guide_dict):
+            if not isinstance(match['name'], basestring):
+                continue
+            if not types.intersection((match['type'] or '').split()):
+                continue
+
+            # the same company often has more than one judgment
+            match_key = json.dumps(match, sort_keys=True)
+            if match_key not in seen:
+                seen.add(match_key)
+                matches.append(match)
+
+    ids, names = resolve_names([m['name'] for m in matches], threshold)
+
+    entities = {}
+    for match, entity_id in zip(matches, ids):
+        if entity_id not in entities:
+            entities[entity_id] = {
+                'id': entity_id, 'name': names[entity_id], 'matches': []}
+        entities[entity_id]['matches'].append(match)
+
+    return [entities[entity_id] for entity_id in sorted(entities)]
+
+
+def resolve_names(names, threshold=DEFAULT_THRESHOLD):
+    """Cluster *names* that are probably the same entity.
+
+    Returns ``(ids, canonical_names)``: a list of the canonical ID of each
+    of *names*, and a dict from ID to canonical name. The canonical name
+    is the most common name with the cluster's most common
+    :py:func:`name_key` (the shortest, then first in order, if there's a
+    tie), and its ID is that key.
+    """
+    keys = []
+    key_nums = {}
+    name_key_nums = []
+    for name in names:
+        key = name_key(name)
+        if key not in key_nums:
+            key_nums[key] = len(keys)
+            keys.append(key)
+        name_key_nums.append(key_nums[key])
+
+    numbers = [NUMBER_RE.findall(key) for key in keys]
+
+    clusters = _UnionFind(len(keys))
+    for i, j in similar_pairs([trigrams(key) for key in keys], threshold):
+        if numbers[i] == numbers[j]:
+            clusters.union(i, j)
+
+    # pick the canonical name for each cluster: the most common key, then
+    # the most common name with that key
+    key_counts = defaultdict(int)
+    name_counts = defaultdict(int)
+    first_seen = {}
+    for i, (name, key_num) in enumerate(zip(names, name_key_nums)):
+        key_counts[key_num] += 1
+        name_counts[name] += 1
+        first_seen.setdefault(name, i)
+
+    best = {}
+    for name, key_num in zip(names, name_key_nums):
+        root = clusters.find(key_num)
+        rank = (-key_counts[key_num], -name_counts[name], len(name),
+                first_seen[name])
+        if root not in best or rank < best[root][0]:
+            best[root] = (rank, name, key_num)
+
+    canonical_names = dict((keys[key_num], name)
+                           for _, name, key_num in best.itervalues())
+    ids = [keys[best[clusters.find(key_num)][2]]
+           for key_num in name_key_nums]
+
+    return ids, canonical_names
+
+
+def name_key(name):
+    """Reduce *name* to what matters for telling entities apart:
+    :py:func:`~pbg.common.text.normalize_name`, with ``&`` as ``and``,
+    no punctuation, and no suffixes like "Inc." (see :py:data:`SUFFIXES`)
+    or leading "The".
+
+    If that would leave nothing, just normalize the name.
+    """
+    key = normalize_name(name)
+    words = fix_whitespace(
+        NON_WORD_RE.sub(' ', key.replace('&', ' and '))).split(' ')
+
+    while words and words[-1] in SUFFIXES:
+        words.pop()
+    if words and words[0] == 'the':
+        words.pop(0)
+
+    return ' '.join(words) or key
+
+
+def trigrams(key):
+    """The set of three-character substrings of *key*, padded with a
+    space at each end so that short keys and word boundaries count."""
+    padded = ' %s ' % key
+    return set(padded[i:i + 3] for i in xrange(len(padded) - 2))
+
+
+def gram_weights(gram_sets):
+    """Weight each gram in *gram_sets* by how rare it is (its inverse
+    document frequency), so that grams from words like "International",
+    which lots of names have, count for less than ones from the words that
+    tell companies apart. Returns a dict from gram to weight."""
+    frequency = defaultdict(int)
+    for grams in gram_sets:
+        for gram in grams:
+            frequency[gram] += 1
+
+    num_sets = float(len(gram_sets))
+    return dict((gram, math.log(1 + num_sets / n))
+                for gram, n in frequency.iteritems())
+
+
+def similarity(a, b, weights):
+    """Weighted Jaccard similarity of the gram sets *a* and *b*: how much
+    their common grams weigh, over how much all their grams weigh."""
+    return _similarity(a, b, weights, _weigh(a, weights), _weigh(b, weights))
+
+
+def _weigh(grams, weights):
+    # fsum() doesn't care what order the set gives us the grams in
+    return math.fsum(weights[g] for g in grams)
+
+
+def _similarity(a, b, weights, total_a, total_b):
+    common = _weigh(a & b, weights)
+    total = total_a + total_b - common
+    return common / total if total else 0.0
+
+
+def similar_pairs(gram_sets, threshold=DEFAULT_THRESHOLD):
+    """Yield ``(i, j)`` for each pair of sets in *gram_sets* whose
+    :py:func:`similarity` (with :py:func:`gram_weights`) is at least
+    *threshold*, which must be more than 0.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError('threshold must be more than 0, and at most 1')
+
+    weights = gram_weights(gram_sets)
+    totals = [_weigh(grams, weights) for grams in gram_sets]
+
+    # order each set's grams from rarest to most common, so the prefixes
+    # we index are short, and have short posting lists
+    def order(gram):
+        return (-weights[gram], gram)
+
+    def prefix(grams, total, needed):
+        # yield each gram in the prefix, and the weight of the grams after
+        # it. If another set has nothing in common with the prefix, it has
+        # less than *needed* weight in common with *grams*.
+        slack = 1e-9 * total
+        left = total
+        for gram in sorted(grams, key=order):
+            if left < needed - slack:
+                return
+            left -= weights[gram]
+            yield gram, left
+
+    # go from lightest to heaviest, so we only need to look back at sets
+    # no heavier than this one
+    index = defaultdict(list)
+    for i in sorted(xrange(len(gram_sets)), key=totals.__getitem__):
+        grams = gram_sets[i]
+        total = totals[i]
+        if not grams:
+            continue
+
+        # a set no heavier than this one needs at least this much weight
+        # in common with it, and needs to weigh at least as much
+        needed = threshold * total
+        slack = 1e-9 * total
+
+        candidates = set()
+        for gram, left in prefix(grams, total, needed):
+            postings = index[gram]
+
+            # postings are in order by weight, and every set after this
+            # one needs more, so drop the ones that are too light
+            start = 0
+            while (start < len(postings) and
+                   totals[postings[start][0]] < needed - slack):
+                start += 1
+            if start:
+                del postings[:start]
+
+            for j, j_left in postings:
+                if j in candidates:
+                    continue
+                candidates.add(j)
+
+                # this is the first gram the two sets have in common, so
+                # they can't have more in common than it and what's left
+                # of the smaller set after it
+                if weights[gram] + min(left, j_left) < (
+                        threshold / (1 + threshold) * (total + totals[j]) -
+                        slack):
+                    continue
+                if _similarity(grams, gram_sets[j], weights,
+                               total, totals[j]) >= threshold:
+                    yield j, i
+
+        # a set at least as heavy as this one needs even more in common
+        # with it, so we can index a shorter prefix
+        for gram, left in prefix(grams, total, 2 * needed / (1 + threshold)):
+            index[gram].append((i, left))
+
+
+class _UnionFind(object):
+    """Disjoint sets of the numbers ``0`` through ``size - 1``."""
+
+    def __init__(self, size):
+        self._parent = range(size)
+
+    def find(self, i):
+        parent = self._parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            # keep the lower number as the root, so results don't depend
+            # on the order pairs come in
+            self._parent[max(i, j)] = min(i, j)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Choose which parser BeautifulSoup uses to build trees.
+
+lxml is about 10x faster than html5lib, so we use it by default (if it's
+installed). Parsers for pages that lxml doesn't handle the same way as
+a browser would pin :py:data:`HTML5LIB` instead.
+
+To check that a page parses the same either way, use
+:py:func:`diff_parsers` (``--verify-parsers`` on the command line).
+
+Most parsers only need a small part of the page. They can declare which
+parts with :py:func:`regions`, and we'll only build those parts of the
+tree.
+"""
+import difflib
+import imp
+import json
+import re
+
+from pbg.common.instrument import phase
+
+
+LXML = 'lxml'
+HTML5LIB = 'html5lib'
+
+PARSERS = (LXML, HTML5LIB)
+
+# tag, #id, .class, or a combination like p.copyright
+SIMPLE_SELECTOR_RE = re.compile(
+    r'^(?P<name>[\w-]+)?(?:#(?P<id>[\w-]+))?(?:\.(?P<class>[\w-]+))?$')
+
+
+def default_parser():
+    """:py:data:`LXML` if it's installed, otherwise :py:data:`HTML5LIB`."""
+    # just look for lxml; importing it takes longer than printing --help
+    try:
+        imp.find_module('lxml')
+        return LXML
+    except ImportError:
+        return HTML5LIB
+
+
+def make_soup(markup, parser=None, parse_only=None):
+    """Parse *markup* with *parser* (by default, :py:func:`default_parser`).
+
+    If *parse_only* (see :py:func:`regions`) is set, only build the parts
+    of the tree it matches. html5lib can't do this, so with it, we build
+    the whole tree; selecting from within the regions works the same
+    either way.
+    """
+    from bs4 import BeautifulSoup
+
+    parser = parser or default_parser()
+    if parser == HTML5LIB:
+        parse_only = None
+    elif isinstance(parse_only, Regions):
+        parse_only = parse_only.strainer()
+
+    with phase('soup'):
+        return BeautifulSoup(markup, parser, parse_only=parse_only)
+
+
+def regions(*selectors):
+    """Make a :py:class:`Regions` that keeps each element matching one of
+    *selectors*, along with everything inside it.
+
+    Selectors are simple: a tag name, ``#id``, ``.class``, or a
+    combination like ``p.copyright``. Elements inside another match are
+    kept whether they match or not, so e.g. ``table`` only needs to match
+    the outermost table.
+    """
+    matchers = []
+    for selector in selectors:
+        m = SIMPLE_SELECTOR_RE.match(selector)
+        if not (m and selector):
+            raise ValueError('not a simple selector: %r' % selector)
+        matchers.append((m.group('name'), m.group('id'), m.group('class')))
+
+    return Regions(matchers)
+
+
+class Regions(object):
+    """What :py:func:`regions` returns; pass it to :py:func:`make_soup` as
+    *parse_only*.
+
+    Parsers make these when they're imported, so we don't build the
+    actual :py:class:`~bs4.SoupStrainer` (or import bs4) until the first
+    page is parsed.
+    """
+
+    def __init__(self, matchers):
+        self._matchers = matchers
+        self._strainer = None
+
+    def strainer(self):
+        """The :py:class:`~bs4.SoupStrainer` for these regions."""
+        if self._strainer is None:
+            from bs4 import SoupStrainer
+            self._strainer = SoupStrainer(self.match)
+
+        return self._strainer
+
+    def match(self, name, attrs):
+        attrs = attrs or {}
+        classes = attrs.get('class') or ()
+        if isinstance(classes, basestring):
+            classes = classes.split()
+
+        for m_name, m_id, m_class in self._matchers:
+            if ((m_name is None or m_name == name) and
+                (m_id is None or m_id == attrs.get('id')) and
+                (m_class is None or m_class in classes)):
+                return True
+
+        return False
+
+
+def add_parser_options(option_parser, default=None):
+    """Add ``--parser`` and ``--verify-parsers`` to *option_parser*.
+
+    *default* is the parser to use if ``--parser`` isn't given (``None``
+    means :py:func:`default_parser`).
+    """
+    option_parser.add_option(
+        '--parser', dest='parser', default=default, choices=PARSERS,
+        help=('Parser to build trees with: %s (default: %s)' %
+              (', '.join(PARSERS), default or default_parser())))
+    option_parser.add_option(
+        '--verify-parsers', dest='verify_parsers', default=False,
+        action='store_true',
+        help=('Instead of parsing, check that every parser gets the same'
+              ' data from each page, and print any differences'))
+
+
+def diff_parsers(markup, extract, parsers=PARSERS, parse_only=None):
+    """Parse *markup* with each of *parsers* (and *parse_only*, see
+    :py:func:`make_soup`), and call *extract(soup)* on each tree to get the
+    data (e.g. microdata JSON) the page yields.
+
+    Returns a list of lines of unified diff between the data from the
+    first parser and each other parser (empty if they all agree). If
+    *extract* raises an exception, the exception is what gets compared.
+    """
+    results = []
+    for parser in parsers:
+        try:
+            data = extract(make_soup(markup, parser, parse_only))
+        except Exception, e:
+            data = {'exception': '%s: %s' % (e.__class__.__name__, e)}
+        results.append((parser, json.dumps(data, indent=2, sort_keys=True)))
+
+    first_parser, first_result = results[0]
+
+    diff = []
+    for parser, result in results[1:]:
+        diff.extend(difflib.unified_diff(
+            first_result.splitlines(), result.splitlines(),
+            first_parser, parser, lineterm=''))
+
+    return diff
+
+
+def verify_parsers(paths, extract, out, parse_only=None):
+    """Run :py:func:`diff_parsers` on each file in *paths*, writing a
+    report to *out*. Returns true if all parsers agree on every page.
+    """
+    all_same = True
+
+    for path in paths:
+        with open(path) as f:
+            markup = f.read()
+
+        diff = diff_parsers(markup, extract, parse_only=parse_only)
+        if diff:
+            all_same = False
+            out.write('%s: DIFFERENT\n' % path)
+            for line in diff:
+                out.write(line + '\n')
+        else:
+            out.write('%s: same\n' % path)
+
+    return all_same
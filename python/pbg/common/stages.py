@@ -0,0 +1,98 @@
+"""Run items through several stages at once, each in its own threads,
+connected by bounded queues.
+
+For example, to fetch pages on 8 threads, parse them on 1, and merge the
+results as they come in::
+
+    stages = [(fetch, 8), (parse, 1)]
+    for judgments in run_stages(urls, stages, window=16):
+        merge(judgments)
+
+Results come out in the same order as *items*, so the output doesn't depend
+on which page happened to download first.
+"""
+import sys
+import threading
+from Queue import Queue
+
+
+def run_stages(items, stages, window=16):
+    """Pass each of *items* through *stages*, a list of ``(func,
+    num_threads)``, and yield the results, in order.
+
+    At most *window* items are in flight (started, but not yet yielded) at
+    any time. If the caller falls behind, earlier stages wait rather than
+    piling up results in memory.
+
+    If *func* raises an exception, it's re-raised here, when we get to
+    that item. If iterating over *items* does, it's re-raised after the
+    results of the items before it.
+    """
+    if window < 1:
+        raise ValueError('window must be at least 1')
+
+    in_flight = threading.BoundedSemaphore(window)
+    queues = [Queue(window) for _ in xrange(len(stages) + 1)]
+
+    def feed():
+        num_items = 0
+        try:
+            for item in items:
+                in_flight.acquire()
+                queues[0].put((num_items, item, None))
+                num_items += 1
+        except Exception:
+            # skip the stages, but come out after the items before it
+            queues[-1].put((num_items, None, sys.exc_info()))
+        else:
+            # skip the stages, and tell the caller how many items to expect
+            queues[-1].put((None, num_items, None))
+
+    threads = [threading.Thread(target=feed)]
+
+    for stage_num, (func, num_threads) in enumerate(stages):
+        in_queue, out_queue = queues[stage_num], queues[stage_num + 1]
+        for _ in xrange(num_threads):
+            threads.append(threading.Thread(
+                target=_work, args=(func, in_queue, out_queue)))
+
+    # if the caller stops early, don't keep the process alive
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    num_items = None
+    # results that came out before an earlier item's did
+    waiting = {}
+    next_i = 0
+
+    while num_items is None or next_i < num_items:
+        if next_i in waiting:
+            result, error = waiting.pop(next_i)
+        else:
+            i, result, error = queues[-1].get()
+            if i is None:
+                if error is None:
+                    num_items = result
+                    continue
+            elif i != next_i:
+                waiting[i] = (result, error)
+                continue
+
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+        next_i += 1
+        in_flight.release()
+        yield result
+
+
+def _work(func, in_queue, out_queue):
+    while True:
+        i, item, error = in_queue.get()
+        if error is None:
+            try:
+                item = func(item)
+            except Exception:
+                item, error = None, sys.exc_info()
+        out_queue.put((i, item, error))
@@ -0,0 +1,207 @@
+"""Keep guides loaded in a long-running process, and pick up new versions
+of them without making anyone wait.
+
+usage::
+
+    store = GuideStore({'hrc': 'hrc.json', 'uhg': 'uhg.json'})
+    store.start()
+    ...
+    guide_dicts = store.current  # never blocks
+
+Guides can be anything :py:func:`~pbg.common.index.read_guide_file`
+reads. A thread checks each file's size, modification time, and inode
+(scrapers may write a new file and rename it over the old one) every
+*poll_interval* seconds. Once a file has changed, and then stayed the same
+for a poll (so we don't read it half-written), the thread parses it (a
+judgment at a time, so other threads aren't kept waiting), builds a new
+snapshot, and swaps it in with a single assignment. Readers that
+already have the old snapshot carry on with it; the next read of
+``store.current`` gets the new one. (:py:meth:`~GuideStore.snapshot`
+gets it along with its generation, e.g. for a cache key.) If the new
+version doesn't parse (or isn't a guide, or *build* fails on it), we keep
+the old one.
+
+A snapshot is a dict from guide name to guide dict, unless you pass
+*build*, e.g. :py:class:`~pbg.server.GuideQueries`. It's called with the
+guide dicts and the previous snapshot (None the first time), so it can
+reuse what didn't change; guides whose files didn't change are the same
+dicts as last time.
+"""
+from __future__ import with_statement
+
+import gc
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from pbg.common.index import read_guide_file
+from pbg.common.jsonstream import iter_array
+
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def _guide_dicts(guide_dicts, previous):
+    return guide_dicts
+
+
+class GuideStore(object):
+    """Guides from *paths*, a dict (or list of pairs) from guide name to
+    path, kept up to date. Loads them before returning."""
+
+    def __init__(self, paths, build=_guide_dicts,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+
+        self._paths = OrderedDict(paths)
+        self._build = build
+        self._stats = {}  # name -> stat of the version we loaded
+        self._settling = {}  # name -> stat of a version we haven't yet
+        self._guide_dicts = OrderedDict()
+
+        for name, path in self._paths.iteritems():
+            self._stats[name] = _stat(path)
+            self._guide_dicts[name] = read_guide(path)
+
+        # (generation, snapshot), swapped in one assignment, so readers
+        # never wait, or see one without the other
+        self._current = (
+            0, self._build(OrderedDict(self._guide_dicts), None))
+
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def check(self):
+        """Load any guides whose files have changed (and settled), and if
+        there were any, swap in a new snapshot. Returns True if we did.
+
+        The thread from :py:meth:`start` calls this; you can also call it
+        yourself, but not from two threads at once."""
+        changed = []
+        for name, path in self._paths.iteritems():
+            stat = _stat(path)
+            if stat == self._stats[name]:
+                self._settling.pop(name, None)
+            elif stat is not None and stat == self._settling.get(name):
+                changed.append((name, path, stat))
+            else:
+                self._settling[name] = stat
+
+        if not changed:
+            return False
+
+        # we're about to make lots of objects and keep them all, which
+        # would set off the garbage collector over and over, for nothing
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            guide_dicts = OrderedDict(self._guide_dicts)
+            loaded = False
+            for name, path, stat in changed:
+                # either way, don't try this version again
+                self._stats[name] = stat
+                del self._settling[name]
+                try:
+                    guide_dicts[name] = read_guide(path)
+                    loaded = True
+                except (IOError, ValueError), e:
+                    print >> sys.stderr, 'not reloading %s: %s' % (path, e)
+
+            if not loaded:
+                return False
+
+            generation, previous = self._current
+            try:
+                snapshot = self._build(guide_dicts, previous)
+            except Exception, e:
+                # don't let one bad guide kill the thread; keep the old
+                # snapshot (and guide dicts) until the file changes again
+                print >> sys.stderr, 'not reloading %s: %s: %s' % (
+                    ', '.join(path for _, path, _ in changed),
+                    e.__class__.__name__, e)
+                return False
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        self._guide_dicts = guide_dicts
+        self._current = (generation + 1, snapshot)
+
+        return True
+
+    @property
+    def current(self):
+        """The latest snapshot."""
+        return self._current[1]
+
+    @property
+    def generation(self):
+        """How many times we've swapped in a new snapshot."""
+        return self._current[0]
+
+    def snapshot(self):
+        """``(generation, snapshot)``, from the same swap."""
+        return self._current
+
+    def start(self):
+        """Check for changes every *poll_interval* seconds, in a thread,
+        until :py:meth:`stop` is called."""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._poll)
+        # don't keep the process alive just to watch files
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _poll(self):
+        while not self._stopping.wait(self.poll_interval):
+            self.check()
+
+
+def read_guide(path):
+    """Like :py:func:`~pbg.common.index.read_guide_file`, but decode a
+    JSON guide a judgment at a time, so other threads get to run in
+    between. (:py:func:`json.load` holds on to the interpreter until it's
+    read the whole file, which for a big guide is seconds.)
+
+    Raises :py:exc:`ValueError` if it's JSON, but not a guide dict."""
+    guide_dict = {}
+    try:
+        with open(path) as f:
+            judgments = list(
+                iter_array(f, ('properties', 'judgment'), guide_dict))
+    except ValueError:
+        # a stream, or HTML, or no judgments (or not a guide at all)
+        guide_dict = read_guide_file(path)
+        if not isinstance(guide_dict, dict):
+            raise ValueError('not a guide')
+        return guide_dict
+
+    guide_dict['properties']['judgment'] = judgments
+    return guide_dict
+
+
+def _stat(path):
+    # what changes when the file does; None if it's not there (e.g. in
+    # the middle of being replaced)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime, st.st_ino
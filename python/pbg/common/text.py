@@ -0,0 +1,16 @@
+"""Normalize names and other strings scraped from pages."""
+import re
+
+
+WHITESPACE_RE = re.compile('\s+')
+
+
+def fix_whitespace(s):
+    """Collapse runs of whitespace into a single space, and strip."""
+    return WHITESPACE_RE.sub(' ', s).strip()
+
+
+def normalize_name(name):
+    """Key for looking up *name*: :py:func:`fix_whitespace`, and
+    lowercased."""
+    return fix_whitespace(name).lower()
@@ -13,18 +13,25 @@
 # limitations under the License.
 """usage:
 
-curl http://www.cornucopia.org/organic-egg-scorecard/ > eggs.html
+python -m pbg.common.fetch --cache-dir pbg-cache http://www.cornucopia.org/organic-egg-scorecard/ > eggs.html
 python -m pbg.cornucopia.eggs eggs.html
 """
 import sys
 from optparse import OptionParser
 
+from pbg.common.css import select
+from pbg.common.instrument import add_instrument_options
+from pbg.common.instrument import count
+from pbg.common.instrument import instrumented
+from pbg.common.instrument import phase
+from pbg.common.lazy import lazy_import
+from pbg.common.soup import HTML5LIB
+from pbg.common.soup import add_parser_options
+from pbg.common.soup import make_soup
+from pbg.common.soup import verify_parsers
 
-from bs4 import BeautifulSoup
-from pyassert import assert_that
-
-
-from pbg.common.microdata import Item
+assert_that = lazy_import('pyassert', 'assert_that')
+microdata = lazy_import('microdata')
 
 
 STATE_NAME_TO_ABBR = {
@@ -65,19 +72,48 @@ def add_id(element):
 
 
 def main():
-    _, args = OptionParser().parse_args()
+    option_parser = OptionParser()
+    # use html5lib, as the default parser excludes almost all of the body
+    add_parser_options(option_parser, default=HTML5LIB)
+    add_instrument_options(option_parser)
+    options, args = option_parser.parse_args()
     assert_that(len(args)).equals(1)
-    with open(args[0]) as f:
-        html = f.read()
 
-    # use html5lib, as the default parser excludes almost all of the body
-    soup = BeautifulSoup(html, 'html5lib')
+    if options.verify_parsers:
+        sys.exit(0 if verify_parsers(args, annotated_microdata, sys.stdout)
+                 else 1)
+
+    with instrumented(options, 'pbg.cornucopia.eggs'):
+        with phase('read'):
+            with open(args[0]) as f:
+                html = f.read()
+
+        soup = make_soup(html, options.parser)
+
+        with phase('annotate'):
+            annotate(soup)
+
+        with phase('serialize'):
+            print soup
+
+
+def annotated_microdata(soup):
+    """Annotate *soup*, and return the microdata in it, as JSON."""
+    annotate(soup)
+    return [item.json_dict() for item in microdata.get_items(unicode(soup))]
+
+
+def annotate(soup):
+    """Add microdata to the scorecard page's tree, in place."""
+    # number IDs from the start, so annotating a page twice gives the
+    # same result
+    add_id.next_id = 0
 
     # the whole thing is the Buyer's Guide
     add_itemscope(soup.body, 'BuyersGuide')
 
     # find the name of the Buyer's Guide
-    name_spans = soup.select('table table span.style26')
+    name_spans = select(soup, 'table table span.style26')
     assert_that(len(name_spans)).equals(1)
     add_itemprop(name_spans[0], 'name')
 
@@ -91,6 +127,7 @@ def main():
         tds = tr.find_all('td')
         if len(tds) == 1:
             add_itemprop(tr, 'judgment', 'BuyersGuideJudgment')
+            count('judgments')
 
             add_itemprop(tr.td.strong, 'name')
             add_itemprop(tr.td.normal, 'description')
@@ -113,6 +150,7 @@ def main():
             assert_that(len(tds)).equals(6)
 
             add_itemprop(tr, 'reviewOfTarget', 'http://schema.org/Review')
+            count('reviews')
 
             # first column contains brand and company name
             add_itemprop(tds[0], 'itemReviewed', 'http://schema.org/Brand')
@@ -161,7 +199,7 @@ def main():
     about_a = footer.find('a', text='Home')
     add_itemprop(about_a, 'url')
 
-    donate_a = footer.select('div a')
+    donate_a = select(footer, 'div a')
     assert_that(len(donate_a)).equals(1)
     add_itemprop(donate_a[0], 'donationUrl')
 
@@ -170,8 +208,6 @@ def main():
         'meta', itemprop='name', content='The Cornucopia Institute')
     footer.append(org_name_tag)
 
-    print soup
-
 
 if __name__ == '__main__':
     main()
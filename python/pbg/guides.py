@@ -0,0 +1,56 @@
+"""Every guide we know how to scrape, by name.
+
+Each guide is run by calling its module's ``main()``, with ``args``
+followed by the arguments for that particular run (typically, the pages
+to parse) as its command line. It writes the guide to stdout.
+
+To list them:
+
+python -m pbg.guides
+"""
+from collections import namedtuple
+
+
+Guide = namedtuple('Guide', ['name', 'module', 'args', 'description'])
+
+
+GUIDES = dict((guide.name, guide) for guide in [
+    Guide('uhg', 'pbg.unitehere.uhg', [],
+          "UNITE HERE's hotel guide, from results.php"),
+    Guide('eggs', 'pbg.cornucopia.eggs', [],
+          "Cornucopia's organic egg scorecard, as HTML with microdata"),
+    Guide('hrc', 'pbg.pipeline', ['hrc'],
+          "HRC's buyer's guide, fetched, parsed and merged in one go"),
+    Guide('hrc-pages', 'pbg.hrc.buyersguide.data', [],
+          "HRC's buyer's guide, from hrc.html and already-fetched pages"),
+    Guide('stoprush', 'pbg.stoprush.stoprush', [],
+          "StopRush's list of Rush Limbaugh's sponsors, from its JSON dump"),
+])
+
+
+def get_guide(name):
+    """Look up a guide by name. Raises ``ValueError`` if there's no such
+    guide."""
+    try:
+        return GUIDES[name]
+    except KeyError:
+        raise ValueError('unknown guide %r (known guides: %s)' % (
+            name, ', '.join(sorted(GUIDES))))
+
+
+def load_main(guide):
+    """Import *guide*'s module, and return its ``main()``."""
+    module = __import__(guide.module, fromlist=['main'])
+    return module.main
+
+
+def main():
+    for name in sorted(GUIDES):
+        guide = GUIDES[name]
+        print '%-10s python -m %s %s' % (
+            name, guide.module, ' '.join(guide.args + ['...']))
+        print '%-10s %s' % ('', guide.description)
+
+
+if __name__ == '__main__':
+    main()
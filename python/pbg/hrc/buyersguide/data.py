@@ -14,33 +14,70 @@
 """usage:
 
 ROOT_URL=http://www.hrc.org/apps/buyersguide
-curl -L --compressed $ROOT_URL > hrc.html
+python -m pbg.common.fetch --cache-dir pbg-cache $ROOT_URL > hrc.html
 python -m pbg.hrc.buyersguide.urls hrc.html > hrc-urls.txt
 
 rm -rf hrc-pages
-mkdir hrc-pages
-for path in $(cat hrc-urls.txt)
-    do curl -L --compressed $ROOT_URL/$path > hrc-pages/$path.html
-done
+python -m pbg.hrc.buyersguide.fetch --cache-dir pbg-cache -d hrc-pages hrc-urls.txt
 python -m pbg.hrc.buyersguide.data hrc.html hrc-pages/*.html > hrc.json
+
+or do all of that in one go, with each page parsed as soon as it's fetched:
+
+python -m pbg.pipeline hrc --cache-dir pbg-cache > hrc.json
+
+Use --memo-dir to skip re-parsing pages that haven't changed since the last
+run, and --jobs to parse pages on several cores at once. Pages are parsed
+with lxml if it's installed; --verify-parsers checks that this gets the same
+data as html5lib.
+
+To start using judgments before every page is parsed, use --ndjson to write
+them one per line as they're parsed, and merge them afterwards:
+
+python -m pbg.hrc.buyersguide.data --ndjson hrc.html hrc-pages/*.html > hrc.ndjson
+python -m pbg.hrc.buyersguide.merge < hrc.ndjson > hrc.json
 """
 # TODO: parse http://www.hrc.org/apps/buyersguide/how-to-use.php
 # and include info on what the ratings mean
 from __future__ import with_statement
 
-import re
 import sys
+from HTMLParser import HTMLParser
+from itertools import chain
 from optparse import OptionParser
 
-from bs4 import BeautifulSoup
-from bs4 import NavigableString
-from bs4 import Tag
-from pyassert import assert_that
 from urlparse import urlparse
 from urlparse import parse_qsl
 
-from pbg.common.microdata import Item
-
+from pbg.common.css import child_tags
+from pbg.common.css import first_tags
+from pbg.common.css import select
+from pbg.common.instrument import add_instrument_options
+from pbg.common.instrument import count
+from pbg.common.instrument import instrumented
+from pbg.common.instrument import phase
+from pbg.common.lazy import lazy_import
+from pbg.common.memo import MemoStore
+from pbg.common.memo import code_version
+from pbg.common.ndjson import write_guide_header
+from pbg.common.ndjson import write_judgment
+from pbg.common.soup import add_parser_options
+from pbg.common.soup import default_parser
+from pbg.common.soup import make_soup
+from pbg.common.soup import regions
+from pbg.common.soup import verify_parsers
+from pbg.common.text import fix_whitespace
+
+Item = lazy_import('pbg.common.microdata', 'Item')
+assert_that = lazy_import('pyassert', 'assert_that')
+item_from_json_dict = lazy_import('pbg.common.microdata',
+                                  'item_from_json_dict')
+write_json = lazy_import('pbg.common.microdata', 'write_json')
+
+
+# the modules whose code decides what a page parses to, so --memo-dir
+# knows when to throw out what it memoized
+PARSE_MODULES = (__name__, 'pbg.common.css', 'pbg.common.microdata',
+                 'pbg.common.soup', 'pbg.common.text')
 
 RATING_COLOR_TO_JUDGMENT_TYPE = {
     'green': 'Good',
@@ -50,37 +87,87 @@ RATING_COLOR_TO_JUDGMENT_TYPE = {
 # TODO: parse this from the document
 CAMPAIGN_AUTHOR = 'Human Rights Campaign'
 CAMPAIGN_NAME = "Buyer's Guide"
-WHITESPACE_RE = re.compile('\s+')
+
+# everything we parse is inside <div id="content">
+REGIONS = regions('#content')
+
+# how much of a page to read at a time with --stream
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 def main():
-    _, args = OptionParser().parse_args()
+    option_parser = OptionParser()
+    option_parser.add_option(
+        '-j', '--jobs', dest='jobs', type='int', default=1,
+        help='Number of processes to parse pages with (default: %default)')
+    option_parser.add_option(
+        '--memo-dir', dest='memo_dir', default=None,
+        help=('Remember what we parsed from each page in this directory,'
+              ' and only re-parse pages that have changed'))
+    option_parser.add_option(
+        '--ndjson', dest='ndjson', default=False, action='store_true',
+        help=('Write one judgment per line, as pages are parsed, without'
+              ' merging judgments by company (see merge.py)'))
+    option_parser.add_option(
+        '--stream', dest='stream', default=False, action='store_true',
+        help=('Parse category pages a row at a time, rather than building'
+              ' a tree of the whole page. Use with --ndjson to handle'
+              ' pages of any size in constant memory'))
+    add_parser_options(option_parser)
+    add_instrument_options(option_parser)
+    options, args = option_parser.parse_args()
     assert_that(args).is_not_empty()
 
-    judgments = []
-    description = None
+    if options.stream and (options.memo_dir or options.jobs > 1):
+        option_parser.error("--stream can't be used with --memo-dir or -j")
 
-    for path in args:
-        with open(path) as f:
-            soup = BeautifulSoup(f.read(), 'html5lib')
+    if options.verify_parsers:
+        extract = lambda soup: page_to_json(*parse_page_soup(soup))
+        sys.exit(0 if verify_parsers(args, extract, sys.stdout,
+                                     parse_only=REGIONS) else 1)
 
-        content = soup.select('#content')[0]
+    parser = options.parser or default_parser()
 
-        divs = content.select('div')
+    memo = None
+    if options.memo_dir:
+        # results depend on which parser built the tree
+        memo = MemoStore(options.memo_dir,
+                         code_version(*PARSE_MODULES) + '-' + parser)
+        memo.invalidate_other_versions()
 
-        # main page
-        if len(divs) == 1:
-            assert_that(content.h1.string.lower()).equals('about the guide')
-            description = parse_about(content)
-        # category page
+    with instrumented(options, 'pbg.hrc.buyersguide.data'):
+        pages = parse_pages(args, memo=memo, jobs=options.jobs,
+                            parser=parser, stream=options.stream)
+
+        if options.ndjson:
+            write_unmerged_ndjson(sys.stdout, pages)
         else:
-            assert_that(len(divs)).equals(2)
-            judgments.extend(parse_category_page_divs(divs))
+            judgments = []
+            description = None
+
+            for page_description, page_judgments in pages:
+                if page_description is not None:
+                    description = page_description
+                judgments.extend(page_judgments)
+
+            assert_that(description).is_not_none()
+
+            with phase('merge'):
+                judgments = merge_judgments_by_company_name(judgments)
+            count('judgments', len(judgments))
 
-    assert_that(description).is_not_none()
+            guide = make_guide(description, judgments)
 
-    judgments = merge_judgments_by_company_name(judgments)
+            with phase('serialize'):
+                write_json(sys.stdout, guide)
 
+    if memo:
+        sys.stderr.write(memo.stats() + '\n')
+
+
+def make_guide(description, judgments=()):
+    """Make the BuyersGuide Item, given the description from the main page,
+    and (merged) judgments."""
     author = Item('NGO')
     author.set('name', CAMPAIGN_AUTHOR)
 
@@ -88,14 +175,368 @@ def main():
     guide.set('author', author)
     guide.set('name', CAMPAIGN_NAME)
     guide.set('description', description)
-    guide.props['judgment'] = judgments
+    guide.props['judgment'] = list(judgments)
+
+    return guide
+
+
+def write_unmerged_ndjson(out, pages):
+    """Write the guide and judgments from *pages* (see
+    :py:func:`parse_pages`) to *out* as a stream (see
+    :py:mod:`pbg.common.ndjson`), without merging judgments by company.
+
+    The guide's description is on the main page, so we hold onto any
+    judgments parsed before it; put the main page first to avoid this.
+    """
+    held_judgments = []
+    wrote_header = False
+
+    for description, judgments in pages:
+        if description is not None and not wrote_header:
+            write_guide_header(out, make_guide(description))
+            wrote_header = True
+
+            for judgment in held_judgments:
+                write_judgment(out, judgment)
+            held_judgments = None
+
+        for judgment in judgments:
+            if wrote_header:
+                write_judgment(out, judgment)
+            else:
+                held_judgments.append(judgment)
+
+    assert_that(wrote_header).is_true()
+
+
+def parse_page(html, parser=None):
+    """Parse the main page or a category page.
+
+    Returns ``(description, judgments)``. *description* is ``None`` for
+    category pages, and *judgments* is empty for the main page.
+    """
+    soup = make_soup(html, parser, REGIONS)
+    with phase('parse'):
+        return parse_page_soup(soup)
+
+
+def parse_page_soup(soup):
+    """Like :py:func:`parse_page`, but takes a tree."""
+    content = select(soup, '#content')[0]
+
+    divs = select(content, 'div')
+
+    # main page
+    if len(divs) == 1:
+        assert_that(content.h1.string.lower()).equals('about the guide')
+        return parse_about(content), []
+    # category page
+    else:
+        assert_that(len(divs)).equals(2)
+        return None, list(parse_category_page_divs(divs))
+
+
+def parse_pages(paths, memo=None, jobs=1, parser=None, stream=False):
+    """Yield ``(description, judgments)`` (see :py:func:`parse_page`) for
+    each file in *paths*, in order.
+
+    If *memo* (a :py:class:`~pbg.common.memo.MemoStore`) is set, only
+    parse pages that aren't in it. If *jobs* is more than 1, parse pages
+    in a pool of that many processes. If *stream* is true, use
+    :py:func:`parse_page_streaming` (in which case, *judgments* may be a
+    generator); this can't be combined with *memo* or *jobs*.
+    """
+    if stream:
+        assert_that(memo).is_none()
+        assert_that(jobs).le(1)
+        return (parse_page_streaming(path, parser) for path in paths)
+    elif jobs > 1:
+        return _parse_pages_in_pool(paths, memo, jobs, parser)
+    else:
+        return _parse_pages_serially(paths, memo, parser)
+
+
+def _parse_pages_serially(paths, memo, parser):
+    for path in paths:
+        html = _read_page(path)
 
-    sys.stdout.write(guide.json())
+        if memo:
+            with phase('memo'):
+                page = memo.get(html)
+            if page is None:
+                page = parse_page_to_json(html, parser)
+                with phase('memo'):
+                    memo.put(html, page)
+            yield page_from_json(page)
+        else:
+            yield parse_page(html, parser)
+
+
+def _parse_pages_in_pool(paths, memo, jobs, parser):
+    from collections import deque
+    from multiprocessing import Pool
+
+    # enough to keep every worker busy while we wait on the oldest page,
+    # without reading every page into memory up front
+    window = 2 * jobs
+
+    pool = Pool(jobs)
+    try:
+        # (html to memoize, AsyncResult or memoized page), in order
+        pending = deque()
+
+        for path in paths:
+            html = _read_page(path)
+
+            page = memo.get(html) if memo else None
+            if page is None:
+                result = pool.apply_async(parse_page_to_json, (html, parser))
+                pending.append((html if memo else None, result))
+            else:
+                pending.append((None, page))
+
+            if len(pending) >= window:
+                yield _finish_pooled_page(memo, *pending.popleft())
+
+        while pending:
+            yield _finish_pooled_page(memo, *pending.popleft())
+    except:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def _finish_pooled_page(memo, html, page):
+    from multiprocessing.pool import AsyncResult
+
+    if isinstance(page, AsyncResult):
+        # time spent waiting on worker processes
+        with phase('parse'):
+            page = page.get()
+    if html is not None:
+        memo.put(html, page)
+
+    return page_from_json(page)
+
+
+def _read_page(path):
+    with phase('read'), open(path) as f:
+        return f.read()
+
+
+def parse_page_to_json(html, parser=None):
+    """Parse a page, and return the result in a form that can be pickled
+    (for :py:class:`multiprocessing.Pool`) or serialized as JSON (for
+    :py:class:`~pbg.common.memo.MemoStore`)."""
+    return page_to_json(*parse_page(html, parser))
+
+
+def page_to_json(description, judgments):
+    """Convert the result of :py:func:`parse_page` to something we can
+    serialize."""
+    return {
+        'description': description,
+        'judgment': [j.json_dict() for j in judgments],
+    }
+
+
+def page_from_json(page):
+    """Inverse of :py:func:`page_to_json`."""
+    return (page['description'],
+            [item_from_json_dict(j) for j in page['judgment']])
+
+
+def parse_page_streaming(path, parser=None):
+    """Like :py:func:`parse_page`, but read the page from *path* a chunk
+    at a time. For category pages, *judgments* is a generator that parses
+    each row as soon as it's been read, so memory use doesn't grow with
+    the size of the page.
+    """
+    judgments = iter_category_page_judgments(path, parser)
+    try:
+        first_judgment = next(judgments)
+    except NotACategoryPage:
+        return parse_page(_read_page(path), parser)
+    except StopIteration:
+        return None, []
+
+    return None, chain([first_judgment], judgments)
+
+
+class NotACategoryPage(Exception):
+    pass
+
+
+def iter_category_page_judgments(path, parser=None):
+    """Yield the same judgments as :py:func:`parse_category_page_divs`,
+    reading the category page at *path* with a tokenizer rather than
+    building a tree for the whole page.
+
+    Each row is handed to :py:func:`parse_category_page_tr` (as a tree of
+    just that row, built with *parser*) as soon as it closes. Raises
+    :py:class:`NotACategoryPage` before yielding anything if the page
+    isn't a category page.
+    """
+    scanner = CategoryPageScanner()
+    category_name = None
+    num_rows = 0
+
+    with open(path) as f:
+        while not scanner.done:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if chunk:
+                scanner.feed(chunk)
+            else:
+                scanner.close()
+
+            rows = scanner.rows
+            scanner.rows = []
+
+            for row in rows:
+                if category_name is None:
+                    assert_that(len(scanner.h2s)).equals(2)
+                    search_h2, category_h2 = [
+                        make_soup(h2, parser).h2 for h2 in scanner.h2s]
+                    assert_that(search_h2.string.lower()).equals('search')
+                    # don't hold onto the h2's tree
+                    category_name = unicode(category_h2.string)
+
+                tr = make_soup('<table>%s</table>' % row, parser).tr
+
+                if num_rows == 0:
+                    # column headers
+                    assert_that(tr.td.p.strong.string).equals('Business')
+                else:
+                    yield parse_category_page_tr(tr, category_name)
+                num_rows += 1
+
+            if not chunk:
+                break
+
+    if scanner.num_divs < 2:
+        # main page
+        raise NotACategoryPage(path)
+
+    assert_that(scanner.num_divs).equals(2)
+    assert_that(num_rows).ge(1)
+
+
+TABLE_SECTIONS = ('thead', 'tbody', 'tfoot')
+
+
+class CategoryPageScanner(HTMLParser):
+    """Pick out the markup of the parts of a category page that
+    :py:func:`parse_category_page_divs` uses, as the page is fed in.
+
+    *h2s* is the first ``<h2>`` in each ``<div>`` in ``#content``, and
+    *rows* is each body row of a table in the second div: in a ``<tbody>``,
+    or directly inside the ``<table>`` (like
+    :py:func:`iter_table_body_rows`; the caller should empty it as it
+    goes). *done* is set at the end of ``#content``.
+    """
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+
+        self.h2s = []
+        self.rows = []
+        self.num_divs = 0
+        self.done = False
+
+        # 1 inside #content, 2 inside a div in #content, etc.
+        self._div_depth = 0
+        # for each table we're inside, the section (thead, tbody, or
+        # tfoot) we're in, or None if we're directly inside it
+        self._sections = []
+
+        # element we're capturing the markup of, and the markup so far
+        self._capturing = None
+        self._markup = []
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, self.get_starttag_text())
+
+    def handle_startendtag(self, tag, attrs):
+        if self._capturing:
+            self._markup.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self._capturing == 'tr' and tag in TABLE_SECTIONS + ('table',):
+            # </tr> is optional
+            self._finish()
+
+        if self._capturing:
+            self._markup.append('</%s>' % tag)
+            if tag == self._capturing:
+                self._finish()
+
+        if self._div_depth:
+            if tag == 'table' and self._sections:
+                self._sections.pop()
+            elif tag in TABLE_SECTIONS and self._sections:
+                self._sections[-1] = None
+            elif tag == 'div':
+                self._div_depth -= 1
+                if self._div_depth == 0:
+                    self.done = True
+
+    def handle_data(self, data):
+        if self._capturing:
+            self._markup.append(data)
+
+    def handle_entityref(self, name):
+        if self._capturing:
+            self._markup.append('&%s;' % name)
+
+    def handle_charref(self, name):
+        if self._capturing:
+            self._markup.append('&#%s;' % name)
+
+    def _start(self, tag, attrs, markup):
+        if self._capturing == 'tr' and tag in TABLE_SECTIONS + ('tr',):
+            # </tr> is optional
+            self._finish()
+
+        if self._div_depth and not self._capturing:
+            if (tag == 'h2' and self._div_depth >= 2 and
+                    len(self.h2s) == self.num_divs - 1):
+                self._capturing = 'h2'
+            elif (tag == 'tr' and self._sections and
+                  self._sections[-1] in (None, 'tbody') and
+                  self.num_divs == 2):
+                self._capturing = 'tr'
+
+        if self._capturing:
+            self._markup.append(markup)
+
+        if tag == 'div':
+            if self._div_depth:
+                self._div_depth += 1
+                self.num_divs += 1
+            elif dict(attrs).get('id') == 'content' and not self.done:
+                self._div_depth = 1
+        elif tag == 'table' and self._div_depth:
+            self._sections.append(None)
+        elif tag in TABLE_SECTIONS and self._sections:
+            self._sections[-1] = tag
+
+    def _finish(self):
+        markup = ''.join(self._markup)
+        if self._capturing == 'h2':
+            self.h2s.append(markup)
+        else:
+            self.rows.append(markup)
+
+        self._capturing = None
+        self._markup = []
 
 
 def parse_about(content):
     paragraphs = []
-    for p in content.select('> p'):
+    for p in select(content, '> p'):
         if p.string:
             paragraph = fix_whitespace(p.string)
             if paragraph:
@@ -104,16 +545,14 @@ def parse_about(content):
     return '\n\n'.join(paragraphs)
 
 
-def fix_whitespace(s):
-    return WHITESPACE_RE.sub(' ', s).strip()
-
-
 def parse_category_page_divs(divs):
     assert_that(divs[0].h2.string.lower()).equals('search')
 
-    category_name = divs[1].h2.string
+    # a NavigableString would keep the whole tree alive as long as the
+    # Items that use it
+    category_name = unicode(divs[1].h2.string)
 
-    trs = divs[1].select('table tbody tr')
+    trs = list(iter_table_body_rows(divs[1]))
 
     assert_that(trs[0].td.p.strong.string).equals('Business')
 
@@ -121,31 +560,47 @@ def parse_category_page_divs(divs):
         yield parse_category_page_tr(tr, category_name)
 
 
+def iter_table_body_rows(tag):
+    """Yield the body rows of each table in *tag*: the ``<tr>``\ s in its
+    ``<tbody>``\ s, or directly inside the ``<table>``. html5lib puts the
+    latter in a ``<tbody>`` for us, but lxml doesn't. Rows in a
+    ``<thead>`` or ``<tfoot>`` are left out."""
+    for table in select(tag, 'table'):
+        for child in child_tags(table):
+            if child.name == 'tr':
+                yield child
+            elif child.name == 'tbody':
+                for tr in child_tags(child, 'tr'):
+                    yield tr
+
+
 def parse_category_page_tr(tr, category_name):
-    tds = tr.select('td')
+    tds = select(tr, 'td')
     assert_that(len(tds)).equals(3)
 
     # parse the link
     biz_td = tds[0]
-    ps = biz_td.select('p')
+    ps = select(biz_td, 'p')
 
     assert_that(len(ps)).ge(1)
     assert_that(len(ps)).le(2)
 
     company_p = ps[0]
-    href = company_p.a['href']
+    company_tags = first_tags(company_p, 'a', 'em', 'img')
+
+    href = company_tags['a']['href']
     href_query = urlparse(href).query
     href_params = dict(parse_qsl(href_query))
 
     hrc_catid = href_params['catid']
     hrc_orgid = href_params['orgid']
 
-    company_name = company_p.a.strong.string
-    responded_to_survey = not(company_p.em)
+    company_name = unicode(company_tags['a'].strong.string)
+    responded_to_survey = not(company_tags['em'])
 
-    is_partner = bool(company_p.img)
+    is_partner = bool(company_tags['img'])
     if is_partner:
-        assert_is_partner_img(company_p.img)
+        assert_is_partner_img(company_tags['img'])
 
     if len(ps) >= 2:
         brand_p = ps[1]
@@ -200,6 +655,9 @@ def parse_category_page_tr(tr, category_name):
 
 
 def parse_brand_p(p):
+    from bs4 import NavigableString
+    from bs4 import Tag
+
     brand_names = []
     # apparently brands can partner with HRC too. They don't get the CSS right
     # for this on their website (img floats left), but whatever
@@ -235,34 +693,85 @@ def parse_img_src_rating_color(img_src):
 
 
 def merge_judgments_by_company_name(judgments):
-    cn_to_judgment = {}
+    # sorted() is stable, so each company's judgments stay in the order
+    # they were parsed
+    judgments = sorted(judgments, key=company_name)
 
-    for j in judgments:
-        cn = j.get('target').get('name')
+    return list(merge_sorted_judgments(judgments))
 
-        if cn in cn_to_judgment:
-            old_j = cn_to_judgment[cn]
 
-            safe_update(old_j.extra, j.extra, merge=['hrcPartnerBrand'])
+class CompanyMerger(object):
+    """Merge judgments by company name as they come in, rather than all at
+    once. Gives the same result as
+    :py:func:`merge_judgments_by_company_name`, given judgments in the
+    same order, but only holds one judgment per company.
+    """
 
-            safe_update(old_j.get('target').extra, j.get('target').extra,
-                        merge=['hrcCategoryID'])
-            safe_update(old_j.get('target').props, j.get('target').props,
-                        merge=['brand', 'category'])
+    def __init__(self):
+        self._by_company = {}
 
-            safe_update(old_j.props, j.props, skip=['target'])
+    def add(self, judgment):
+        name = company_name(judgment)
+        if name in self._by_company:
+            merge_judgment(self._by_company[name], judgment)
         else:
-            cn_to_judgment[cn] = j
+            self._by_company[name] = judgment
+
+    def __len__(self):
+        return len(self._by_company)
+
+    def merged_judgments(self):
+        """Return the merged judgments, sorted by company name."""
+        return [sort_merged_judgment(self._by_company[name])
+                for name in sorted(self._by_company)]
+
+
+def company_name(judgment):
+    return judgment.get('target').get('name')
+
+
+def merge_sorted_judgments(judgments):
+    """Merge consecutive judgments about the same company, and yield the
+    results. Like :py:func:`merge_judgments_by_company_name`, but takes
+    judgments already sorted by company name (see
+    :py:func:`company_name`), and only holds one company's judgments in
+    memory at a time.
+    """
+    current = None
+
+    for j in judgments:
+        if current is not None and company_name(j) == company_name(current):
+            merge_judgment(current, j)
+        else:
+            if current is not None:
+                yield sort_merged_judgment(current)
+            current = j
+
+    if current is not None:
+        yield sort_merged_judgment(current)
+
+
+def merge_judgment(old_j, j):
+    """Merge *j* into *old_j*, a judgment about the same company."""
+    safe_update(old_j.extra, j.extra, merge=['hrcPartnerBrand'])
+
+    safe_update(old_j.get('target').extra, j.get('target').extra,
+                merge=['hrcCategoryID'])
+    safe_update(old_j.get('target').props, j.get('target').props,
+                merge=['brand', 'category'])
+
+    safe_update(old_j.props, j.props, skip=['target'])
 
-    results = [j for (cn, j) in sorted(cn_to_judgment.iteritems())]
 
-    for j in results:
-        if j.extra.get('hrcPartnerBrand'):
-            j.extra['hrcPartnerBrand'].sort()
-        j.get('target').get_all('brand').sort(key=lambda b: b.get('name'))
-        j.get('target').get_all('category').sort()
+def sort_merged_judgment(j):
+    """Put lists that :py:func:`merge_judgment` added to in order, and
+    return *j*."""
+    if j.extra.get('hrcPartnerBrand'):
+        j.extra['hrcPartnerBrand'].sort()
+    j.get('target').get_all('brand').sort(key=lambda b: b.get('name'))
+    j.get('target').get_all('category').sort()
 
-    return results
+    return j
 
 
 def safe_update(dest, src, merge=(), skip=()):
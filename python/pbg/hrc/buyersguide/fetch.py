@@ -0,0 +1,134 @@
+# Copyright 2013 David Marin
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Download the HRC buying guide's category pages, concurrently.
+
+usage:
+
+ROOT_URL=http://www.hrc.org/apps/buyersguide
+python -m pbg.common.fetch --cache-dir pbg-cache $ROOT_URL > hrc.html
+python -m pbg.hrc.buyersguide.urls hrc.html > hrc-urls.txt
+python -m pbg.hrc.buyersguide.fetch --cache-dir pbg-cache -d hrc-pages hrc-urls.txt
+python -m pbg.hrc.buyersguide.data hrc.html hrc-pages/*.html > hrc.json
+
+(this replaces looping over hrc-urls.txt with curl). Reads URLs from stdin
+if no files are given. Use --root-url to fetch from somewhere else (e.g. a
+local mirror), and --cache-dir to skip re-downloading pages that haven't
+changed since the last run.
+"""
+from __future__ import with_statement
+
+import os
+import sys
+from collections import OrderedDict
+from optparse import OptionParser
+
+from pbg.common.fetch import Fetcher
+from pbg.common.fetch import add_cache_option
+from pbg.common.fetch import make_cache
+from pbg.common.lazy import lazy_import
+
+assert_that = lazy_import('pyassert', 'assert_that')
+
+
+ROOT_URL = 'http://www.hrc.org/apps/buyersguide'
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option(
+        '-d', '--dir', dest='dir', default='hrc-pages',
+        help='Directory to write pages to (default: %default)')
+    option_parser.add_option(
+        '-r', '--root-url', dest='root_url', default=ROOT_URL,
+        help='URL that paths are relative to (default: %default)')
+    option_parser.add_option(
+        '-j', '--threads', dest='threads', type='int', default=8,
+        help='Number of pages to fetch at once (default: %default)')
+    option_parser.add_option(
+        '-c', '--max-per-host', dest='max_per_host', type='int', default=4,
+        help='Max connections to any one host (default: %default)')
+    option_parser.add_option(
+        '--delay', dest='delay', type='float', default=0.25,
+        help=('Min seconds between starting requests to the same host'
+              ' (default: %default)'))
+    add_cache_option(option_parser)
+    options, args = option_parser.parse_args()
+
+    if args:
+        paths = []
+        for arg in args:
+            with open(arg) as f:
+                paths.extend(read_paths(f))
+    else:
+        paths = read_paths(sys.stdin)
+
+    assert_that(paths).is_not_empty()
+
+    if not os.path.isdir(options.dir):
+        os.makedirs(options.dir)
+
+    cache = make_cache(options)
+    fetcher = Fetcher(max_per_host=options.max_per_host,
+                      delay=options.delay, cache=cache)
+    try:
+        for path in fetch_pages(fetcher, options.root_url, paths,
+                                options.dir, num_threads=options.threads):
+            sys.stderr.write(path + '\n')
+    finally:
+        fetcher.close()
+
+    if cache:
+        sys.stderr.write(cache.stats() + '\n')
+
+
+def read_paths(lines):
+    """Read paths (as output by pbg.hrc.buyersguide.urls), skipping
+    blank lines."""
+    return [line.strip() for line in lines if line.strip()]
+
+
+def fetch_pages(fetcher, root_url, paths, dest_dir, num_threads=8):
+    """Fetch each path (relative to *root_url*) and write it to
+    ``<dest_dir>/<path>.html``, where pbg.hrc.buyersguide.data expects it.
+
+    Yields the path of each file, as it's written. If any pages couldn't
+    be fetched, raises :py:exc:`IOError` once the rest are written.
+    """
+    url_to_path = OrderedDict()
+    for path in paths:
+        url_to_path[root_url.rstrip('/') + '/' + path] = path
+
+    failed = []
+    for url, page, error in fetcher.fetch_all(
+            url_to_path, num_threads=num_threads):
+        if error is None and page.status != 200:
+            error = 'got status %d' % page.status
+        if error is not None:
+            sys.stderr.write('failed to fetch %s: %s\n' % (url, error))
+            failed.append(url)
+            continue
+
+        dest_path = os.path.join(dest_dir, url_to_path[url] + '.html')
+        with open(dest_path, 'wb') as f:
+            f.write(page.body)
+
+        yield dest_path
+
+    if failed:
+        raise IOError('failed to fetch %d of %d pages' % (
+            len(failed), len(url_to_path)))
+
+
+if __name__ == '__main__':
+    main()
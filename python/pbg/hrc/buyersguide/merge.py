@@ -0,0 +1,92 @@
+# Copyright 2013 David Marin
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Merge the unmerged judgments from ``data.py --ndjson`` by company name.
+
+usage:
+
+python -m pbg.hrc.buyersguide.data --ndjson hrc.html hrc-pages/*.html > hrc.ndjson
+python -m pbg.hrc.buyersguide.merge < hrc.ndjson > hrc.json
+
+Judgments are sorted by company name on disk (see pbg.common.extsort), so
+with --ndjson (write the merged guide as a stream, too), memory use doesn't
+grow with the size of the guide.
+"""
+import sys
+from optparse import OptionParser
+
+from pbg.common.extsort import DEFAULT_BUFFER_SIZE
+from pbg.common.extsort import external_sort
+from pbg.common.lazy import lazy_import
+from pbg.common.ndjson import read_guide_dicts
+from pbg.common.ndjson import write_guide
+from pbg.hrc.buyersguide.data import make_guide
+from pbg.hrc.buyersguide.data import merge_sorted_judgments
+
+item_from_json_dict = lazy_import('pbg.common.microdata',
+                                  'item_from_json_dict')
+write_json = lazy_import('pbg.common.microdata', 'write_json')
+
+
+def main():
+    option_parser = OptionParser()
+    option_parser.add_option(
+        '--ndjson', dest='ndjson', default=False, action='store_true',
+        help='Write one merged judgment per line (see pbg.common.ndjson)')
+    option_parser.add_option(
+        '--buffer-size', dest='buffer_size', type='int',
+        default=DEFAULT_BUFFER_SIZE,
+        help=('Number of judgments to sort in memory before spilling to'
+              ' disk (default: %default)'))
+    option_parser.add_option(
+        '--tmp-dir', dest='tmp_dir', default=None,
+        help='Where to spill judgments to (default: system temp dir)')
+    options, _ = option_parser.parse_args()
+
+    guide_dict, judgment_dicts = read_guide_dicts(sys.stdin)
+    description = item_from_json_dict(guide_dict).get('description')
+
+    judgments = merge_judgment_dicts(judgment_dicts,
+                                     buffer_size=options.buffer_size,
+                                     tmp_dir=options.tmp_dir)
+
+    if options.ndjson:
+        # build the guide the same way data.py does, so the output is too
+        write_guide(sys.stdout, make_guide(description), judgments)
+    else:
+        guide = make_guide(description, judgments)
+        write_json(sys.stdout, guide)
+
+
+def merge_judgment_dicts(judgment_dicts, buffer_size=DEFAULT_BUFFER_SIZE,
+                         tmp_dir=None):
+    """Merge judgments (as microdata JSON) by company name, with bounded
+    memory, and yield the merged judgments as Items, sorted by company
+    name. Gives the same results as
+    :py:func:`~pbg.hrc.buyersguide.data.merge_judgments_by_company_name`.
+    """
+    sorted_dicts = external_sort(judgment_dicts, key=company_name_from_dict,
+                                 buffer_size=buffer_size, tmp_dir=tmp_dir)
+
+    return merge_sorted_judgments(
+        item_from_json_dict(j) for j in sorted_dicts)
+
+
+def company_name_from_dict(judgment_dict):
+    target_dict = judgment_dict['properties']['target'][0]
+    names = target_dict['properties'].get('name')
+    return names[0] if names else None
+
+
+if __name__ == '__main__':
+    main()
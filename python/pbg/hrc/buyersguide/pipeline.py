@@ -0,0 +1,82 @@
+# Copyright 2013 David Marin
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Fetch, parse and merge the HRC buying guide in one go. Run this with
+``python -m pbg.pipeline hrc`` (see :py:mod:`pbg.pipeline`).
+
+The output is the same as the step-by-step way (see
+:py:mod:`pbg.hrc.buyersguide.data`): category pages are merged in the
+order ``hrc-pages/*.html`` would list them, however they finish
+downloading.
+"""
+from pbg.common.instrument import count
+from pbg.common.instrument import phase
+from pbg.common.lazy import lazy_import
+from pbg.common.stages import run_stages
+from pbg.hrc.buyersguide.data import CompanyMerger
+from pbg.hrc.buyersguide.data import make_guide
+from pbg.hrc.buyersguide.data import parse_page
+from pbg.hrc.buyersguide.fetch import ROOT_URL
+from pbg.hrc.buyersguide.urls import parse_urls
+
+assert_that = lazy_import('pyassert', 'assert_that')
+write_json = lazy_import('pbg.common.microdata', 'write_json')
+
+
+def run_pipeline(out, fetcher, root_url=None, parser=None, fetch_threads=8,
+                 parse_threads=1, window=16):
+    """Fetch the guide from *root_url* with *fetcher* (a
+    :py:class:`~pbg.common.fetch.Fetcher`), and write it to *out* as JSON.
+
+    Category pages are fetched on *fetch_threads* threads, parsed (with
+    *parser*) on *parse_threads* threads, and merged as they come in. At
+    most *window* pages are between being fetched and merged at once.
+    """
+    root_url = (root_url or ROOT_URL).rstrip('/')
+
+    root_page = fetch_page(fetcher, root_url)
+    description, _ = parse_page(root_page.body, parser)
+    assert_that(description).is_not_none()
+
+    # the order pbg.hrc.buyersguide.fetch's files sort in
+    paths = sorted(parse_urls(root_page.body, parser),
+                   key=lambda path: path + '.html')
+    page_urls = [root_url + '/' + path for path in paths]
+
+    def parse_category_page(page):
+        _, judgments = parse_page(page.body, parser)
+        return judgments
+
+    stages = [
+        (lambda url: fetch_page(fetcher, url), fetch_threads),
+        (parse_category_page, parse_threads),
+    ]
+
+    merger = CompanyMerger()
+    for judgments in run_stages(page_urls, stages, window=window):
+        with phase('merge'):
+            for judgment in judgments:
+                merger.add(judgment)
+
+    with phase('merge'):
+        judgments = merger.merged_judgments()
+    count('judgments', len(judgments))
+
+    with phase('serialize'):
+        write_json(out, make_guide(description, judgments))
+
+
+def fetch_page(fetcher, url):
+    page = fetcher.fetch(url)
+    assert_that(page.status).equals(200)
+    return page
@@ -16,28 +16,68 @@
 usage:
 
 ROOT_URL=http://www.hrc.org/apps/buyersguide
-curl -L --compressed $ROOT_URL > hrc.html
+python -m pbg.common.fetch --cache-dir pbg-cache $ROOT_URL > hrc.html
 python -m pbg.hrc.buyersguide.urls hrc.html > hrc-urls.txt
 
-See data.py for what to do next
+See fetch.py and data.py for what to do next
 """
 from __future__ import with_statement
 
+import sys
 from optparse import OptionParser
 
-from bs4 import BeautifulSoup
-from pyassert import assert_that
 from urllib import urlencode
 
+from pbg.common.css import select
+from pbg.common.instrument import add_instrument_options
+from pbg.common.instrument import counted
+from pbg.common.instrument import instrumented
+from pbg.common.instrument import phase
+from pbg.common.lazy import lazy_import
+from pbg.common.soup import add_parser_options
+from pbg.common.soup import make_soup
+from pbg.common.soup import regions
+from pbg.common.soup import verify_parsers
+
+assert_that = lazy_import('pyassert', 'assert_that')
+
+
+# the forms we want are inside <div id="content">
+REGIONS = regions('#content')
+
 
 def main():
-    _, args = OptionParser().parse_args()
+    option_parser = OptionParser()
+    add_parser_options(option_parser)
+    add_instrument_options(option_parser)
+    options, args = option_parser.parse_args()
     assert_that(len(args)).equals(1)
-    with open(args[0]) as f:
-        soup = BeautifulSoup(f.read())
 
-    selected_options = soup.select(
-        '#content div.legislation-box form option[selected]')
+    if options.verify_parsers:
+        extract = lambda soup: list(parse_urls_soup(soup))
+        sys.exit(0 if verify_parsers(args, extract, sys.stdout,
+                                     parse_only=REGIONS) else 1)
+
+    with instrumented(options, 'pbg.hrc.buyersguide.urls'):
+        with phase('read'):
+            with open(args[0]) as f:
+                html = f.read()
+
+        with phase('parse'):
+            for url in counted('urls', parse_urls(html, options.parser)):
+                print url
+
+
+def parse_urls(html, parser=None):
+    """Yield the (relative) URL of each category page linked from the
+    main page of the buyer's guide."""
+    return parse_urls_soup(make_soup(html, parser, REGIONS))
+
+
+def parse_urls_soup(soup):
+    """Like :py:func:`parse_urls`, but takes a tree."""
+    selected_options = select(
+        soup, '#content div.legislation-box form option[selected]')
     assert_that(selected_options).is_not_empty()
 
     for selected_option in selected_options:
@@ -54,17 +94,16 @@ def main():
 
         action = form['action']
 
-        selects = form.select('select')
+        selects = select(form, 'select')
         assert_that(len(selects)).equals(1)
 
         name = selects[0]['name']
 
-        options = form.select('option[value]')
+        options = select(form, 'option[value]')
         assert_that(len(options)).gt(10)
 
         for option in options:
-            url = action + '?' + urlencode({name: option['value']})
-            print url
+            yield action + '?' + urlencode({name: option['value']})
 
         return
 
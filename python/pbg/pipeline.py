@@ -0,0 +1,97 @@
+"""Scrape a guide from start to finish in one go.
+
+usage:
+
+python -m pbg.pipeline hrc --cache-dir pbg-cache > hrc.json
+
+This replaces running pbg.common.fetch, pbg.hrc.buyersguide.urls,
+pbg.hrc.buyersguide.fetch and pbg.hrc.buyersguide.data one after another,
+each waiting for the last to finish. Here, the stages overlap: each page
+is parsed as soon as it's downloaded, and its judgments are merged as
+soon as they're parsed.
+
+Each stage runs in its own threads, connected by bounded queues (see
+:py:mod:`pbg.common.stages`). At most --window pages are in the pipeline
+at once; if parsing falls behind, fetching waits for it, so memory use
+doesn't grow with the number of pages.
+
+Use --root-url to scrape from somewhere else (e.g. a local mirror).
+"""
+from __future__ import with_statement
+
+import sys
+from optparse import OptionParser
+
+from pbg.common.fetch import Fetcher
+from pbg.common.fetch import add_cache_option
+from pbg.common.fetch import make_cache
+from pbg.common.instrument import add_instrument_options
+from pbg.common.instrument import instrumented
+from pbg.common.soup import PARSERS
+from pbg.common.soup import default_parser
+from pbg.hrc.buyersguide import pipeline as hrc_pipeline
+
+
+# guide name -> function that runs its pipeline
+PIPELINES = {
+    'hrc': hrc_pipeline.run_pipeline,
+}
+
+
+def main():
+    option_parser = OptionParser(
+        usage='%%prog [options] GUIDE (one of: %s)' %
+        ', '.join(sorted(PIPELINES)))
+    option_parser.add_option(
+        '-r', '--root-url', dest='root_url', default=None,
+        help="URL of the guide (default: the guide's own site)")
+    option_parser.add_option(
+        '-j', '--threads', dest='threads', type='int', default=8,
+        help='Number of pages to fetch at once (default: %default)')
+    option_parser.add_option(
+        '--parse-threads', dest='parse_threads', type='int', default=1,
+        help='Number of pages to parse at once (default: %default)')
+    option_parser.add_option(
+        '-w', '--window', dest='window', type='int', default=16,
+        help=('Max pages between being fetched and being merged'
+              ' (default: %default)'))
+    option_parser.add_option(
+        '-c', '--max-per-host', dest='max_per_host', type='int', default=4,
+        help='Max connections to any one host (default: %default)')
+    option_parser.add_option(
+        '--delay', dest='delay', type='float', default=0.25,
+        help=('Min seconds between starting requests to the same host'
+              ' (default: %default)'))
+    option_parser.add_option(
+        '--parser', dest='parser', default=None, choices=PARSERS,
+        help=('Parser to build trees with: %s (default: %s)' %
+              (', '.join(PARSERS), default_parser())))
+    add_cache_option(option_parser)
+    add_instrument_options(option_parser)
+    options, args = option_parser.parse_args()
+
+    if len(args) != 1 or args[0] not in PIPELINES:
+        option_parser.error('need one guide: %s' %
+                            ', '.join(sorted(PIPELINES)))
+
+    cache = make_cache(options)
+    fetcher = Fetcher(max_per_host=options.max_per_host,
+                      delay=options.delay, cache=cache)
+    try:
+        with instrumented(options, 'pbg.pipeline'):
+            PIPELINES[args[0]](
+                sys.stdout, fetcher,
+                root_url=options.root_url,
+                parser=options.parser,
+                fetch_threads=options.threads,
+                parse_threads=options.parse_threads,
+                window=options.window)
+    finally:
+        fetcher.close()
+
+    if cache:
+        sys.stderr.write(cache.stats() + '\n')
+
+
+if __name__ == '__main__':
+    main()
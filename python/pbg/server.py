@@ -0,0 +1,477 @@
+"""Serve lookups in the guides over HTTP.
+
+usage:
+
+python -m pbg.server [--port 8080] [--watch] hrc=hrc.json uhg=uhg.json
+    eggs.html
+
+Each guide is ``NAME=PATH``, or just a path (its name is then the file's
+name, without the extension). Guides can be anything
+:py:func:`~pbg.common.index.read_guide_file` reads; they're loaded once,
+when the server starts. With --watch, they're reloaded when their files
+change (see :py:mod:`pbg.common.store`), re-indexing only the judgments
+that changed; requests are answered from the old guides until the new
+ones are ready.
+
+Requests:
+
+- ``GET /guides``: the names of the guides, as ``{"guides": [...]}``
+- ``GET /guides/NAME``: the whole guide
+- ``GET /judgments?guide=hrc&name=Marriott&judgmentType=Good&hrcOrgID=1``:
+  the judgments that match every parameter given, as
+  ``{"items": [...]}``. ``name`` is the name of anything the judgment is
+  about (see :py:func:`~pbg.common.index.iter_matches`), in any case.
+  ``limit`` returns at most that many.
+
+Guides and judgments are microdata JSON, as ``Item.json_dict()`` writes
+them. Errors are ``{"error": "..."}`` with a 4xx status.
+
+We index the judgments by each parameter and encode each one as JSON
+when the server starts, so a query is just an intersection of lists and a
+join. Responses are kept in an LRU cache (--cache-size), each with an
+ETag, so clients that send ``If-None-Match`` get a 304 without the body.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler
+from BaseHTTPServer import HTTPServer
+from collections import OrderedDict
+from collections import defaultdict
+from collections import namedtuple
+from optparse import OptionParser
+from SocketServer import ThreadingMixIn
+
+from pbg.common.diff import JUDGMENT_PROPS
+from pbg.common.diff import judgment_key
+from pbg.common.index import iter_judgment_matches
+from pbg.common.index import read_guide_file
+from pbg.common.store import DEFAULT_POLL_INTERVAL
+from pbg.common.store import GuideStore
+from pbg.common.text import normalize_name
+
+
+DEFAULT_PORT = 8080
+DEFAULT_CACHE_SIZE = 1000
+
+# query parameters we can look judgments up by
+QUERY_PARAMS = ('guide', 'name', 'judgmentType', 'hrcOrgID')
+
+# how far ahead GuideQueries looks for an unchanged judgment in the old
+# version of a guide, before matching it up by key
+LOOKAHEAD = 8
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] [NAME=]GUIDE...')
+    option_parser.add_option(
+        '--host', dest='host', default='127.0.0.1',
+        help='Address to listen on (default %default)')
+    option_parser.add_option(
+        '--port', dest='port', type='int', default=DEFAULT_PORT,
+        help='Port to listen on, or 0 for any free port (default %default)')
+    option_parser.add_option(
+        '--cache-size', dest='cache_size', type='int',
+        default=DEFAULT_CACHE_SIZE,
+        help='Number of responses to cache, or 0 for none (default %default)')
+    option_parser.add_option(
+        '--watch', dest='watch', default=False, action='store_true',
+        help='Reload guides when their files change')
+    option_parser.add_option(
+        '--poll-interval', dest='poll_interval', type='float',
+        default=DEFAULT_POLL_INTERVAL,
+        help='With --watch, seconds between checks (default %default)')
+    options, args = option_parser.parse_args()
+    if not args:
+        option_parser.error('need at least one guide')
+
+    paths = OrderedDict()
+    for arg in args:
+        if '=' in arg:
+            name, path = arg.split('=', 1)
+        else:
+            path = arg
+            name = os.path.splitext(os.path.basename(path))[0]
+        paths[name] = path
+
+    if options.watch:
+        queries = GuideStore(paths, build=GuideQueries,
+                             poll_interval=options.poll_interval)
+        queries.start()
+    else:
+        queries = GuideQueries(OrderedDict(
+            (name, read_guide_file(path))
+            for name, path in paths.iteritems()))
+
+    server = make_server(queries, options.host, options.port,
+                         cache_size=options.cache_size)
+
+    # so whoever started us knows which port we got
+    print >> sys.stderr, 'serving on %s' % server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+class QueryError(Exception):
+    """A bad request; *status* is the HTTP status to send."""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class GuideQueries(object):
+    """Index the judgments in *guide_dicts*, a dict from guide name to the
+    guide's microdata JSON, to answer queries.
+
+    If *previous* (the GuideQueries for an older version of the guides)
+    is given, we reuse what we can from it, so only what changed is
+    encoded and indexed again. A guide that's the same dict as before is
+    reused whole. Otherwise, we match up each judgment with the old one
+    about the same thing (by :py:func:`~pbg.common.diff.judgment_key`:
+    its hrcOrgID, or its name and address, etc.), and if they're equal,
+    reuse its JSON and index entries. How many judgments were reused,
+    changed, added, and removed is in ``stats``.
+    """
+
+    def __init__(self, guide_dicts, previous=None):
+        self._guide_dicts = OrderedDict(guide_dicts)
+        self._guide_bodies = {}  # filled in as guides are asked for
+        self.stats = dict.fromkeys(
+            ('reused', 'changed', 'added', 'removed'), 0)
+
+        # for each guide, a _Judgment for each of its judgments, in order
+        self._judgments = {}
+        for guide_name, guide_dict in self._guide_dicts.iteritems():
+            if previous is not None and (
+                    previous._guide_dicts.get(guide_name) is guide_dict):
+                self._judgments[guide_name] = previous._judgments[guide_name]
+                self._guide_bodies[guide_name] = previous._guide_bodies.get(
+                    guide_name)
+                self.stats['reused'] += len(self._judgments[guide_name])
+            else:
+                old_judgments = ()
+                if previous is not None:
+                    old_judgments = previous._judgments.get(guide_name, ())
+                self._judgments[guide_name] = self._update_judgments(
+                    guide_dict, old_judgments)
+
+        # each judgment's JSON, by number
+        self._encoded = []
+        # for each query parameter, a dict from value to judgment numbers
+        self._index = dict((param, defaultdict(list))
+                           for param in QUERY_PARAMS)
+
+        # this is the part we can't reuse, because judgments' numbers
+        # change, so keep it quick
+        index = self._index
+        encoded = self._encoded
+        for guide_name, judgments in self._judgments.iteritems():
+            guide_nums = index['guide'][guide_name]
+            for judgment in judgments:
+                num = len(encoded)
+                encoded.append(judgment.encoded)
+                guide_nums.append(num)
+                for param, value in judgment.index_values:
+                    # judgments are added in order, so this keeps each
+                    # list sorted, without repeats (e.g. a company and its
+                    # brand with the same name)
+                    nums = index[param][value]
+                    if not nums or nums[-1] != num:
+                        nums.append(num)
+
+    def _update_judgments(self, guide_dict, old_judgments):
+        props = guide_dict.get('properties', {})
+        judgment_dicts = [judgment_dict for prop in JUDGMENT_PROPS
+                          for judgment_dict in props.get(prop, ())]
+        judgments = [None] * len(judgment_dicts)
+
+        # most judgments are usually in the same order as before, give or
+        # take a few added, removed, or changed, and comparing dicts is
+        # much quicker than working out keys, so try that first: look for
+        # each judgment a little way past the last one we found
+        used = [False] * len(old_judgments)
+        k = 0
+        for i, judgment_dict in enumerate(judgment_dicts):
+            for j in xrange(k, min(k + LOOKAHEAD, len(old_judgments))):
+                if old_judgments[j].judgment_dict == judgment_dict:
+                    judgments[i] = old_judgments[j]
+                    used[j] = True
+                    self.stats['reused'] += 1
+                    k = j + 1
+                    break
+
+        # match up the rest by key (keys aren't always unique, e.g. an
+        # unmerged HRC guide has a judgment per category for each company)
+        by_key = {}
+        for old, old_used in zip(old_judgments, used):
+            if not old_used:
+                by_key.setdefault(
+                    judgment_key(old.judgment_dict), []).append(old)
+
+        unmatched = []  # (number, key) of judgments with no equal old one
+        for i, judgment_dict in enumerate(judgment_dicts):
+            if judgments[i] is not None:
+                continue
+            key = judgment_key(judgment_dict) if by_key else None
+            olds = by_key.get(key, ())
+            for k, old in enumerate(olds):
+                if old.judgment_dict == judgment_dict:
+                    judgments[i] = old
+                    del olds[k]
+                    self.stats['reused'] += 1
+                    break
+            else:
+                unmatched.append((i, key))
+
+        for i, key in unmatched:
+            olds = by_key.get(key)
+            if olds:
+                olds.pop(0)
+                self.stats['changed'] += 1
+            else:
+                self.stats['added'] += 1
+
+            judgment_dict = judgment_dicts[i]
+            judgments[i] = _Judgment(
+                judgment_dict, json.dumps(judgment_dict),
+                _index_values(judgment_dict))
+
+        self.stats['removed'] += sum(len(olds) for olds in by_key.itervalues())
+
+        # have the guide share the old dicts for judgments that didn't
+        # change (they're equal, after all), so the new ones can be freed
+        i = 0
+        for prop in JUDGMENT_PROPS:
+            judgment_list = props.get(prop, ())
+            if isinstance(judgment_list, list):
+                judgment_list[:] = [judgment.judgment_dict for judgment in
+                                    judgments[i:i + len(judgment_list)]]
+            i += len(judgment_list)
+
+        return judgments
+
+    def guide_names(self):
+        return list(self._guide_dicts)
+
+    def guide(self, name):
+        """The JSON of the guide called *name*."""
+        if name not in self._guide_dicts:
+            raise QueryError(404, 'no guide named %r' % name)
+        # encoded the first time it's asked for (two threads might both
+        # do it, which is harmless)
+        body = self._guide_bodies.get(name)
+        if body is None:
+            body = self._guide_bodies[name] = json.dumps(
+                self._guide_dicts[name])
+        return body
+
+    def judgments(self, params):
+        """The JSON of the judgments matching *params*, a dict from query
+        parameter (see :py:data:`QUERY_PARAMS`) to value. Also takes
+        ``limit``."""
+        params = dict(params)
+
+        limit = params.pop('limit', None)
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = -1
+            if limit < 0:
+                raise QueryError(400, 'limit must be a number, at least 0')
+
+        for param in params:
+            if param not in QUERY_PARAMS:
+                raise QueryError(400, 'unknown parameter %r' % param)
+        if 'guide' in params and params['guide'] not in self._guide_dicts:
+            raise QueryError(404, 'no guide named %r' % params['guide'])
+        if 'name' in params:
+            params['name'] = normalize_name(params['name'])
+
+        if params:
+            # start with the shortest list, and check the others
+            lists = sorted((self._index[param].get(value, ())
+                            for param, value in params.iteritems()),
+                           key=len)
+            others = [set(nums) for nums in lists[1:]]
+            nums = [num for num in lists[0]
+                    if all(num in other for other in others)]
+        else:
+            nums = range(len(self._encoded))
+        nums = nums[:limit]
+
+        return '{"items": [%s]}' % ', '.join(
+            self._encoded[num] for num in nums)
+
+
+# what we keep about each judgment: its microdata JSON as a dict and
+# encoded, and its (param, value) pairs for the index, other than the guide
+_Judgment = namedtuple(
+    '_Judgment', ['judgment_dict', 'encoded', 'index_values'])
+
+
+def _index_values(judgment_dict):
+    values = []
+
+    for judgment_type in judgment_dict.get(
+            'properties', {}).get('judgmentType', ()):
+        if isinstance(judgment_type, basestring):
+            values.append(('judgmentType', judgment_type))
+
+    for match in iter_judgment_matches(judgment_dict):
+        if isinstance(match['name'], basestring):
+            values.append(('name', normalize_name(match['name'])))
+        org_id = (match.get('extra') or {}).get('hrcOrgID')
+        if org_id is not None:
+            values.append(('hrcOrgID', unicode(org_id)))
+
+    return tuple(values)
+
+
+class ResponseCache(object):
+    """The *max_size* most recently used responses, by key, each with an
+    ETag. Safe to use from several threads."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, make_body):
+        """Return ``(etag, body)`` for *key*, calling *make_body()* to
+        make the body if it's not cached."""
+        with self._lock:
+            response = self._responses.pop(key, None)
+            if response is not None:
+                self._responses[key] = response  # now most recent
+                self.hits += 1
+                return response
+            self.misses += 1
+
+        body = make_body()
+        response = (etag(body), body)
+
+        if self.max_size > 0:
+            with self._lock:
+                self._responses[key] = response
+                while len(self._responses) > self.max_size:
+                    self._responses.popitem(last=False)
+
+        return response
+
+
+def etag(body):
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def cache_key(path, params, generation=0):
+    """The same for every request that gets the same response from the
+    same version of the guides."""
+    return generation, path, tuple(sorted(params.iteritems()))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_server(queries, host='127.0.0.1', port=DEFAULT_PORT,
+                cache_size=DEFAULT_CACHE_SIZE):
+    """Make an HTTP server that answers requests from *queries* (a
+    :py:class:`GuideQueries`, or a
+    :py:class:`~pbg.common.store.GuideStore` of them, in which case each
+    request uses the latest). Its URL is ``server.url``, and its cache is
+    ``server.cache``. Call ``serve_forever()`` to start it."""
+    cache = ResponseCache(cache_size)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # send headers and body in one go (handle_one_request() flushes),
+        # and don't wait for the client to ACK the last response first
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlparse.urlsplit(self.path)
+            try:
+                params = dict(
+                    (k, v.decode('utf_8')) for k, v in
+                    urlparse.parse_qsl(url.query, keep_blank_values=True))
+            except UnicodeDecodeError:
+                self._send(400, _error('query is not UTF-8'))
+                return
+
+            # the store may swap in new guides at any time, so stick with
+            # the ones we have now for this request
+            if isinstance(queries, GuideStore):
+                generation, current = queries.snapshot()
+            else:
+                generation, current = 0, queries
+
+            try:
+                tag, body = cache.get(
+                    cache_key(url.path, params, generation),
+                    lambda: self._body(current, url.path, params))
+            except QueryError, e:
+                self._send(e.status, _error(str(e)))
+                return
+
+            if tag in self._if_none_match():
+                self._send(304, None, tag)
+            else:
+                self._send(200, body, tag)
+
+        def _body(self, queries, path, params):
+            parts = path.strip('/').split('/')
+            if parts == ['guides'] and not params:
+                return json.dumps({'guides': queries.guide_names()})
+            elif len(parts) == 2 and parts[0] == 'guides' and not params:
+                return queries.guide(urlparse.unquote(parts[1]))
+            elif parts == ['judgments']:
+                return queries.judgments(params)
+            else:
+                raise QueryError(404, 'no such resource: %s' % path)
+
+        def _if_none_match(self):
+            header = self.headers.get('If-None-Match') or ''
+            return [t.strip() for t in header.split(',')]
+
+        def _send(self, status, body, tag=None):
+            self.send_response(status)
+            if tag:
+                self.send_header('ETag', tag)
+            if body is None:
+                self.send_header('Content-Length', '0')
+            else:
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body is not None:
+                self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _ThreadingHTTPServer((host, port), Handler)
+    server.url = 'http://%s:%d' % server.server_address
+    server.cache = cache
+
+    return server
+
+
+def _error(message):
+    return json.dumps({'error': message})
+
+
+if __name__ == '__main__':
+    main()
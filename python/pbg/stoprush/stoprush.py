@@ -16,4 +16,159 @@ URL="http://stoprush.net/json_2.php?flag=all&type=a"
 DATA="page=1&rp=50000&sortname=date_last_reported&sortorder=asc&query=&qtype="
 curl -X POST $URL -d $DATA > stoprush.json
 python -m pbg.stoprush.stoprush < stoprush.json
+
+The dump is what the sponsor list's flexigrid table loads: a single JSON
+object whose ``rows`` are the advertisers, each like::
+
+    {"id": "123", "cell": ["Acme Corp", "2012-03-05", ""]}
+
+(cells can also be an object keyed by column name; see COLUMNS). We read
+it a row at a time (see :py:mod:`pbg.common.jsonstream`) and write each
+advertiser's judgment as soon as we've read it, so memory use doesn't grow
+with the size of the dump.
+
+An advertiser with a statement has stopped advertising on the show.
+
+Use --ndjson to write the guide as a stream (see pbg.common.ndjson).
 """
+from __future__ import with_statement
+
+import re
+import sys
+from HTMLParser import HTMLParser
+from optparse import OptionParser
+
+from pbg.common.instrument import add_instrument_options
+from pbg.common.instrument import counted
+from pbg.common.instrument import instrumented
+from pbg.common.instrument import phase
+from pbg.common.jsonstream import iter_array
+from pbg.common.lazy import lazy_import
+from pbg.common.ndjson import write_guide
+from pbg.common.text import fix_whitespace
+
+Item = lazy_import('pbg.common.microdata', 'Item')
+write_json = lazy_import('pbg.common.microdata', 'write_json')
+
+
+CAMPAIGN_AUTHOR = 'StopRush'
+CAMPAIGN_NAME = 'Rush Limbaugh Sponsor List'
+CAMPAIGN_URL = 'http://stoprush.net/rush_limbaugh_sponsor_list.php'
+
+# the sponsor list's columns, in the order flexigrid lists each row's
+# cells
+COLUMNS = ('advertiser', 'date_last_reported', 'statement')
+
+# cells are bits of HTML (e.g. a link to the advertiser)
+TAG_RE = re.compile(r'<[^>]*>')
+
+_html_parser = HTMLParser()
+
+
+def main():
+    option_parser = OptionParser(usage='%prog [options] [stoprush.json]')
+    option_parser.add_option(
+        '--ndjson', dest='ndjson', default=False, action='store_true',
+        help=('Write one judgment per line, as they are parsed (see'
+              ' pbg.common.ndjson)'))
+    add_instrument_options(option_parser)
+    options, args = option_parser.parse_args()
+    if len(args) > 1:
+        option_parser.error('at most one dump file')
+
+    with instrumented(options, 'pbg.stoprush.stoprush'):
+        if args:
+            with open(args[0]) as f:
+                write_dump(sys.stdout, f, ndjson=options.ndjson)
+        else:
+            write_dump(sys.stdout, sys.stdin, ndjson=options.ndjson)
+
+
+def write_dump(out, f, ndjson=False):
+    """Read a dump from *f*, and write the guide to *out*, as JSON or
+    (if *ndjson* is true) as a stream."""
+    guide = make_guide()
+    judgments = iter_judgments(f)
+
+    if ndjson:
+        write_guide(out, guide, judgments)
+    else:
+        # write_json() encodes one judgment at a time, so this doesn't
+        # need a list of them
+        guide.props['judgment'] = counted('judgments', judgments)
+        with phase('serialize'):
+            write_json(out, guide)
+
+
+def make_guide():
+    """Make the BuyersGuide Item, without its judgments."""
+    author = Item('Organization')
+    author.set('name', CAMPAIGN_AUTHOR)
+
+    guide = Item('BuyersGuide')
+    guide.set('author', author)
+    guide.set('name', CAMPAIGN_NAME)
+    guide.set('url', CAMPAIGN_URL)
+
+    return guide
+
+
+def iter_judgments(f):
+    """Yield a Judgment for each row of the dump in *f*, as it's read."""
+    for row in iter_array(f, 'rows'):
+        with phase('parse'):
+            judgment = parse_row(row)
+        yield judgment
+
+
+def parse_row(row):
+    """Make a Judgment from one row of the dump (decoded JSON)."""
+    cells = row['cell']
+    if isinstance(cells, list):
+        cells = dict(zip(COLUMNS, cells))
+
+    name = cell_text(cells.get('advertiser'))
+    if not name:
+        raise ValueError('row with no advertiser: %r' % (row,))
+    statement = cell_text(cells.get('statement'))
+    date_last_reported = cell_text(cells.get('date_last_reported'))
+
+    advertiser = Item('Organization')
+    advertiser.set('name', name)
+
+    judgment = Item('Judgment')
+    judgment.set('target', advertiser)
+    if statement:
+        judgment.set('judgmentType', 'Good')
+        judgment.set('name', 'Stopped advertising')
+        judgment.set('description', statement)
+    else:
+        judgment.set('judgmentType', 'Bad')
+        judgment.set('name', 'Advertiser')
+
+    if row.get('id') is not None:
+        judgment.extra['stopRushID'] = row['id']
+    if date_last_reported:
+        judgment.extra['dateLastReported'] = date_last_reported
+
+    return judgment
+
+
+def cell_text(cell):
+    """The text of one cell: no tags or entities, and whitespace fixed.
+    Empty cells (including null) become ``''``."""
+    if cell is None:
+        return u''
+    if not isinstance(cell, basestring):
+        cell = unicode(cell)
+
+    if '<' in cell:
+        cell = TAG_RE.sub(' ', cell)
+    if '&' in cell:
+        cell = _html_parser.unescape(cell)
+
+    return fix_whitespace(cell)
+
+
+if __name__ == '__main__':
+    main()
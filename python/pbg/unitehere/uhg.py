@@ -13,17 +13,31 @@
 # limitations under the License.
 """usage:
 
-curl http://www.hotelworkersrising.org/HotelGuide/results.php > uhg.html
+python -m pbg.common.fetch --cache-dir pbg-cache http://www.hotelworkersrising.org/HotelGuide/results.php > uhg.html
 python -m pbg.unitehere.uhg uhg.html
+
+Use --ndjson to write judgments one per line, as they're parsed.
 """
 import re
 import sys
 from optparse import OptionParser
 
-from bs4 import BeautifulSoup
-from bs4 import Tag
-from microdata import Item
-from pyassert import assert_that
+from pbg.common.css import child_tags
+from pbg.common.css import select
+from pbg.common.instrument import add_instrument_options
+from pbg.common.instrument import count
+from pbg.common.instrument import instrumented
+from pbg.common.instrument import phase
+from pbg.common.lazy import lazy_import
+from pbg.common.ndjson import write_guide
+from pbg.common.soup import add_parser_options
+from pbg.common.soup import make_soup
+from pbg.common.soup import regions
+from pbg.common.soup import verify_parsers
+
+Item = lazy_import('microdata', 'Item')
+assert_that = lazy_import('pyassert', 'assert_that')
+write_json = lazy_import('pbg.common.microdata', 'write_json')
 
 
 CATEGORY_TO_JUDGMENT_TYPE = {
@@ -43,25 +57,62 @@ CANADA_REGIONS = set(['AB', 'BC', 'MB', 'NB', 'NL', 'NS', 'ON',
 ADDRESS_RE = re.compile(
     '^(?P<locality>.*), (?P<region>[A-Z][A-Z])( (?P<postal>.*))?$')
 
+# the parts of the page we use (the guide's name, copyright, and the table
+# of hotels). This also skips the ASP junk at the top of the page.
+REGIONS = regions('h1', 'p.copyright', 'table')
+
 
 def main():
-    _, args = OptionParser().parse_args()
+    option_parser = OptionParser()
+    add_parser_options(option_parser)
+    option_parser.add_option(
+        '--ndjson', dest='ndjson', default=False, action='store_true',
+        help=('Write one judgment per line, as they are parsed (see'
+              ' pbg.common.ndjson)'))
+    add_instrument_options(option_parser)
+    options, args = option_parser.parse_args()
     assert_that(len(args)).equals(1)
-    with open(args[0]) as f:
-        html = f.read()
 
-    # for some reason, the long ASP comment screws up BeautifulSoup,
-    # so skip it
-    start_index = html.find('<!DOCTYPE')
-    assert_that(start_index).ge(0)
+    if options.verify_parsers:
+        extract = lambda soup: parse_guide(soup).json_dict()
+        sys.exit(0 if verify_parsers(args, extract, sys.stdout,
+                                     parse_only=REGIONS) else 1)
+
+    with instrumented(options, 'pbg.unitehere.uhg'):
+        with phase('read'):
+            with open(args[0]) as f:
+                html = f.read()
+
+        soup = make_soup(html, options.parser, REGIONS)
+
+        if options.ndjson:
+            with phase('parse'):
+                write_guide(sys.stdout, parse_guide_header(soup),
+                            iter_judgments(soup))
+        else:
+            with phase('parse'):
+                guide = parse_guide(soup)
+            count('judgments', len(guide.props['judgment']))
+
+            with phase('serialize'):
+                write_json(sys.stdout, guide)
 
-    soup = BeautifulSoup(html[start_index:], 'html5lib')
 
-    h1s = soup.select('h1')
+def parse_guide(soup):
+    """Parse the guide's BuyersGuide Item from the page's tree."""
+    guide = parse_guide_header(soup)
+    guide.props['judgment'] = list(iter_judgments(soup))
+
+    return guide
+
+
+def parse_guide_header(soup):
+    """Parse the BuyersGuide Item, without its judgments."""
+    h1s = select(soup, 'h1')
     assert_that(len(h1s)).equals(1)
     name = h1s[0].string
 
-    copyright_ps = soup.select('p.copyright')
+    copyright_ps = select(soup, 'p.copyright')
     assert_that(len(copyright_ps)).equals(1)
     copyright_strings = list(copyright_ps[0].stripped_strings)
     assert_that(len(copyright_strings)).equals(1)
@@ -72,35 +123,34 @@ def main():
     author = Item('LaborUnion')
     author.set('name', author_name)
 
-    tables = soup.select('table div table')
+    guide = Item('BuyersGuide')
+    guide.set('name', name)
+    guide.set('author', author)
+    guide.set('copyrightYear', copyrightYear)
+    guide.set('copyrightHolder', author)
+
+    return guide
+
+
+def iter_judgments(soup):
+    """Yield each Judgment on the page, in order."""
+    tables = select(soup, 'table div table')
     assert_that(len(tables)).equals(1)
 
-    trs = tables[0].select('tr')
+    trs = select(tables[0], 'tr')
     assert_that(len(trs)).equals(2)
 
-    tds = trs[0].select('td')
+    tds = select(trs[0], 'td')
     assert_that(len(tds)).equals(2)
 
-    judgments = []
-
     for td in tds:
         category = None
 
-        for child in td.children:
-            if isinstance(child, Tag):
-                if child.name == 'h3':
-                    category = child.string.strip()
-                elif child.name == 'p':
-                    judgments.append(parse_p(child, category))
-
-    guide = Item('BuyersGuide')
-    guide.set('name', name)
-    guide.set('author', author)
-    guide.set('copyrightYear', copyrightYear)
-    guide.set('copyrightHolder', author)
-    guide.props['judgment'] = judgments
-
-    sys.stdout.write(guide.json())
+        for child in child_tags(td):
+            if child.name == 'h3':
+                category = child.string.strip()
+            elif child.name == 'p':
+                yield parse_p(child, category)
 
 
 def parse_p(p, category):
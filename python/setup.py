@@ -3,6 +3,28 @@ try:
     setup  # quiet "redefinition of unused ..." warning from pyflakes
     # arguments that distutils doesn't understand
     setuptools_kwargs = {
+        'entry_points': {
+            'console_scripts': [
+                'pbg-annotate = pbg.common.annotate:main',
+                'pbg-batch = pbg.batch:main',
+                'pbg-bundle = pbg.common.bundle:main',
+                'pbg-diff = pbg.common.diff:main',
+                'pbg-eggs = pbg.cornucopia.eggs:main',
+                'pbg-fetch = pbg.common.fetch:main',
+                'pbg-guides = pbg.guides:main',
+                'pbg-hrc-data = pbg.hrc.buyersguide.data:main',
+                'pbg-hrc-fetch = pbg.hrc.buyersguide.fetch:main',
+                'pbg-hrc-merge = pbg.hrc.buyersguide.merge:main',
+                'pbg-hrc-urls = pbg.hrc.buyersguide.urls:main',
+                'pbg-index = pbg.common.index:main',
+                'pbg-ndjson = pbg.common.ndjson:main',
+                'pbg-pipeline = pbg.pipeline:main',
+                'pbg-serve = pbg.server:main',
+                'pbg-resolve = pbg.common.resolve:main',
+                'pbg-stoprush = pbg.stoprush.stoprush:main',
+                'pbg-uhg = pbg.unitehere.uhg:main',
+            ],
+        },
         'install_requires': [
             'BeautifulSoup4',
             'html5lib',
@@ -10,7 +32,7 @@ try:
             'pyassert',
         ],
         'provides': ['pbg'],
-        #'test_suite': 'tests.suite.load_tests',
+        'test_suite': 'tests.suite.load_tests',
         #'tests_require': ['unittest2', 'mock'],
     }
 except ImportError:
@@ -37,9 +59,12 @@ setup(
     license='Apache',
     name='pbg',
     packages=['pbg',
+              'pbg.common',
               'pbg.cornucopia',
               'pbg.hrc',
-              'pbg.hrc.buyersguide'],
+              'pbg.hrc.buyersguide',
+              'pbg.stoprush',
+              'pbg.unitehere'],
     url='http://github.com/davidmarin/pbg',
     version=pbg.__version__,
     **setuptools_kwargs
@@ -0,0 +1,10 @@
+"""All the tests, for ``python setup.py test``. You can also run them with
+``python -m unittest discover tests`` (from the python/ directory)."""
+import os
+import unittest
+
+
+def load_tests():
+    top_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return unittest.defaultTestLoader.discover(
+        os.path.join(top_dir, 'tests'), top_level_dir=top_dir)
@@ -0,0 +1,207 @@
+"""Tests for pbg.common.fetch and pbg.hrc.buyersguide.fetch, against a local
+HTTP server (see benchmarks.fixtures)."""
+from __future__ import with_statement
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from benchmarks.fixtures import serve
+from pbg.common.fetch import Fetcher
+from pbg.common.fetch import RateLimiter
+from pbg.hrc.buyersguide.fetch import fetch_pages
+
+
+class RecordingSite(object):
+    """Serves ``page <path>`` for any path, after *delays[path]* seconds,
+    or a 404 for paths in *missing*. Records when each request came in,
+    and how many were being handled at once."""
+
+    def __init__(self, delays=None, missing=()):
+        self.delays = delays or {}
+        self.missing = set(missing)
+        self.start_times = []
+        self.max_active = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        with self._lock:
+            self.start_times.append(time.time())
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+        try:
+            time.sleep(self.delays.get(path, 0))
+            if path in self.missing:
+                return None
+            return 'page ' + path
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+def unused_url():
+    """A URL that nothing is listening on."""
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return 'http://127.0.0.1:%d/' % port
+
+
+class FetchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+        self.fetchers = []
+
+    def tearDown(self):
+        for fetcher in self.fetchers:
+            fetcher.close()
+        for server in self.servers:
+            server.shutdown()
+
+    def serve(self, site):
+        server = serve(site)
+        self.servers.append(server)
+        return server.url
+
+    def fetcher(self, **kwargs):
+        fetcher = Fetcher(**kwargs)
+        self.fetchers.append(fetcher)
+        return fetcher
+
+
+class FetchAllTestCase(FetchTestCase):
+
+    def test_input_order(self):
+        # earlier pages take longer, so they finish downloading last
+        paths = ['/%d' % i for i in xrange(8)]
+        site = RecordingSite(delays=dict(
+            (path, 0.02 * (len(paths) - i)) for i, path in enumerate(paths)))
+        url = self.serve(site)
+        urls = [url + path for path in paths]
+
+        results = list(self.fetcher().fetch_all(urls, num_threads=8))
+
+        self.assertEqual([u for u, _, _ in results], urls)
+        self.assertEqual([page.body for _, page, _ in results],
+                         ['page ' + path for path in paths])
+        self.assertEqual([error for _, _, error in results], [None] * 8)
+
+    def test_failed_url(self):
+        url = self.serve(RecordingSite(missing=['/2']))
+        bad_url = unused_url()
+        urls = [url + '/1', bad_url, url + '/2', url + '/3']
+
+        results = list(self.fetcher().fetch_all(urls, num_threads=2))
+
+        self.assertEqual([u for u, _, _ in results], urls)
+
+        # the others are still there
+        self.assertEqual(results[0][1].body, 'page /1')
+        self.assertEqual(results[3][1].body, 'page /3')
+
+        # the failure is reported with its URL
+        self.assertEqual(results[1][1], None)
+        self.assertIsInstance(results[1][2], socket.error)
+
+        # a 404 isn't an error, just a page
+        self.assertEqual(results[2][1].status, 404)
+        self.assertEqual(results[2][2], None)
+
+    def test_rate_limit(self):
+        delay = 0.05
+        site = RecordingSite()
+        url = self.serve(site)
+        urls = [url + '/%d' % i for i in xrange(10)]
+
+        results = list(self.fetcher(delay=delay).fetch_all(
+            urls, num_threads=8))
+
+        self.assertEqual(len(results), 10)
+        start_times = sorted(site.start_times)
+        gaps = [b - a for a, b in zip(start_times, start_times[1:])]
+        # requests can take a little more or less time to reach the
+        # server, but never arrive together
+        self.assertGreaterEqual(min(gaps), delay * 0.5)
+        # and no more than 1 / delay requests per second, overall
+        self.assertGreaterEqual(start_times[-1] - start_times[0],
+                                delay * 9 * 0.9)
+
+    def test_max_per_host(self):
+        paths = ['/%d' % i for i in xrange(12)]
+        site = RecordingSite(delays=dict((path, 0.02) for path in paths))
+        url = self.serve(site)
+        urls = [url + path for path in paths]
+
+        results = list(self.fetcher(max_per_host=2).fetch_all(
+            urls, num_threads=8))
+
+        self.assertEqual(len(results), 12)
+        self.assertEqual(site.max_active, 2)
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def test_waits_between_requests_to_same_host(self):
+        limiter = RateLimiter(0.05)
+
+        start = time.time()
+        for _ in xrange(3):
+            limiter.wait('example.com')
+
+        self.assertGreaterEqual(time.time() - start, 0.09)
+
+    def test_hosts_dont_wait_for_each_other(self):
+        limiter = RateLimiter(1.0)
+
+        start = time.time()
+        limiter.wait('example.com')
+        limiter.wait('example.org')
+
+        self.assertLess(time.time() - start, 0.5)
+
+
+class FetchPagesTestCase(FetchTestCase):
+
+    def setUp(self):
+        super(FetchPagesTestCase, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super(FetchPagesTestCase, self).tearDown()
+
+    def test_writes_pages(self):
+        url = self.serve(RecordingSite())
+        paths = ['category.php?catid=%d' % i for i in xrange(4)]
+
+        written = list(fetch_pages(self.fetcher(), url, paths, self.tmp_dir))
+
+        self.assertEqual(written, [
+            os.path.join(self.tmp_dir, path + '.html') for path in paths])
+        with open(written[0]) as f:
+            self.assertEqual(f.read(), 'page /' + paths[0])
+
+    def test_failed_page(self):
+        url = self.serve(RecordingSite(missing=['/category.php?catid=1']))
+        paths = ['category.php?catid=%d' % i for i in xrange(4)]
+
+        written = []
+
+        def fetch():
+            for path in fetch_pages(self.fetcher(), url, paths,
+                                    self.tmp_dir):
+                written.append(path)
+
+        self.assertRaises(IOError, fetch)
+        # the rest are written anyway
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), [
+            'category.php?catid=0.html', 'category.php?catid=2.html',
+            'category.php?catid=3.html'])
+        self.assertEqual(len(written), 3)
@@ -0,0 +1,51 @@
+"""Tests for pbg.hrc.buyersguide.data."""
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.fixtures import write_hrc_pages
+from pbg.common.memo import MemoStore
+from pbg.hrc.buyersguide.data import page_to_json
+from pbg.hrc.buyersguide.data import parse_pages
+
+
+class ParsePagesInPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.paths = write_hrc_pages(self.tmp_dir, num_categories=8,
+                                     num_rows=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def parse(self, paths, **kwargs):
+        return [page_to_json(*page) for page in parse_pages(paths, **kwargs)]
+
+    def test_same_as_serial(self):
+        self.assertEqual(self.parse(self.paths, jobs=2),
+                         self.parse(self.paths))
+
+    def test_memo(self):
+        memo = MemoStore(self.tmp_dir + '/memo', 'test')
+        serial = self.parse(self.paths)
+
+        self.assertEqual(self.parse(self.paths, jobs=2, memo=memo), serial)
+        # again, from the memo
+        self.assertEqual(self.parse(self.paths, jobs=2, memo=memo), serial)
+        self.assertEqual(memo.hits, len(self.paths))
+
+    def test_doesnt_read_every_page_first(self):
+        read = []
+
+        def paths():
+            for path in self.paths:
+                read.append(path)
+                yield path
+
+        pages = parse_pages(paths(), jobs=2)
+        pages.next()
+
+        # the first page, and the window of pages after it
+        self.assertLess(len(read), len(self.paths))
+        pages.close()
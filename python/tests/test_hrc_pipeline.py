@@ -0,0 +1,133 @@
+"""Tests for pbg.hrc.buyersguide.pipeline, against a local stand-in for the
+HRC site (see benchmarks.fixtures)."""
+from __future__ import with_statement
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from StringIO import StringIO
+
+from benchmarks.fixtures import hrc_category_ids
+from benchmarks.fixtures import hrc_site
+from benchmarks.fixtures import serve
+from benchmarks.fixtures import write_hrc_pages
+from pbg.common.fetch import Fetcher
+from pbg.common.soup import default_parser
+from pbg.hrc.buyersguide.pipeline import run_pipeline
+
+NUM_CATEGORIES = 12
+NUM_ROWS = 20
+
+TOP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RecordingSite(object):
+    """Wraps :py:func:`~benchmarks.fixtures.hrc_site`, keeping track of
+    the paths requested. *delays* and *bodies* are dicts from path to how
+    long to wait before responding, and what to respond with instead."""
+
+    def __init__(self, delays=None, bodies=None):
+        self.get_page = hrc_site(NUM_CATEGORIES, NUM_ROWS)
+        self.delays = delays or {}
+        self.bodies = bodies or {}
+        self.paths = []
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        with self._lock:
+            self.paths.append(path)
+        time.sleep(self.delays.get(path, 0))
+        if path in self.bodies:
+            return self.bodies[path]
+        return self.get_page(path)
+
+
+def category_path(catid):
+    return '/category.php?catid=%d' % catid
+
+
+class RunPipelineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fetcher = Fetcher(max_per_host=4)
+        self.servers = []
+
+    def tearDown(self):
+        self.fetcher.close()
+        for server in self.servers:
+            server.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def serve(self, site):
+        server = serve(site)
+        self.servers.append(server)
+        return server.url
+
+    def run_pipeline(self, url, **kwargs):
+        out = StringIO()
+        run_pipeline(out, self.fetcher, root_url=url,
+                     parser=default_parser(), **kwargs)
+        return out.getvalue()
+
+    def step_by_step_output(self):
+        """What ``pbg.hrc.buyersguide.data`` writes for the same pages,
+        as fetched by pbg.hrc.buyersguide.fetch."""
+        paths = write_hrc_pages(os.path.join(self.tmp_dir, 'hrc-pages'),
+                                NUM_CATEGORIES, NUM_ROWS)
+        # what hrc-pages/*.html would expand to
+        paths = paths[:1] + sorted(paths[1:])
+        return subprocess.check_output(
+            [sys.executable, '-m', 'pbg.hrc.buyersguide.data',
+             '--parser', default_parser()] + paths, cwd=TOP_DIR)
+
+    def test_same_as_step_by_step(self):
+        url = self.serve(RecordingSite())
+
+        self.assertEqual(self.run_pipeline(url),
+                         self.step_by_step_output())
+
+    def test_output_order_doesnt_depend_on_fetch_order(self):
+        # earlier pages take longer, so they finish downloading last
+        catids = hrc_category_ids(NUM_CATEGORIES)
+        delays = dict((category_path(catid), 0.05 * (len(catids) - i))
+                      for i, catid in enumerate(catids))
+        url = self.serve(RecordingSite(delays=delays))
+
+        self.assertEqual(
+            self.run_pipeline(url, fetch_threads=NUM_CATEGORIES,
+                              window=NUM_CATEGORIES),
+            self.step_by_step_output())
+
+    def test_fetch_error(self):
+        catid = hrc_category_ids(NUM_CATEGORIES)[2]
+        # None means a 404
+        url = self.serve(RecordingSite(bodies={category_path(catid): None}))
+
+        self.assertRaisesRegexp(AssertionError, '404', self.run_pipeline, url)
+
+    def test_parse_error(self):
+        catid = hrc_category_ids(NUM_CATEGORIES)[2]
+        # no #content, so no divs
+        url = self.serve(RecordingSite(
+            bodies={category_path(catid): '<html><body></body></html>'}))
+
+        self.assertRaises(IndexError, self.run_pipeline, url)
+
+    def test_stop_fetching_after_error(self):
+        catids = hrc_category_ids(NUM_CATEGORIES)
+        site = RecordingSite(bodies={category_path(catids[0]): None})
+        url = self.serve(site)
+
+        self.assertRaisesRegexp(AssertionError, '404', self.run_pipeline,
+                                url, fetch_threads=1, window=2)
+
+        # give stray threads a chance to keep going, if they were going to
+        time.sleep(0.2)
+        # the main page, and at most *window* category pages
+        self.assertLessEqual(len(site.paths), 3)
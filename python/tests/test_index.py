@@ -0,0 +1,28 @@
+"""Tests for pbg.common.index."""
+import sys
+import unittest
+
+from pbg.common.index import decode_args
+
+
+class DecodeArgsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._getfilesystemencoding = sys.getfilesystemencoding
+
+    def tearDown(self):
+        sys.getfilesystemencoding = self._getfilesystemencoding
+
+    def test_filesystem_encoding(self):
+        sys.getfilesystemencoding = lambda: 'latin_1'
+
+        self.assertEqual(decode_args(['Caf\xe9', 'Nike']),
+                         [u'Caf\xe9', u'Nike'])
+
+    def test_utf_8_in_ascii_locale(self):
+        sys.getfilesystemencoding = lambda: 'ANSI_X3.4-1968'
+
+        self.assertEqual(decode_args(['Caf\xc3\xa9']), [u'Caf\xe9'])
+
+    def test_unicode_passes_through(self):
+        self.assertEqual(decode_args([u'Caf\xe9']), [u'Caf\xe9'])
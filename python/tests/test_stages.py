@@ -0,0 +1,74 @@
+"""Tests for pbg.common.stages."""
+from __future__ import with_statement
+
+import random
+import threading
+import time
+import unittest
+
+from pbg.common.stages import run_stages
+
+
+class RunStagesTestCase(unittest.TestCase):
+
+    def test_order(self):
+        r = random.Random(0)
+        delays = [r.random() * 0.01 for _ in xrange(50)]
+
+        def sleep(i):
+            time.sleep(delays[i])
+            return i
+
+        results = list(run_stages(
+            xrange(50), [(sleep, 8), (lambda i: i * 2, 3)], window=10))
+
+        self.assertEqual(results, [i * 2 for i in xrange(50)])
+
+    def test_error(self):
+        def check(i):
+            if i == 3:
+                raise ValueError(i)
+            return i
+
+        results = []
+
+        def consume():
+            for result in run_stages(xrange(10), [(check, 4)], window=4):
+                results.append(result)
+
+        self.assertRaises(ValueError, consume)
+        # everything before the bad item, and nothing after it
+        self.assertEqual(results, [0, 1, 2])
+
+    def test_error_from_items(self):
+        def items():
+            yield 1
+            raise ValueError
+
+        results = run_stages(items(), [(lambda i: i, 1)])
+
+        self.assertEqual(results.next(), 1)
+        self.assertRaises(ValueError, results.next)
+
+    def test_stopping_early(self):
+        started = []
+        lock = threading.Lock()
+
+        def items():
+            for i in xrange(100):
+                with lock:
+                    started.append(i)
+                yield i
+
+        results = run_stages(items(), [(lambda i: i, 2)], window=5)
+        self.assertEqual(results.next(), 0)
+        results.close()
+
+        # give the threads a chance to keep going, if they were going to
+        time.sleep(0.1)
+        # the item we took, *window* more, and one waiting for a slot
+        self.assertLessEqual(len(started), 7)
+
+    def test_window_must_be_positive(self):
+        self.assertRaises(ValueError, list,
+                          run_stages(xrange(3), [(lambda i: i, 1)], window=0))